@@ -0,0 +1,83 @@
+"""
+Compares the two ways of finding alternative routes: Yen's k shortest
+paths filtered by max_ratio and is_path_different (method="yen") and the
+edge-penalty method (method="penalty"), with the same stretch and
+similarity bounds, on synthetic networks and on graph.py.
+
+For each method: shortest-path searches and latency per query and per
+returned alternative (paths beyond the optimal one), alternatives found,
+their mean stretch over the optimal distance, and the mean largest share
+of edges an alternative has in common with another returned path.
+
+Run with:
+    python -m benchmarks.bench_alternatives
+"""
+import random
+import statistics
+import time
+
+from compiled_graph import CompiledGraph
+from pathfinding import SearchStats, k_shortest_paths
+from benchmarks.synthetic import road_network_graph
+
+
+def _edges(path):
+    return {tuple(sorted(edge)) for edge in zip(path, path[1:])}
+
+
+def _overlap(paths):
+    # Largest share of an alternative's edges found in another returned path
+    shares = []
+    for i, (_, path) in enumerate(paths[1:], 1):
+        edges = _edges(path)
+        shares.append(max(len(edges & _edges(other)) / len(edges) for j, (_, other) in enumerate(paths) if j != i))
+    return shares
+
+
+def _run(graph, pairs, k, max_ratio, method):
+    stats = SearchStats()
+    alternatives = 0
+    stretches = []
+    overlaps = []
+
+    started = time.perf_counter()
+    for start, end in pairs:
+        paths = k_shortest_paths(graph, start, end, k=k, max_ratio=max_ratio, engine="astar", stats=stats,
+                                 method=method)
+        alternatives += len(paths) - 1
+        stretches += [distance / paths[0][0] for distance, _ in paths[1:]]
+        overlaps += _overlap(paths)
+    elapsed = time.perf_counter() - started
+
+    per_alternative = max(alternatives, 1)
+    return {
+        "searches/query": stats.searches / len(pairs),
+        "searches/alt": stats.searches / per_alternative,
+        "ms/query": elapsed * 1000 / len(pairs),
+        "ms/alt": elapsed * 1000 / per_alternative,
+        "alts/query": alternatives / len(pairs),
+        "stretch": statistics.mean(stretches) if stretches else float('nan'),
+        "overlap": statistics.mean(overlaps) if overlaps else float('nan'),
+    }
+
+
+def main(sizes=(2_500, 10_000), queries=20, ks=(3, 5), max_ratio=1.5, seed=0):
+    from graph import cities_graph, pos
+
+    networks = [("graph.py", CompiledGraph.from_dict(cities_graph, pos))]
+    networks += [(f"grid {nodes}", road_network_graph(nodes, seed=seed)) for nodes in sizes]
+    rng = random.Random(seed)
+
+    columns = ("searches/query", "searches/alt", "ms/query", "ms/alt", "alts/query", "stretch", "overlap")
+    print(f"max_ratio {max_ratio}, {queries} random pairs per network")
+    print(f"{'network':<12} {'k':>2} {'method':<8} " + " ".join(f"{column:>14}" for column in columns))
+    for label, graph in networks:
+        pairs = [rng.sample(graph.names, 2) for _ in range(queries)]
+        for k in ks:
+            for method in ("yen", "penalty"):
+                result = _run(graph, pairs, k, max_ratio, method)
+                print(f"{label:<12} {k:>2} {method:<8} " + " ".join(f"{result[column]:>14.2f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares Dijkstra and A* (haversine heuristic) by nodes settled and
+latency, for single shortest paths and for k_shortest_paths, on the
+cities graph (Nouadhibou → Nema) and on long synthetic cross-country
+queries.
+
+Run with:
+    python -m benchmarks.bench_astar
+"""
+import random
+import time
+
+from compiled_graph import CompiledGraph
+from graph import cities_graph, pos
+from pathfinding import SearchStats, astar, dijkstra, k_shortest_paths
+from benchmarks.synthetic import grid_road_network
+
+
+def _measure(run, pairs):
+    stats = SearchStats()
+    started = time.perf_counter()
+    distances = [run(start, end, stats) for start, end in pairs]
+    elapsed = (time.perf_counter() - started) / len(pairs)
+    return distances, stats, elapsed
+
+
+def compare(graph, pairs, k=3):
+    print(f"  scale factor: {graph.heuristic_scale:.3f}")
+    single = {
+        "dijkstra": lambda s, e, stats: dijkstra(graph, s, e, stats)[0],
+        "astar": lambda s, e, stats: astar(graph, s, e, stats)[0],
+    }
+    yen = {
+        engine: (lambda s, e, stats, engine=engine:
+                 [d for d, _ in k_shortest_paths(graph, s, e, k=k, engine=engine, stats=stats)])
+        for engine in ("dijkstra", "astar")
+    }
+
+    for label, runs in (("shortest path", single), (f"k_shortest_paths k={k}", yen)):
+        results = {}
+        for engine, run in runs.items():
+            distances, stats, elapsed = _measure(run, pairs)
+            results[engine] = distances
+            print(f"  {label:<22} {engine:<9} {stats.settled / len(pairs):>10.0f} settled/query "
+                  f"{stats.searches / len(pairs):>6.1f} searches/query {elapsed * 1000:>9.2f} ms/query")
+        assert results["dijkstra"] == results["astar"]
+
+
+def main(side=60, queries=10, seed=0):
+    print("cities_graph, Nouadhibou → Nema")
+    compare(CompiledGraph.from_dict(cities_graph, pos), [("Nouadhibou", "Nema")])
+
+    generated, generated_pos = grid_road_network(side, side, seed=seed)
+    graph = CompiledGraph.from_dict(generated, generated_pos)
+    rng = random.Random(seed)
+    # Long queries: from the western edge to the eastern edge of the grid
+    pairs = [(f"N{rng.randrange(side)}_0", f"N{rng.randrange(side)}_{side - 1}") for _ in range(queries)]
+    print(f"synthetic grid ({len(graph)} nodes), {queries} west → east queries")
+    compare(graph, pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Batch routing benchmark: one k_shortest_paths call per origin/destination
+pair against pairs grouped by origin with a shared shortest-path tree
+(pathfinding.shortest_paths_from), on a synthetic grid. Checks that both
+give the same routes and reports time and settled nodes.
+
+Run with:
+    python -m benchmarks.bench_batch_routes
+"""
+import random
+import time
+
+from compiled_graph import CompiledGraph
+from pathfinding import SearchStats, k_shortest_paths, shortest_paths_from
+from benchmarks.synthetic import grid_road_network
+
+
+def main(side=30, origins=10, destinations=30, seed=0):
+    rng = random.Random(seed)
+    generated, generated_pos = grid_road_network(side, side, seed=seed, one_way_ratio=0.1)
+    graph = CompiledGraph.from_dict(generated, generated_pos)
+    nodes = list(generated)
+    groups = {start: rng.sample(nodes, destinations) for start in rng.sample(nodes, origins)}
+
+    print(f"synthetic grid ({len(graph)} nodes), {origins} origins x {destinations} destinations")
+    print(f"{'k':>3} {'per pair':>12} {'grouped':>12} {'settled per pair':>18} {'settled grouped':>17}")
+
+    for k in (1, 3):
+        pair_stats, group_stats = SearchStats(), SearchStats()
+
+        started = time.perf_counter()
+        expected = {
+            (start, end): k_shortest_paths(graph, start, end, k=k, stats=pair_stats)
+            for start, ends in groups.items() for end in ends
+        }
+        pair_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        grouped = {}
+        for start, ends in groups.items():
+            for end, paths in shortest_paths_from(graph, start, ends, k=k, stats=group_stats).items():
+                grouped[(start, end)] = paths
+        group_time = time.perf_counter() - started
+
+        assert grouped == expected
+        print(f"{k:>3} {pair_time * 1000:>9.1f} ms {group_time * 1000:>9.1f} ms "
+              f"{pair_stats.settled:>18} {group_stats.settled:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Randomized comparison of bidirectional Dijkstra against dijkstra on
+asymmetric synthetic graphs (one-way roads and direction-dependent
+weights): checks that every distance matches and reports nodes settled
+and latency.
+
+Run with:
+    python -m benchmarks.bench_bidirectional
+"""
+import random
+import time
+
+from compiled_graph import CompiledGraph
+from graph import cities_graph, pos
+from pathfinding import SearchStats, bidirectional_dijkstra, dijkstra
+from benchmarks.synthetic import grid_road_network
+
+
+def compare(graph, pairs):
+    results = {}
+    for label, search in (("dijkstra", dijkstra), ("bidirectional", bidirectional_dijkstra)):
+        stats = SearchStats()
+        started = time.perf_counter()
+        results[label] = [search(graph, start, end, stats)[0] for start, end in pairs]
+        elapsed = (time.perf_counter() - started) / len(pairs)
+        print(f"  {label:<14} {stats.settled / len(pairs):>9.0f} settled/query {elapsed * 1000:>8.2f} ms/query")
+
+    mismatches = [
+        (pair, expected, got)
+        for pair, expected, got in zip(pairs, results["dijkstra"], results["bidirectional"])
+        if abs(expected - got) > 1e-6
+    ]
+    print(f"  {len(mismatches)} mismatching distances out of {len(pairs)} queries")
+    assert not mismatches, mismatches[:5]
+
+
+def main(queries=200, seed=0):
+    rng = random.Random(seed)
+
+    cities = list(cities_graph)
+    print("cities_graph, all pairs")
+    compare(CompiledGraph.from_dict(cities_graph, pos), [(s, e) for s in cities for e in cities])
+
+    for side, one_way_ratio in ((8, 0.3), (30, 0.2), (100, 0.1)):
+        graph, _ = grid_road_network(side, side, seed=rng.randrange(1 << 30), one_way_ratio=one_way_ratio)
+        nodes = list(graph)
+        pairs = [tuple(rng.sample(nodes, 2)) for _ in range(queries)]
+        print(f"asymmetric grid ({len(nodes)} nodes, {one_way_ratio:.0%} asymmetric roads), {queries} queries")
+        compare(CompiledGraph.from_dict(graph), pairs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Concurrency check of request coalescing (single flight): hundreds of
+identical POST /api/routes requests with an inline image are sent at the
+same moment, in process, to a server with an empty route cache.
+
+With coalescing, exactly one route computation and one render must
+happen and every client must get the same response. The same burst is
+then sent with coalescing disabled, to show the work it saves.
+
+Exits with status 1 when the coalesced burst computed or rendered more
+than once, or when the responses differ.
+
+Run with:
+    python -m benchmarks.bench_coalescing
+    python -m benchmarks.bench_coalescing 1000
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+import main as server
+from route_cache import RouteCache
+from single_flight import SingleFlight
+
+
+def _route_queries():
+    # Route queries computed so far, from the exported metrics
+    for line in server.metrics.render().splitlines():
+        if line.startswith("pathfinder_route_queries_total "):
+            return int(float(line.split()[1]))
+    return 0
+
+
+async def _burst(requests, start_city, end_city):
+    body = {"start_city": start_city, "end_city": end_city, "include_image": True}
+    async with httpx.AsyncClient(app=server.app, base_url="http://bench", timeout=60) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/api/routes", json=body) for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    return responses, elapsed
+
+
+async def _run(requests, start_city, end_city):
+    results = {}
+    async with server.lifespan(server.app):
+        # Warm up the render workers so both bursts start from the same state
+        await server.run_in_threadpool(server.render_pool.start)
+
+        for label, enabled in (("coalescing on", True), ("coalescing off", False)):
+            server.route_cache = RouteCache()
+            server.flights = SingleFlight(enabled=enabled)
+            queries, rendered = _route_queries(), server.render_pool.stats()["rendered"]
+
+            responses, elapsed = await _burst(requests, start_city, end_city)
+
+            results[label] = {
+                "computations": _route_queries() - queries,
+                "renders": server.render_pool.stats()["rendered"] - rendered,
+                "ok": sum(response.status_code == 200 for response in responses),
+                "with image": sum(response.json().get("image_data") is not None for response in responses
+                                  if response.status_code == 200),
+                "distinct": len({response.content for response in responses}),
+                "elapsed": elapsed,
+                "flights": server.flights.stats(),
+            }
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    requests = int(argv[0]) if argv else 300
+    start_city, end_city = server.CITY_NAMES[0], server.CITY_NAMES[-1]
+
+    print(f"{requests} simultaneous POST /api/routes {start_city} → {end_city}, include_image")
+    results = asyncio.run(_run(requests, start_city, end_city))
+
+    for label, result in results.items():
+        print(f"  {label:<15} computations {result['computations']:>4}   renders {result['renders']:>4}   "
+              f"200 OK {result['ok']:>4}   with image {result['with image']:>4}   "
+              f"distinct responses {result['distinct']:>3}   {result['elapsed'] * 1000:7.0f} ms")
+    print(f"  flights: {results['coalescing on']['flights']}")
+
+    coalesced = results["coalescing on"]
+    failed = (coalesced["computations"] != 1 or coalesced["renders"] != 1 or coalesced["ok"] != requests
+              or coalesced["with image"] != requests or coalesced["distinct"] != 1)
+    print("FAILED" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Stress check for concurrent k_shortest_paths queries on one shared
+CompiledGraph.
+
+Runs the same random queries serially and from a thread pool, verifies
+that every concurrent result matches its serial counterpart and that the
+graph arrays are byte-for-byte unchanged afterwards, then reports
+throughput.
+
+Run with:
+    python -m benchmarks.bench_concurrent_routes
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from compiled_graph import CompiledGraph
+from graph import cities_graph, pos
+from pathfinding import k_shortest_paths
+from benchmarks.synthetic import grid_road_network
+
+
+def _fingerprint(graph):
+    return (bytes(graph.offsets), bytes(graph.targets), bytes(graph.weights))
+
+
+def _run(graph, pairs, k, workers):
+    started = time.perf_counter()
+    if workers == 1:
+        results = [k_shortest_paths(graph, start, end, k=k) for start, end in pairs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda pair: k_shortest_paths(graph, *pair, k=k), pairs))
+    return results, time.perf_counter() - started
+
+
+def stress(graph, pairs, k=5, workers=(1, 4, 16, 64)):
+    fingerprint = _fingerprint(graph)
+    expected, _ = _run(graph, pairs, k, 1)
+
+    for worker_count in workers:
+        results, elapsed = _run(graph, pairs, k, worker_count)
+        mismatches = sum(1 for got, want in zip(results, expected) if got != want)
+        print(f"  {worker_count:>3} threads: {len(pairs) / elapsed:8.1f} queries/s, "
+              f"{mismatches} mismatching results")
+        assert mismatches == 0
+        assert _fingerprint(graph) == fingerprint, "graph was modified"
+
+
+def main(queries=2000, seed=0):
+    rng = random.Random(seed)
+
+    cities = list(cities_graph)
+    print(f"cities_graph ({len(cities)} cities, {queries} queries)")
+    stress(CompiledGraph.from_dict(cities_graph, pos),
+           [tuple(rng.sample(cities, 2)) for _ in range(queries)])
+
+    generated, generated_pos = grid_road_network(30, 30, seed=seed)
+    nodes = list(generated)
+    print(f"synthetic grid ({len(nodes)} nodes, {queries // 20} queries)")
+    stress(CompiledGraph.from_dict(generated, generated_pos),
+           [tuple(rng.sample(nodes, 2)) for _ in range(queries // 20)], k=3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Contraction hierarchy benchmark: preprocessing time, index size and query
+speedup over dijkstra, astar and bidirectional_dijkstra, with a check
+that all distances match.
+
+Run with:
+    python -m benchmarks.bench_contraction
+"""
+import os
+import random
+import tempfile
+import time
+
+from compiled_graph import CompiledGraph
+from contraction import ContractionHierarchy
+from pathfinding import SearchStats, _astar_path, _bidirectional_path, _shortest_path
+from benchmarks.synthetic import grid_road_network
+
+
+def main(sides=(20, 40, 60), queries=200, seed=0):
+    rng = random.Random(seed)
+
+    for side in sides:
+        generated, generated_pos = grid_road_network(side, side, seed=seed)
+        graph = CompiledGraph.from_dict(generated, generated_pos)
+
+        started = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(graph)
+        build_time = time.perf_counter() - started
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "graph.ch")
+            hierarchy.save(filename)
+            file_size = os.path.getsize(filename)
+            started = time.perf_counter()
+            hierarchy = ContractionHierarchy.load(filename, graph)
+            load_time = time.perf_counter() - started
+
+        graph_size = sum(len(a) * a.itemsize for a in (graph.offsets, graph.targets, graph.weights))
+        print(f"grid {len(graph)} nodes, {graph.edge_count} edges")
+        print(f"  preprocessing {build_time:.2f}s, {hierarchy.shortcut_count} shortcuts, "
+              f"index {file_size / 1024:.0f} KiB on disk (graph CSR {graph_size / 1024:.0f} KiB), "
+              f"loaded in {load_time * 1000:.1f} ms")
+
+        pairs = [(rng.randrange(len(graph)), rng.randrange(len(graph))) for _ in range(queries)]
+        engines = (
+            ("dijkstra", lambda s, t, stats: _shortest_path(graph, s, t, stats=stats)),
+            ("astar", lambda s, t, stats: _astar_path(graph, s, t, stats=stats)),
+            ("bidirectional", lambda s, t, stats: _bidirectional_path(graph, s, t, stats=stats)),
+            ("contraction", hierarchy.shortest_path),
+        )
+        baseline = None
+        reference = None
+
+        for label, search in engines:
+            stats = SearchStats()
+            started = time.perf_counter()
+            distances = [search(s, t, stats)[0] for s, t in pairs]
+            elapsed = (time.perf_counter() - started) / queries
+
+            if reference is None:
+                baseline, reference = elapsed, distances
+            assert all(abs(a - b) < 1e-6 for a, b in zip(reference, distances)), label
+
+            print(f"  {label:<14} {stats.settled / queries:>8.0f} settled/query "
+                  f"{elapsed * 1000:>8.3f} ms/query {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
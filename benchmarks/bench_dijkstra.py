@@ -0,0 +1,87 @@
+"""
+Compares the heap-based pathfinding.dijkstra against the previous
+O(V²) linear-scan implementation on growing synthetic grids.
+
+Run with:
+    python -m benchmarks.bench_dijkstra
+"""
+import random
+import time
+
+from compiled_graph import CompiledGraph
+from pathfinding import dijkstra
+from benchmarks.synthetic import grid_road_network
+
+
+def _dijkstra_linear_scan(graph, start_city, end_city):
+    """
+    Previous implementation: picks the next city by scanning every
+    unvisited city and settles the whole graph before returning.
+    """
+    distances = {city: float('inf') for city in graph}
+    distances[start_city] = 0
+    predecessors = {city: None for city in graph}
+    visited = set()
+
+    while len(visited) < len(graph):
+        current_city = None
+        current_distance = float('inf')
+
+        for city in graph:
+            if city not in visited and distances[city] < current_distance:
+                current_city = city
+                current_distance = distances[city]
+
+        if current_city is None:
+            break
+
+        visited.add(current_city)
+        for neighbor, weight in graph[current_city].items():
+            new_distance = distances[current_city] + weight
+
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = current_city
+
+    path = []
+    current = end_city
+
+    while current is not None:
+        path.append(current)
+        if current == start_city:
+            break
+        current = predecessors[current]
+
+    if path[-1] != start_city:
+        return float('inf'), []
+
+    return distances[end_city], path[::-1]
+
+
+def _time_queries(fn, graph, pairs):
+    started = time.perf_counter()
+    results = [fn(graph, start, end)[0] for start, end in pairs]
+    return (time.perf_counter() - started) / len(pairs), results
+
+
+def main(sizes=(10, 20, 40, 60), queries=5, seed=0):
+    rng = random.Random(seed)
+    print(f"{'nodes':>8} {'linear scan (ms)':>18} {'heap (ms)':>12} {'speedup':>9}")
+
+    for side in sizes:
+        graph, _ = grid_road_network(side, side, seed=seed)
+        nodes = list(graph)
+        pairs = [tuple(rng.sample(nodes, 2)) for _ in range(queries)]
+
+        linear_time, linear_results = _time_queries(_dijkstra_linear_scan, graph, pairs)
+        heap_time, heap_results = _time_queries(dijkstra, CompiledGraph.from_dict(graph), pairs)
+
+        for expected, got in zip(linear_results, heap_results):
+            assert abs(expected - got) < 1e-6, (expected, got)
+
+        print(f"{len(graph):>8} {linear_time * 1000:>18.2f} {heap_time * 1000:>12.2f} "
+              f"{linear_time / heap_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
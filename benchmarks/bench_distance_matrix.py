@@ -0,0 +1,47 @@
+"""
+All-pairs distance matrix benchmark: vectorized Floyd–Warshall against
+repeated heap Dijkstra (single process and process pool) on growing
+synthetic grids.
+
+Run with:
+    python -m benchmarks.bench_distance_matrix
+"""
+import os
+import time
+
+import numpy as np
+
+from compiled_graph import CompiledGraph
+from distance_matrix import DistanceMatrix
+from benchmarks.synthetic import grid_road_network
+
+
+def main(sides=(10, 20, 30), seed=0):
+    workers = os.cpu_count() or 1
+    methods = (
+        ("floyd_warshall", 1),
+        ("dijkstra", 1),
+        ("dijkstra", workers),
+    )
+    print(f"{'nodes':>7} " + " ".join(f"{f'{method} x{count}':>18}" for method, count in methods))
+
+    for side in sides:
+        generated, generated_pos = grid_road_network(side, side, seed=seed, one_way_ratio=0.1)
+        graph = CompiledGraph.from_dict(generated, generated_pos)
+        timings = []
+        reference = None
+
+        for method, count in methods:
+            started = time.perf_counter()
+            matrix = DistanceMatrix.compute(graph, method=method, workers=count)
+            timings.append(time.perf_counter() - started)
+
+            if reference is None:
+                reference = matrix.distances
+            assert np.allclose(reference, matrix.distances), method
+
+        print(f"{len(graph):>7} " + " ".join(f"{timing * 1000:>15.1f} ms" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Startup benchmark of the ways to load a road network: importing a Python
+literal like graph.py and compiling it, parsing the CSV sources with
+graph_loader.load_csv, and mapping a binary snapshot with
+CompiledGraph.load. Each method runs in a fresh process, which reports
+its load time and the peak RSS added by loading.
+
+Run with:
+    python -m benchmarks.bench_graph_loading
+"""
+import importlib.util
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compiled_graph import CompiledGraph
+from graph_loader import export_csv, load_csv
+from benchmarks.synthetic import grid_road_network
+
+
+def _load(method, directory):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+
+    if method == "python literal":
+        spec = importlib.util.spec_from_file_location("network", os.path.join(directory, "network.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        graph = CompiledGraph.from_dict(module.cities_graph, module.pos)
+    elif method == "csv":
+        graph = load_csv(os.path.join(directory, "roads.csv"), os.path.join(directory, "cities.csv"))
+    else:
+        graph = CompiledGraph.load(os.path.join(directory, "graph.pfg"))
+
+    elapsed = time.perf_counter() - started
+    added = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    return elapsed, added / 1024, graph.version
+
+
+def main(side=200, seed=0):
+    generated, generated_pos = grid_road_network(side, side, seed=seed)
+    graph = CompiledGraph.from_dict(generated, generated_pos)
+    print(f"synthetic grid ({len(graph)} nodes, {graph.edge_count} edges)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "network.py"), "w") as file:
+            file.write(f"cities_graph = {generated!r}\npos = {generated_pos!r}\n")
+        export_csv(graph, os.path.join(directory, "roads.csv"), os.path.join(directory, "cities.csv"))
+        graph.save(os.path.join(directory, "graph.pfg"))
+
+        for name in ("network.py", "roads.csv", "graph.pfg"):
+            print(f"  {name:<12} {os.path.getsize(os.path.join(directory, name)) / 1e6:8.1f} MB")
+
+        print(f"{'method':<16} {'load time':>12} {'added RSS':>11}")
+        for method in ("python literal", "csv", "snapshot"):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                elapsed, added, _ = pool.submit(_load, method, directory).result()
+            print(f"{method:<16} {elapsed * 1000:>9.1f} ms {added:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
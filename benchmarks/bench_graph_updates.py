@@ -0,0 +1,130 @@
+"""
+Benchmark of live road edits (LiveGraph.update_edges) on a synthetic grid:
+what it costs to bring the derived structures up to date after a few
+roads are closed, reopened or change length.
+
+- distance matrix: DistanceMatrix.repair vs DistanceMatrix.compute
+- contraction hierarchy: re-contracting in the previous order vs a fresh
+  build with the edge-difference heuristic
+
+Every round also checks the repaired matrix against a full recompute
+(distances equal, every stored path valid and of the stored length) and
+the rebuilt hierarchy against the matrix on random pairs.
+
+Run with:
+    python -m benchmarks.bench_graph_updates
+"""
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+
+from compiled_graph import CompiledGraph
+from contraction import ContractionHierarchy
+from distance_matrix import DistanceMatrix
+from benchmarks.synthetic import grid_road_network
+
+
+def _random_edits(graph, base, rng, count):
+    # Close, lengthen, shorten (never below the straight line) or reopen roads,
+    # in both directions
+    edits = {}
+    for _ in range(count):
+        u = rng.randrange(len(graph))
+        neighbors = list(base.neighbors(u))
+        if not neighbors:
+            continue
+        v, weight = rng.choice(neighbors)
+        action = rng.choice(("close", "close", "set", "open"))
+        if action == "close":
+            new_weight = None
+        elif action == "set":
+            new_weight = weight * rng.uniform(0.9, 2.0)
+        else:
+            new_weight = weight
+        edits[(u, v)] = new_weight
+        edits[(v, u)] = new_weight
+    return edits
+
+
+def _path_length(graph, path):
+    return sum(graph.edge_weight(u, v) for u, v in zip(path, path[1:]))
+
+
+def _check_matrix(graph, matrix, expected, rng, samples=200):
+    distances = np.asarray(matrix.distances)
+    # Sums may be taken in another order than Dijkstra's, hence allclose
+    if not np.allclose(distances, np.asarray(expected.distances)):
+        return False
+    for _ in range(samples):
+        source, target = rng.randrange(len(graph)), rng.randrange(len(graph))
+        path = matrix.path(source, target)
+        if math.isinf(distances[source, target]):
+            if path:
+                return False
+        elif path[0] != source or path[-1] != target \
+                or not math.isclose(_path_length(graph, path), distances[source, target]):
+            return False
+    return True
+
+
+def main(side=30, rounds=10, edits_per_round=1, seed=0):
+    rng = random.Random(seed)
+    generated, generated_pos = grid_road_network(side, side, seed=seed)
+    base = CompiledGraph.from_dict(generated, generated_pos)
+    print(f"synthetic grid ({len(base)} nodes, {base.edge_count} edges), "
+          f"{rounds} rounds of {edits_per_round} road edits")
+
+    graph = base
+    matrix = DistanceMatrix.compute(graph)
+    hierarchy = ContractionHierarchy.build(graph)
+
+    timings = {"matrix repair": [], "matrix compute": [], "CH in old order": [], "CH fresh build": []}
+    matrix_ok = hierarchy_ok = True
+
+    for _ in range(rounds):
+        edits = _random_edits(graph, base, rng, edits_per_round)
+        graph = graph.with_edge_weights(edits)
+
+        started = time.perf_counter()
+        repaired = matrix.repair(graph, edits)
+        timings["matrix repair"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        expected = DistanceMatrix.compute(graph)
+        timings["matrix compute"].append(time.perf_counter() - started)
+
+        matrix_ok &= _check_matrix(graph, repaired, expected, rng)
+        matrix = repaired
+
+        started = time.perf_counter()
+        reordered = ContractionHierarchy.build(graph, hierarchy.rank)
+        timings["CH in old order"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        ContractionHierarchy.build(graph)
+        timings["CH fresh build"].append(time.perf_counter() - started)
+
+        distances = np.asarray(matrix.distances)
+        for _ in range(100):
+            source, target = rng.randrange(len(graph)), rng.randrange(len(graph))
+            distance, path = reordered.shortest_path(source, target)
+            expected_distance = distances[source, target]
+            if math.isinf(expected_distance):
+                hierarchy_ok &= not path
+            else:
+                hierarchy_ok &= math.isclose(distance, expected_distance) \
+                    and math.isclose(_path_length(graph, path), expected_distance)
+        hierarchy = reordered
+
+    print(f"{'step':<18} {'median':>10} {'max':>10}")
+    for name, values in timings.items():
+        print(f"{name:<18} {statistics.median(values) * 1000:>7.1f} ms {max(values) * 1000:>7.1f} ms")
+    print(f"repaired matrix equals recompute: {matrix_ok}")
+    print(f"re-contracted hierarchy exact:    {hierarchy_ok}")
+
+
+if __name__ == "__main__":
+    main()
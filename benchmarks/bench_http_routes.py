@@ -0,0 +1,70 @@
+"""
+Load test of the HTTP API, in process (no network): throughput of
+POST /api/routes with an inline image versus GET /api/routes/geojson,
+which returns the same paths as GeoJSON and skips rendering.
+
+The route cache is replaced by an empty one (max_entries=0) so every
+request computes its paths, and its image when requested.
+
+Run with:
+    python -m benchmarks.bench_http_routes
+"""
+import asyncio
+import random
+import time
+
+import httpx
+
+import main as server
+from route_cache import RouteCache
+
+
+async def _load(client, requests, concurrency):
+    queue = list(reversed(requests))
+    latencies = []
+
+    async def worker():
+        while queue:
+            method, url, kwargs = queue.pop()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(requests) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+async def _run(pairs, concurrency):
+    modes = {
+        "image on  (POST /api/routes, include_image)": [
+            ("POST", "/api/routes", {"json": {"start_city": start, "end_city": end, "include_image": True}})
+            for start, end in pairs],
+        "image off (GET /api/routes/geojson)": [
+            ("GET", "/api/routes/geojson", {"params": {"start": start, "end": end}})
+            for start, end in pairs],
+    }
+
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(app=server.app, base_url="http://bench") as client:
+            for label, requests in modes.items():
+                throughput, p50, p99 = await _load(client, requests, concurrency)
+                print(f"  {label:<45} {throughput:8.1f} req/s   "
+                      f"p50 {p50 * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms")
+
+
+def main(requests=200, concurrency=8, seed=0):
+    rng = random.Random(seed)
+    server.route_cache = RouteCache(max_entries=0)
+    pairs = [tuple(rng.sample(server.CITY_NAMES, 2)) for _ in range(requests)]
+
+    print(f"{requests} requests, concurrency {concurrency}, "
+          f"{server.render_pool.workers} render workers")
+    asyncio.run(_run(pairs, concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of service-area queries (reachable_within) on synthetic road
+networks: one bounded multi-source expansion against what a client had to
+do before, one point-to-point search per destination.
+
+- single origin: every node within the radius, vs one dijkstra() per
+  node found (timed on a sample and extrapolated)
+- several depots: one multi-source expansion vs one bounded expansion
+  per depot
+
+Distances are checked against dijkstra() on the sample.
+
+Run with:
+    python -m benchmarks.bench_reachability
+"""
+import math
+import random
+import time
+
+from pathfinding import SearchStats, dijkstra, reachable_within
+from benchmarks.synthetic import road_network_graph
+
+
+def main(sizes=(10_000, 100_000), radii=(100, 300), depots=5, sample=20, seed=0):
+    rng = random.Random(seed)
+    print(f"{'network':>8} {'radius':>7} {'origins':>8} {'cities':>7} {'settled':>8} "
+          f"{'expansion':>10} {'per-city searches':>18} {'speedup':>8}")
+
+    for nodes in sizes:
+        graph = road_network_graph(nodes, seed=seed)
+        for radius in radii:
+            origin = rng.choice(graph.names)
+
+            stats = SearchStats()
+            started = time.perf_counter()
+            reachable = reachable_within(graph, [origin], radius, stats)
+            expansion = time.perf_counter() - started
+
+            # Point-to-point searches to a sample of the cities found
+            destinations = rng.sample(list(reachable), min(sample, len(reachable)))
+            started = time.perf_counter()
+            exact = all(math.isclose(dijkstra(graph, origin, city)[0], reachable[city][0], abs_tol=1e-9)
+                        for city in destinations)
+            per_city = (time.perf_counter() - started) / len(destinations) * len(reachable)
+
+            print(f"{nodes:>8} {radius:>4} km {1:>8} {len(reachable):>7} {stats.settled:>8} "
+                  f"{expansion * 1000:>7.1f} ms {per_city * 1000:>15.1f} ms {per_city / expansion:>7.0f}x"
+                  f"{'' if exact else '  MISMATCH'}")
+
+            origins = rng.sample(graph.names, depots)
+            stats = SearchStats()
+            started = time.perf_counter()
+            reachable = reachable_within(graph, origins, radius, stats)
+            expansion = time.perf_counter() - started
+
+            started = time.perf_counter()
+            separate = [reachable_within(graph, [depot], radius) for depot in origins]
+            per_depot = time.perf_counter() - started
+
+            # Each city is served by the depot it is closest to
+            closest = {}
+            for depot, cities in zip(origins, separate):
+                for city, (distance, _) in cities.items():
+                    if city not in closest or distance < closest[city]:
+                        closest[city] = distance
+            exact = closest.keys() == reachable.keys() and all(
+                math.isclose(closest[city], distance, abs_tol=1e-9) for city, (distance, _) in reachable.items())
+
+            print(f"{nodes:>8} {radius:>4} km {depots:>8} {len(reachable):>7} {stats.settled:>8} "
+                  f"{expansion * 1000:>7.1f} ms {per_depot * 1000:>12.1f} ms (1) {per_depot / expansion:>7.1f}x"
+                  f"{'' if exact else '  MISMATCH'}")
+
+    print("(1) one bounded expansion per depot")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Memory per worker process when every worker builds its own copy of the
+graph and distance matrix ("private") against workers that map one
+snapshot and one matrix file written beforehand ("shared").
+
+Workers are started with the spawn method (like uvicorn workers), load
+the data, touch every page and run a few route queries, then wait until
+all of them are alive before reading their RSS and PSS from /proc. RSS
+counts shared pages in full in every process; PSS splits them between
+the processes that map them, so the PSS total is the real footprint.
+
+Linux only. Run with:
+    python -m benchmarks.bench_shared_memory
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from compiled_graph import CompiledGraph
+from distance_matrix import DistanceMatrix
+from pathfinding import k_shortest_paths
+from benchmarks.synthetic import grid_road_network
+
+
+def _memory_kb(fields=("Rss", "Pss")):
+    values = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if name in fields:
+                values[name] = int(value.split()[0])
+    return values
+
+
+def _worker(mode, side, seed, snapshot, matrix_file, barrier, results):
+    if mode == "private":
+        generated, generated_pos = grid_road_network(side, side, seed=seed)
+        graph = CompiledGraph.from_dict(generated, generated_pos)
+        del generated, generated_pos
+        matrix = DistanceMatrix.load(matrix_file, graph, shared=False)
+    else:
+        graph = CompiledGraph.load(snapshot)
+        matrix = DistanceMatrix.load(matrix_file, graph)
+
+    # Fault in every page, as serving requests eventually would
+    checksum = sum(graph.weights) + float(np.nansum(np.where(np.isinf(matrix.distances), 0, matrix.distances)))
+    for i in range(10):
+        k_shortest_paths(graph, graph.names[i], graph.names[-1 - i], k=3)
+
+    barrier.wait()
+    results.put((_memory_kb(), checksum))
+    barrier.wait()
+
+
+def _run(mode, workers, side, seed, snapshot, matrix_file):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(mode, side, seed, snapshot, matrix_file, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    # Every worker is alive and has loaded its data: collect, then release them
+    memory = [results.get()[0] for _ in range(workers)]
+    barrier.wait()
+    for process in processes:
+        process.join()
+    return memory
+
+
+def main(side=40, seed=0, worker_counts=(1, 4, 16)):
+    generated, generated_pos = grid_road_network(side, side, seed=seed)
+    graph = CompiledGraph.from_dict(generated, generated_pos)
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, "graph.pfg")
+        matrix_file = os.path.join(directory, "graph.pfdm")
+        started = time.perf_counter()
+        graph.save(snapshot)
+        DistanceMatrix.compute(graph).save(matrix_file)
+        print(f"synthetic grid ({len(graph)} nodes), snapshot {os.path.getsize(snapshot) / 1e6:.1f} MB, "
+              f"distance matrix {os.path.getsize(matrix_file) / 1e6:.1f} MB "
+              f"(prepared once in {time.perf_counter() - started:.1f}s)")
+        print(f"{'workers':>7} {'mode':<8} {'RSS / worker':>13} {'PSS / worker':>13} {'total PSS':>10}")
+
+        for workers in worker_counts:
+            for mode in ("private", "shared"):
+                memory = _run(mode, workers, side, seed, snapshot, matrix_file)
+                rss = sum(values["Rss"] for values in memory) / workers / 1024
+                pss = sum(values["Pss"] for values in memory) / 1024
+                print(f"{workers:>7} {mode:<8} {rss:>10.1f} MB {pss / workers:>10.1f} MB {pss:>7.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of nearest-city lookups (SpatialIndex) on a synthetic network of
+1M nodes: grid build time and the latency of nearest and k-nearest
+lookups from random positions, inside and around the network, compared to
+a linear scan over every node.
+
+Every lookup timed against the linear scan is also checked to return the
+same nodes.
+
+Run with:
+    python -m benchmarks.bench_spatial_index
+    python -m benchmarks.bench_spatial_index 100000
+"""
+import random
+import statistics
+import sys
+import time
+
+from compiled_graph import haversine_km
+from spatial_index import SpatialIndex
+from benchmarks.synthetic import road_network_graph
+
+
+def _linear_nearest(graph, longitude, latitude, k):
+    longitudes, latitudes = graph.longitudes, graph.latitudes
+    distances = ((haversine_km(longitude, latitude, longitudes[node], latitudes[node]), node)
+                 for node in range(len(graph)))
+    return sorted(distances)[:k]
+
+
+def _summary(durations):
+    durations = sorted(durations)
+    return (f"median {statistics.median(durations) * 1e6:8.1f} µs   "
+            f"p99 {durations[int(len(durations) * 0.99)] * 1e6:8.1f} µs")
+
+
+def main(nodes=1_000_000, queries=2_000, scans=5, seed=0):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    # Nodes about 1 km apart, so that 1M nodes stay within valid latitudes
+    graph = road_network_graph(nodes, seed=seed, spacing=0.01)
+    print(f"synthetic network: {len(graph)} nodes, generated in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    index = SpatialIndex.build(graph)
+    print(f"index build: {time.perf_counter() - started:.2f}s "
+          f"({index.columns} x {index.rows} cells, {index.size} nodes)")
+
+    # Positions over the network and a margin of 10% around it
+    min_longitude, max_longitude = min(graph.longitudes), max(graph.longitudes)
+    min_latitude, max_latitude = min(graph.latitudes), max(graph.latitudes)
+    margin_longitude = (max_longitude - min_longitude) * 0.1
+    margin_latitude = (max_latitude - min_latitude) * 0.1
+    positions = [(rng.uniform(min_longitude - margin_longitude, max_longitude + margin_longitude),
+                  rng.uniform(min_latitude - margin_latitude, max_latitude + margin_latitude))
+                 for _ in range(queries)]
+
+    for k in (1, 10):
+        durations = []
+        for longitude, latitude in positions:
+            started = time.perf_counter()
+            index.nearest(longitude, latitude, k)
+            durations.append(time.perf_counter() - started)
+        print(f"nearest k={k:<3} {_summary(durations)}")
+
+    exact = True
+    durations = []
+    for longitude, latitude in positions[:scans]:
+        started = time.perf_counter()
+        expected = _linear_nearest(graph, longitude, latitude, 10)
+        durations.append(time.perf_counter() - started)
+        exact &= [node for _, node in index.nearest(longitude, latitude, 10)] == [node for _, node in expected]
+    print(f"linear scan k=10: {statistics.median(durations) * 1000:.0f} ms per lookup")
+    print(f"index results equal to the linear scan: {exact}")
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
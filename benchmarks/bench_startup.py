@@ -0,0 +1,98 @@
+"""
+Cold-start budget of the server, each measurement in a fresh interpreter:
+
+- `python -X importtime -c "import main"`: cumulative import time of main
+  and the slowest modules it pulls in;
+- which heavy modules are loaded by the import (the visualization stack
+  and NumPy must not be: they are loaded on first use);
+- time until the first GET /api/cities answers, app startup included, for
+  each PATHFINDER_RENDER_MODE.
+
+Exits with status 1 when importing main takes longer than --budget-ms or
+loads a module it should not, so it can gate a CI job.
+
+Run with:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that importing main must not load
+LAZY_MODULES = ("visualizer", "matplotlib", "networkx", "PIL", "numpy", "uvicorn")
+
+_FIRST_RESPONSE = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    assert client.get("/api/cities").status_code == 200
+    print(time.perf_counter() - started)
+"""
+
+
+def _python(code, *options, **environment):
+    result = subprocess.run([sys.executable, *options, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                            check=True, env={**os.environ, **environment})
+    return result.stdout, result.stderr
+
+
+def import_times():
+    """
+    Returns:
+        list: (module, cumulative µs) of main and then of every module main
+        imports directly, from -X importtime
+    """
+    _, stderr = _python("import main", "-X", "importtime")
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, module = line.removeprefix("import time:").split("|")
+        if own.strip().isdigit():
+            # One space, then two per nesting level
+            entries.append((module.strip(), int(cumulative), (len(module) - len(module.lstrip()) - 1) // 2))
+
+    # A module is listed after its own imports: main's come right before it
+    end = next(position for position, (module, _, depth) in enumerate(entries) if module == "main" and depth == 0)
+    start = end
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return [entries[end][:2]] + [(module, cumulative) for module, cumulative, depth in entries[start:end]
+                                 if depth == 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the server.")
+    parser.add_argument("--budget-ms", type=float, default=1500,
+                        help="maximum cumulative import time of main (default: 1500)")
+    arguments = parser.parse_args(argv)
+
+    (_, total), *direct = import_times()
+    total /= 1000
+    print(f"import main: {total:.0f} ms (budget {arguments.budget_ms:.0f} ms)")
+    print("slowest imports of main:")
+    for module, cumulative in sorted(direct, key=lambda item: -item[1])[:8]:
+        print(f"  {module:<32} {cumulative / 1000:8.1f} ms")
+
+    stdout, _ = _python(f"import sys, main; print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))")
+    loaded = stdout.split()
+    print(f"heavy modules loaded by import main: {', '.join(loaded) or 'none'}")
+
+    print("first GET /api/cities, startup included:")
+    for mode in ("off", "lazy", "preload"):
+        stdout, _ = _python(_FIRST_RESPONSE, PATHFINDER_RENDER_MODE=mode)
+        print(f"  PATHFINDER_RENDER_MODE={mode:<8} {float(stdout) * 1000:8.0f} ms")
+
+    failed = total > arguments.budget_ms or loaded
+    print("FAILED" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
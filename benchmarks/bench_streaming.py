@@ -0,0 +1,42 @@
+"""
+Time to first result of the lazy Yen generator (iter_shortest_paths, used
+by /api/routes/stream) against the time to all k paths (k_shortest_paths,
+used by /api/routes), on synthetic grids.
+
+Run with:
+    python -m benchmarks.bench_streaming
+"""
+import random
+import time
+
+from compiled_graph import CompiledGraph
+from pathfinding import iter_shortest_paths
+from benchmarks.synthetic import grid_road_network
+
+
+def main(sides=(20, 40), k=3, queries=10, seed=0):
+    rng = random.Random(seed)
+    print(f"{'nodes':>7} {'first path':>12} {'all ' + str(k) + ' paths':>12}")
+
+    for side in sides:
+        generated, generated_pos = grid_road_network(side, side, seed=seed)
+        graph = CompiledGraph.from_dict(generated, generated_pos)
+        nodes = list(generated)
+        first_total = all_total = 0.0
+
+        for _ in range(queries):
+            start, end = rng.sample(nodes, 2)
+            started = time.perf_counter()
+            paths = iter_shortest_paths(graph, start, end, engine="astar")
+            next(paths)
+            first_total += time.perf_counter() - started
+            for _ in range(k - 1):
+                if next(paths, None) is None:
+                    break
+            all_total += time.perf_counter() - started
+
+        print(f"{len(graph):>7} {first_total / queries * 1000:>9.1f} ms {all_total / queries * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Benchmark suite: one run measures the hot paths of the server and saves
+the results as JSON, so they can be compared between commits.
+
+- dijkstra: one query on synthetic networks of growing size
+- k_shortest_paths: varying k and max_ratio
+- is_path_different: one call against the paths already found
+- visualize_route: cold and warm renders on graph.py
+- http: load test of POST /api/routes through an in-process ASGI client
+  (throughput, p50 and p99 latency), with the route cache disabled
+
+Every metric named *_ms or *_us is a time (lower is better) and every
+*_per_s metric a rate (higher is better). Measurements are taken in
+passes over all the queries of a benchmark, after a warm-up pass, and the
+best pass of each query is kept, as timeit does. The "noise" of a result
+is the relative spread between its passes: how much slower the typical
+pass was than the fastest. Regressions are only flagged on medians and
+throughput of results whose noise is below the threshold in both runs;
+tail latencies and noisier results are printed but not gated on.
+
+Slow phases of a shared machine can also outlast a whole benchmark, so
+before reporting regressions --compare runs the benchmarks concerned
+again (--confirm times, 2 by default) keeping the best value of each
+metric: a real regression persists, a slow phase does not.
+
+Run with:
+    python -m benchmarks.suite                            # writes benchmarks/results/<commit>.json
+    python -m benchmarks.suite --sizes 1000 1000000       # up to 1M nodes
+    python -m benchmarks.suite --only dijkstra http --compare benchmarks/results/abc1234.json
+
+With --compare, gated metrics still worse by more than --threshold (25%)
+after the confirmation runs are reported as regressions and the exit
+status is 1.
+"""
+import argparse
+import asyncio
+import functools
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from pathfinding import dijkstra, is_path_different, k_shortest_paths
+from benchmarks.synthetic import road_network_graph
+
+
+RESULTS_DIRECTORY = os.path.join(os.path.dirname(__file__), "results")
+
+# Timed passes over the queries of each benchmark
+REPEAT = 5
+
+
+def _summary(durations, unit="ms", noise=None):
+    scale = 1000 if unit == "ms" else 1_000_000
+    durations = sorted(durations)
+    summary = {
+        f"median_{unit}": statistics.median(durations) * scale,
+        f"p99_{unit}": durations[min(len(durations) - 1, int(len(durations) * 0.99))] * scale,
+        "samples": len(durations),
+    }
+    if noise is not None:
+        summary["noise"] = noise
+    return summary
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def _spread(durations):
+    # Relative distance from the best duration to the typical one
+    best = min(durations)
+    return statistics.median(durations) / best - 1 if best > 0 else 0.0
+
+
+def _passes(repeat, calls):
+    """
+    Times every call (function without arguments) once per pass: a warm-up
+    pass, then repeat timed passes. Interleaving the calls rather than
+    repeating each one back to back lets slow phases of the machine show
+    up as a spread between passes. Garbage collection is off while timing,
+    as in timeit.
+
+    Returns:
+        tuple: (best duration of each call, noise: spread of the pass medians)
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for call in calls:
+            call()
+        passes = [[_timed(call) for call in calls] for _ in range(repeat)]
+    finally:
+        if enabled:
+            gc.enable()
+
+    # Slower passes measure other load on the machine, not the code
+    best = [min(durations) for durations in zip(*passes)]
+    return best, _spread([statistics.median(durations) for durations in passes])
+
+
+def bench_dijkstra(sizes, seed, repeat=REPEAT):
+    results = {}
+    for nodes in sizes:
+        graph = road_network_graph(nodes, seed=seed)
+        rng = random.Random(seed)
+        # Fewer queries on the large networks, where one takes seconds
+        queries = max(3, min(50, 2_000_000 // len(graph)))
+        pairs = [rng.sample(graph.names, 2) for _ in range(queries)]
+        durations, noise = _passes(repeat, [functools.partial(dijkstra, graph, start, end) for start, end in pairs])
+        results[f"dijkstra/{nodes}"] = {
+            "nodes": len(graph),
+            "edges": graph.edge_count,
+            **_summary(durations, noise=noise),
+        }
+    return results
+
+
+def bench_k_shortest_paths(seed, nodes=2_500, queries=10, ks=(1, 3, 5), max_ratios=(1.01, 1.05, 1.5),
+                           repeat=REPEAT):
+    graph = road_network_graph(nodes, seed=seed)
+    rng = random.Random(seed)
+    pairs = [rng.sample(graph.names, 2) for _ in range(queries)]
+
+    results = {}
+    for k in ks:
+        for max_ratio in max_ratios:
+            durations, noise = _passes(repeat, [functools.partial(k_shortest_paths, graph, start, end, k=k,
+                                                                  max_ratio=max_ratio)
+                                                for start, end in pairs])
+            found = sum(len(k_shortest_paths(graph, start, end, k=k, max_ratio=max_ratio)) for start, end in pairs)
+            results[f"k_shortest_paths/k={k},max_ratio={max_ratio}"] = {
+                "nodes": len(graph),
+                "paths_per_query": found / queries,
+                **_summary(durations, noise=noise),
+            }
+    return results
+
+
+def bench_is_path_different(seed, nodes=2_500, calls=2_000, repeat=REPEAT):
+    graph = road_network_graph(nodes, seed=seed)
+    rng = random.Random(seed)
+    # A pair with several alternatives, so the new path is compared to each
+    paths = []
+    while len(paths) < 5:
+        paths = k_shortest_paths(graph, *rng.sample(graph.names, 2), k=5, max_ratio=2.0)
+    new_path, existing = paths[-1][1], paths[:-1]
+
+    # One sample per batch of calls, since a single call takes microseconds
+    batch = 100
+
+    def run_batch():
+        for _ in range(batch):
+            is_path_different(new_path, existing)
+
+    durations, noise = _passes(repeat, [run_batch] * (calls // batch // repeat))
+    durations = [duration / batch for duration in durations]
+
+    return {"is_path_different": {
+        "path_length": len(new_path),
+        "existing_paths": len(existing),
+        **_summary(durations, unit="us", noise=noise),
+    }}
+
+
+def bench_visualize_route(seed, renders=10, repeat=3):
+    from graph import cities_graph
+    from visualizer import visualize_route
+
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(renders + 1):
+        start, end = rng.sample(list(cities_graph), 2)
+        queries.append((k_shortest_paths(cities_graph, start, end, k=3), start, end))
+
+    # The first render also draws the base map
+    first = _timed(visualize_route, cities_graph, *queries[0])
+    durations, noise = _passes(repeat, [functools.partial(visualize_route, cities_graph, *query)
+                                        for query in queries[1:]])
+    return {"visualize_route": {"first_ms": first * 1000, **_summary(durations, noise=noise)}}
+
+
+def bench_http(seed, requests=200, concurrency=8, repeat=3):
+    import httpx
+
+    import main as server
+    from route_cache import RouteCache
+    from benchmarks.bench_http_routes import _load
+
+    rng = random.Random(seed)
+    server.route_cache = RouteCache(max_entries=0)
+    pairs = [rng.sample(server.CITY_NAMES, 2) for _ in range(requests)]
+    calls = [("POST", "/api/routes", {"json": {"start_city": start, "end_city": end}}) for start, end in pairs]
+
+    async def run():
+        async with server.lifespan(server.app):
+            async with httpx.AsyncClient(app=server.app, base_url="http://bench") as client:
+                return [await _load(client, calls, concurrency) for _ in range(repeat + 1)]
+
+    # After a warm-up round, the round with the best throughput is kept;
+    # noise is its spread with the others
+    rounds = asyncio.run(run())[1:]
+    throughput, p50, p99 = max(rounds)
+    return {"http/api_routes": {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_per_s": throughput,
+        "p50_ms": p50 * 1000,
+        "p99_ms": p99 * 1000,
+        "noise": _spread([1 / round_throughput for round_throughput, _, _ in rounds]),
+    }}
+
+
+BENCHMARKS = {
+    "dijkstra": lambda arguments: bench_dijkstra(arguments.sizes, arguments.seed),
+    "k_shortest_paths": lambda arguments: bench_k_shortest_paths(arguments.seed),
+    "is_path_different": lambda arguments: bench_is_path_different(arguments.seed),
+    "visualize_route": lambda arguments: bench_visualize_route(arguments.seed),
+    "http": lambda arguments: bench_http(arguments.seed),
+}
+
+
+def _git(*command):
+    try:
+        return subprocess.run(["git", *command], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(arguments):
+    """
+    Describes the run: commit, uncommitted changes, interpreter, machine
+    and parameters.
+    """
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": arguments.seed,
+        "sizes": arguments.sizes,
+    }
+
+
+def keep_best(results, rerun):
+    """
+    Merges the results of a confirmation run into results, keeping the
+    best value of each time or rate and the lowest noise.
+    """
+    for name, metrics in rerun.items():
+        for metric, value in metrics.items():
+            current = results[name].get(metric)
+            if current is None:
+                continue
+            if metric.endswith("_per_s"):
+                results[name][metric] = max(current, value)
+            elif metric.endswith(("_ms", "_us")) or metric == "noise":
+                results[name][metric] = min(current, value)
+
+
+def compare(baseline, results, threshold):
+    """
+    Prints every metric next to its baseline value. Medians and throughput
+    are gated unless the result's noise (in either run) is at or above
+    threshold: those are flagged "noisy" instead.
+
+    Returns:
+        list: Names of the metrics that regressed by more than threshold
+    """
+    regressions = []
+    print(f"\n{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metrics in results.items():
+        noise = max(metrics.get("noise", 0.0), baseline.get(name, {}).get("noise", 0.0))
+        for metric, value in metrics.items():
+            before = baseline.get(name, {}).get(metric)
+            higher_is_better = metric.endswith("_per_s")
+            if before is None or not (higher_is_better or metric.endswith(("_ms", "_us"))) or not before:
+                continue
+            change = value / before - 1
+            worse = -change if higher_is_better else change
+            gated = higher_is_better or metric.startswith(("median_", "p50_"))
+            flag = ""
+            if gated and worse > threshold:
+                flag = f"  noisy ({noise:.0%})" if noise >= threshold else "  REGRESSION"
+            if flag == "  REGRESSION":
+                regressions.append(f"{name} {metric}")
+            print(f"{name + ' ' + metric:<52} {before:>12.3f} {value:>12.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def run_benchmarks(names, arguments):
+    """
+    Runs the named benchmarks and prints their results.
+
+    Returns:
+        dict: Result name -> metrics
+    """
+    results = {}
+    for name in names:
+        started = time.perf_counter()
+        results.update(BENCHMARKS[name](arguments))
+        print(f"{name:<20} done in {time.perf_counter() - started:6.1f}s")
+
+    for name, metrics in results.items():
+        print(f"  {name:<48} " + "  ".join(
+            f"{metric} {value:.3f}" if isinstance(value, float) else f"{metric} {value}"
+            for metric, value in metrics.items()))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and save the results as JSON.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000],
+                        help="network sizes for dijkstra (default: 1000 10000 100000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown reported as a regression (default: 0.25)")
+    parser.add_argument("--confirm", type=int, default=2,
+                        help="runs of the regressed benchmarks before reporting them (default: 2)")
+    arguments = parser.parse_args(argv)
+
+    results = run_benchmarks(arguments.only or list(BENCHMARKS), arguments)
+
+    regressions = []
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline["results"], results, arguments.threshold)
+        for _ in range(arguments.confirm):
+            if not regressions:
+                break
+            # Result names are "<benchmark>" or "<benchmark>/<variant>"
+            names = sorted({regression.split()[0].split("/")[0] for regression in regressions})
+            print(f"\nConfirming {len(regressions)} regression(s): running {' '.join(names)} again")
+            keep_best(results, run_benchmarks(names, arguments))
+            regressions = compare(baseline["results"], results, arguments.threshold)
+
+    run = {"meta": metadata(arguments), "results": results}
+    output = arguments.output
+    if output is None:
+        os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+        output = os.path.join(RESULTS_DIRECTORY, f"{run['meta']['commit'] or 'results'}.json")
+    with open(output, "w") as file:
+        json.dump(run, file, indent=2)
+    print(f"Results written to {output}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {arguments.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
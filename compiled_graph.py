@@ -0,0 +1,489 @@
+import math
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+
+EARTH_RADIUS_KM = 6371.0
+
+_MAGIC = b"PFGR1\n"
+_HEADER = struct.Struct("<qqq")
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """
+    Great-circle distance in km between two (longitude, latitude) points
+    given in degrees.
+    """
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    h = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+class CompiledGraph:
+    """
+    Immutable, compact representation of a road network.
+
+    City names are interned to integer ids (0 .. n-1) and the adjacency is
+    stored in compressed sparse row (CSR) form: the outgoing edges of node u
+    are targets[offsets[u]:offsets[u + 1]] with the matching weights.
+    Coordinates, when available, are stored as two parallel arrays.
+
+    Attributes:
+        names: Tuple of city names indexed by node id
+        index: Dictionary mapping city name to node id
+        offsets: array('q') of length n + 1
+        targets: array('i') of length m (edge heads)
+        weights: array('d') of length m (edge lengths in km)
+        longitudes, latitudes: array('d') of length n (NaN when unknown)
+        filename: Snapshot file the arrays are mapped from (see load), or None
+
+    A graph loaded from a snapshot holds read-only memoryviews over the
+    mapped file instead of arrays; they index the same way.
+    """
+
+    def __init__(self, names, offsets, targets, weights, longitudes=None, latitudes=None, index=None):
+        self.filename = None
+        self.names = tuple(names)
+        self.index = index if index is not None else {name: node for node, name in enumerate(self.names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+        if longitudes is None or latitudes is None:
+            longitudes = array('d', [float('nan')]) * len(self.names)
+            latitudes = array('d', [float('nan')]) * len(self.names)
+        self.longitudes = longitudes
+        self.latitudes = latitudes
+        self._heuristic_scale = None
+        self._reverse = None
+        self._version = None
+        self._symmetric = None
+
+    @classmethod
+    def from_dict(cls, graph, positions=None):
+        """
+        Builds a compiled graph from a dict-of-dicts adjacency such as
+        graph.cities_graph and an optional {city: (longitude, latitude)}
+        mapping such as graph.pos.
+
+        Returns:
+            CompiledGraph: The compiled graph
+        """
+        names = list(graph)
+        index = {name: node for node, name in enumerate(names)}
+
+        # Neighbours that are not keys of the dict still get an id
+        for neighbors in graph.values():
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    index[neighbor] = len(names)
+                    names.append(neighbor)
+
+        offsets = array('q', [0])
+        targets = array('i')
+        weights = array('d')
+
+        for name in names:
+            for neighbor, weight in graph.get(name, {}).items():
+                targets.append(index[neighbor])
+                weights.append(weight)
+            offsets.append(len(targets))
+
+        longitudes = array('d')
+        latitudes = array('d')
+        positions = positions or {}
+        for name in names:
+            longitude, latitude = positions.get(name, (float('nan'), float('nan')))
+            longitudes.append(longitude)
+            latitudes.append(latitude)
+
+        return cls(names, offsets, targets, weights, longitudes, latitudes)
+
+    def save(self, filename):
+        """
+        Writes the graph to a binary snapshot: a header, then the CSR and
+        coordinate arrays (each aligned on 8 bytes) and the city names.
+        The file is replaced atomically, so processes that mapped the
+        previous snapshot keep a consistent view of it.
+        """
+        names = "\0".join(self.names).encode("utf-8")
+        temporary = f"{filename}.tmp"
+
+        with open(temporary, "wb") as file:
+            file.write(_MAGIC)
+            file.write(_HEADER.pack(len(self.names), len(self.targets), len(names)))
+            for typecode, values in (('q', self.offsets), ('i', self.targets), ('d', self.weights),
+                                     ('d', self.longitudes), ('d', self.latitudes)):
+                file.write(b"\0" * (-file.tell() % 8))
+                array(typecode, values).tofile(file)
+            file.write(names)
+
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Maps a snapshot written by save() into memory. The arrays are not
+        copied: they are views over the file, so loading takes about the
+        time needed to read the city names, and processes that load the
+        same snapshot share its pages.
+
+        Raises:
+            ValueError: If the file is not a graph snapshot
+        """
+        if sys.byteorder != "little":
+            raise ValueError("Graph snapshots can only be loaded on little-endian machines")
+
+        with open(filename, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(buffer)
+        if view[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{filename} is not a graph snapshot")
+
+        node_count, edge_count, names_size = _HEADER.unpack_from(view, len(_MAGIC))
+        position = len(_MAGIC) + _HEADER.size
+
+        def read(typecode, count):
+            nonlocal position
+            position += -position % 8
+            size = count * struct.calcsize(typecode)
+            values = view[position:position + size].cast(typecode)
+            position += size
+            return values
+
+        offsets = read('q', node_count + 1)
+        targets = read('i', edge_count)
+        weights = read('d', edge_count)
+        longitudes = read('d', node_count)
+        latitudes = read('d', node_count)
+        names = bytes(view[position:position + names_size]).decode("utf-8").split("\0") if node_count else []
+
+        graph = cls(names, offsets, targets, weights, longitudes, latitudes)
+        graph.filename = filename
+        return graph
+
+    def with_edge_weights(self, changes, reference=None):
+        """
+        Copy-on-write edit: returns a new graph in which every edge u → v of
+        changes has the given weight (the edge is added if missing) or is
+        removed (weight None). This graph is left unchanged, so searches
+        running on it are not affected; names, index and coordinates are
+        shared with the new graph.
+
+        Edited rows are kept in a canonical order, so that the same edges
+        always give the same version whatever the edits that led to them:
+        edges of the reference graph in its order, then the others by
+        target. A road closed then reopened goes back to its position, and
+        the graph to the version of the reference.
+
+        The A* scale factor and the symmetry flag, when already computed,
+        are repaired from the changed edges instead of being recomputed over
+        the whole graph.
+
+        Args:
+            changes: Dictionary {(u, v): weight or None} keyed by node ids
+            reference: Graph with the same cities whose row order is kept
+                       (default: this graph), e.g. the graph edits started
+                       from
+
+        Returns:
+            CompiledGraph: The new graph
+        """
+        by_source = {}
+        for (u, v), weight in changes.items():
+            by_source.setdefault(u, {})[v] = weight
+        if reference is None:
+            reference = self
+
+        offsets = array('q', [0])
+        targets = array('i')
+        weights = array('d')
+
+        for u in range(len(self.names)):
+            start, end = self.offsets[u], self.offsets[u + 1]
+            edits = by_source.get(u)
+
+            if edits is None:
+                targets.extend(self.targets[start:end])
+                weights.extend(self.weights[start:end])
+            else:
+                row = dict(self.neighbors(u))
+                for v, weight in edits.items():
+                    if weight is None:
+                        row.pop(v, None)
+                    else:
+                        row[v] = weight
+
+                position = {v: rank for rank, (v, _) in enumerate(reference.neighbors(u))}
+                for v in sorted(row, key=lambda v: (position.get(v, len(position)), v)):
+                    targets.append(v)
+                    weights.append(row[v])
+
+            offsets.append(len(targets))
+
+        graph = CompiledGraph(self.names, offsets, targets, weights, self.longitudes, self.latitudes,
+                              index=self.index)
+
+        # Removed or longer edges keep the old factor admissible; only added
+        # or shorter edges can lower it
+        if self._heuristic_scale is not None:
+            scale = self._heuristic_scale
+            for (u, v), weight in changes.items():
+                if weight is not None and scale > 0:
+                    straight = haversine_km(self.longitudes[u], self.latitudes[u],
+                                            self.longitudes[v], self.latitudes[v])
+                    if straight > 0:
+                        scale = min(scale, weight / straight)
+            graph._heuristic_scale = max(scale, 0.0)
+
+        # A symmetric graph stays symmetric if every changed pair still is;
+        # from an asymmetric one, is_symmetric is left to compute
+        if self._symmetric:
+            graph._symmetric = all(graph.edge_weight(u, v) == graph.edge_weight(v, u) for u, v in changes)
+
+        return graph
+
+    def edge_changes(self, other):
+        """
+        Edge edits that turn this graph into other, in the form taken by
+        with_edge_weights.
+
+        Returns:
+            dict: {(u, v): weight or None}, or None if the graphs don't have
+            the same cities
+        """
+        if other.names != self.names:
+            return None
+
+        changes = {}
+        for u in range(len(self.names)):
+            mine = dict(self.neighbors(u))
+            theirs = dict(other.neighbors(u))
+            if mine == theirs:
+                continue
+            for v in mine:
+                if v not in theirs:
+                    changes[(u, v)] = None
+            for v, weight in theirs.items():
+                if mine.get(v) != weight:
+                    changes[(u, v)] = weight
+        return changes
+
+    def __reduce__(self):
+        # A mapped graph is sent to other processes as its file name, so
+        # worker processes map the same pages instead of receiving a copy
+        if self.filename is not None:
+            return _load_snapshot, (self.filename, self.version)
+        return super().__reduce__()
+
+    def as_dict(self):
+        """
+        Read-only dict-of-dicts view of the graph (see GraphView), for code
+        written against graph.cities_graph.
+        """
+        return GraphView(self)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    @property
+    def version(self):
+        """
+        Content hash of the graph (names, adjacency, weights and coordinates)
+        as an 8-digit hex string. Two graphs with the same content have the
+        same version, so it can key caches shared between processes.
+        """
+        if self._version is None:
+            checksum = zlib.crc32("\0".join(self.names).encode("utf-8"))
+            for values in (self.offsets, self.targets, self.weights, self.longitudes, self.latitudes):
+                checksum = zlib.crc32(bytes(values), checksum)
+            self._version = f"{checksum:08x}"
+        return self._version
+
+    @property
+    def is_symmetric(self):
+        """
+        True if every edge u → v has a matching edge v → u of the same weight,
+        in which case the routes from b to a are the routes from a to b reversed.
+        """
+        if self._symmetric is None:
+            edges = {}
+            for u in range(len(self.names)):
+                for edge in range(self.offsets[u], self.offsets[u + 1]):
+                    edges[(u, self.targets[edge])] = self.weights[edge]
+            self._symmetric = all(edges.get((v, u)) == weight for (u, v), weight in edges.items())
+        return self._symmetric
+
+    @property
+    def heuristic_scale(self):
+        """
+        Factor s such that s * haversine_km(u, v) never exceeds the weight of
+        edge u → v. Multiplying the great-circle distance to the target by s
+        gives an admissible and consistent A* heuristic, even when some
+        roads are shorter than the straight line between their endpoints.
+
+        Returns 0.0 (no heuristic) if any node has no coordinates.
+        """
+        if self._heuristic_scale is None:
+            scale = 1.0
+            longitudes, latitudes = self.longitudes, self.latitudes
+
+            if any(math.isnan(value) for value in longitudes) or any(math.isnan(value) for value in latitudes):
+                scale = 0.0
+            else:
+                for u in range(len(self.names)):
+                    for edge in range(self.offsets[u], self.offsets[u + 1]):
+                        v = self.targets[edge]
+                        straight = haversine_km(longitudes[u], latitudes[u], longitudes[v], latitudes[v])
+                        if straight > 0:
+                            scale = min(scale, self.weights[edge] / straight)
+
+            self._heuristic_scale = max(scale, 0.0)
+        return self._heuristic_scale
+
+    @property
+    def reverse(self):
+        """
+        Reverse adjacency in CSR form, built on first use: the incoming edges
+        of node v are reverse_sources[reverse_offsets[v]:reverse_offsets[v + 1]],
+        and reverse_edges holds the matching forward CSR edge indices (so
+        weights and banned edges are shared with the forward direction).
+
+        Returns:
+            tuple: (reverse_offsets, reverse_sources, reverse_edges)
+        """
+        if self._reverse is None:
+            node_count = len(self.names)
+            counts = [0] * (node_count + 1)
+            for v in self.targets:
+                counts[v + 1] += 1
+            for v in range(node_count):
+                counts[v + 1] += counts[v]
+
+            reverse_offsets = array('q', counts)
+            reverse_sources = array('i', bytes(4 * len(self.targets)))
+            reverse_edges = array('q', bytes(8 * len(self.targets)))
+            position = counts[:-1]
+
+            for u in range(node_count):
+                for edge in range(self.offsets[u], self.offsets[u + 1]):
+                    v = self.targets[edge]
+                    reverse_sources[position[v]] = u
+                    reverse_edges[position[v]] = edge
+                    position[v] += 1
+
+            self._reverse = (reverse_offsets, reverse_sources, reverse_edges)
+        return self._reverse
+
+    def node_id(self, name):
+        """
+        Returns the integer id of a city, or None if it is unknown.
+        """
+        return self.index.get(name)
+
+    def neighbors(self, node):
+        """
+        Yields (neighbor_id, weight) pairs for the outgoing edges of a node.
+        """
+        for edge in range(self.offsets[node], self.offsets[node + 1]):
+            yield self.targets[edge], self.weights[edge]
+
+    def edge_index(self, u, v):
+        """
+        Returns the CSR index of edge u → v, or None if the edge doesn't exist.
+        """
+        for edge in range(self.offsets[u], self.offsets[u + 1]):
+            if self.targets[edge] == v:
+                return edge
+        return None
+
+    def edge_weight(self, u, v):
+        """
+        Returns the weight of edge u → v, or None if the edge doesn't exist.
+        """
+        edge = self.edge_index(u, v)
+        if edge is None:
+            return None
+        return self.weights[edge]
+
+    def path_names(self, path):
+        """
+        Converts a list of node ids to a list of city names.
+        """
+        names = self.names
+        return [names[node] for node in path]
+
+
+def _load_snapshot(filename, version):
+    graph = CompiledGraph.load(filename)
+    if graph.version != version:
+        raise ValueError(f"{filename} changed since it was loaded")
+    return graph
+
+
+class GraphView(Mapping):
+    """
+    Read-only dict-of-dicts view of a CompiledGraph, with the same shape as
+    graph.cities_graph ({city: {neighbor: distance}}), plus the matching
+    pos mapping ({city: (longitude, latitude)}).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        return _NeighborsView(self.graph, self.graph.index[name])
+
+    def __iter__(self):
+        return iter(self.graph.names)
+
+    def __len__(self):
+        return len(self.graph)
+
+    @property
+    def version(self):
+        return self.graph.version
+
+    @property
+    def pos(self):
+        graph = self.graph
+        return {name: (graph.longitudes[node], graph.latitudes[node])
+                for node, name in enumerate(graph.names)}
+
+
+class _NeighborsView(Mapping):
+    """
+    Read-only {neighbor: distance} view of the outgoing edges of a node.
+    """
+
+    def __init__(self, graph, node):
+        self.graph = graph
+        self.node = node
+
+    def __getitem__(self, name):
+        neighbor = self.graph.index.get(name)
+        weight = self.graph.edge_weight(self.node, neighbor) if neighbor is not None else None
+        if weight is None:
+            raise KeyError(name)
+        return weight
+
+    def __iter__(self):
+        names = self.graph.names
+        for neighbor, _ in self.graph.neighbors(self.node):
+            yield names[neighbor]
+
+    def __len__(self):
+        return self.graph.offsets[self.node + 1] - self.graph.offsets[self.node]
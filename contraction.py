@@ -0,0 +1,391 @@
+import heapq
+import mmap
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+
+_MAGIC = b"PFCH1\n"
+_HEADER = struct.Struct("<qqqI")
+
+# Witness searches give up after settling this many nodes; a shortcut is
+# then added even if it might not be needed, which is always safe.
+WITNESS_SETTLE_LIMIT = 50
+
+
+def _graph_checksum(graph):
+    """
+    Checksum of the CSR arrays, stored with a hierarchy so it cannot be
+    loaded against a different graph.
+    """
+    checksum = zlib.crc32(bytes(graph.offsets))
+    checksum = zlib.crc32(bytes(graph.targets), checksum)
+    return zlib.crc32(bytes(graph.weights), checksum)
+
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy built from a CompiledGraph.
+
+    Nodes are contracted one by one in order of importance (rank). When a
+    node is contracted, shortcut edges are added between its remaining
+    neighbours wherever it lay on the only shortest path between them.
+    A query then only needs two small Dijkstra searches that only go
+    "upward" in rank: forward from the start, backward from the end.
+
+    Both upward graphs are stored in CSR form. Every edge keeps the node
+    it bypasses (middle, -1 for original roads) so shortcuts can be
+    unpacked into the original path.
+
+    Attributes:
+        graph: The CompiledGraph the hierarchy was built from
+        rank: array('i') with the contraction order of every node
+        forward: (offsets, targets, weights, middles) of upward edges u → v
+        backward: (offsets, sources, weights, middles) of upward edges v ← u,
+                  stored at v, for the backward search
+    """
+
+    def __init__(self, graph, rank, forward, backward):
+        self.graph = graph
+        self.rank = rank
+        self.forward = forward
+        self.backward = backward
+
+    @classmethod
+    def build(cls, graph, order=None):
+        """
+        Contracts every node of graph, ordered by edge difference (shortcuts
+        added minus edges removed) plus the number of already contracted
+        neighbours, with lazy priority updates.
+
+        When order is given (the rank of a hierarchy of a previous version
+        of the graph), nodes are contracted in that order instead, which
+        skips the priority simulations: after a few edge weights change,
+        the old order is still a good one and only the shortcuts need to
+        be recomputed.
+
+        Returns:
+            ContractionHierarchy: The hierarchy
+        """
+        node_count = len(graph)
+        out_edges = [dict() for _ in range(node_count)]
+        in_edges = [dict() for _ in range(node_count)]
+
+        for u in range(node_count):
+            for edge in range(graph.offsets[u], graph.offsets[u + 1]):
+                v = graph.targets[edge]
+                weight = graph.weights[edge]
+                if u != v and weight < out_edges[u].get(v, (float('inf'), -1))[0]:
+                    out_edges[u][v] = (weight, -1)
+                    in_edges[v][u] = (weight, -1)
+
+        contracted = bytearray(node_count)
+        contracted_neighbors = [0] * node_count
+        up_forward = [None] * node_count
+        up_backward = [None] * node_count
+        rank = array('i', bytes(4 * node_count))
+
+        def shortcuts_for(v):
+            shortcuts = []
+            for u, (in_weight, _) in in_edges[v].items():
+                targets = {w: in_weight + out_weight
+                           for w, (out_weight, _) in out_edges[v].items() if w != u}
+                if not targets:
+                    continue
+                witnessed = _witness_search(out_edges, u, v, targets, max(targets.values()))
+                for w, distance in targets.items():
+                    if witnessed.get(w, float('inf')) > distance:
+                        shortcuts.append((u, w, distance))
+            return shortcuts
+
+        def simulate(v):
+            shortcuts = shortcuts_for(v)
+            removed = len(in_edges[v]) + len(out_edges[v])
+            return len(shortcuts) - removed + contracted_neighbors[v], shortcuts
+
+        if order is not None:
+            heap = [(order[v], v) for v in range(node_count)]
+        else:
+            heap = [(simulate(v)[0], v) for v in range(node_count)]
+        heapq.heapify(heap)
+        level = 0
+
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+
+            if order is not None:
+                shortcuts = shortcuts_for(v)
+            else:
+                # Lazy update: re-evaluate and push back if no longer the minimum
+                current, shortcuts = simulate(v)
+                if heap and current > heap[0][0]:
+                    heapq.heappush(heap, (current, v))
+                    continue
+
+            up_forward[v] = [(w, weight, middle) for w, (weight, middle) in out_edges[v].items()]
+            up_backward[v] = [(u, weight, middle) for u, (weight, middle) in in_edges[v].items()]
+
+            for u, w, distance in shortcuts:
+                if distance < out_edges[u].get(w, (float('inf'), -1))[0]:
+                    out_edges[u][w] = (distance, v)
+                    in_edges[w][u] = (distance, v)
+
+            for w in out_edges[v]:
+                del in_edges[w][v]
+                contracted_neighbors[w] += 1
+            for u in in_edges[v]:
+                del out_edges[u][v]
+                contracted_neighbors[u] += 1
+            out_edges[v] = {}
+            in_edges[v] = {}
+
+            contracted[v] = 1
+            rank[v] = level
+            level += 1
+
+        return cls(graph, rank, _to_csr(up_forward), _to_csr(up_backward))
+
+    @property
+    def edge_count(self):
+        return len(self.forward[1]) + len(self.backward[1])
+
+    @property
+    def shortcut_count(self):
+        return sum(1 for middle in self.forward[3] if middle >= 0) + \
+            sum(1 for middle in self.backward[3] if middle >= 0)
+
+    @property
+    def index_size(self):
+        """
+        Size in bytes of the hierarchy arrays (what save() writes to disk).
+        """
+        arrays = (self.rank,) + self.forward + self.backward
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Bidirectional upward Dijkstra between two node ids. Each direction
+        stops once its heap top is not smaller than the best meeting
+        distance found so far.
+
+        Returns:
+            tuple: (total_distance, path) where path is a list of node ids
+        """
+        if source == target:
+            if stats is not None:
+                stats.searches += 1
+                stats.settled += 1
+            return 0, [source]
+
+        forward_distances, forward_parents = {source: 0}, {source: None}
+        backward_distances, backward_parents = {target: 0}, {target: None}
+        searches = (
+            (self.forward, forward_distances, forward_parents, [(0, source)], set()),
+            (self.backward, backward_distances, backward_parents, [(0, target)], set()),
+        )
+        best = float('inf')
+        meeting_node = None
+        active = True
+
+        while active:
+            active = False
+            for (offsets, neighbors, weights, _), distances, parents, heap, visited in searches:
+                if not heap or heap[0][0] >= best:
+                    continue
+                active = True
+
+                current_distance, current = heapq.heappop(heap)
+                if current in visited:
+                    continue
+                visited.add(current)
+
+                other_distances = backward_distances if distances is forward_distances else forward_distances
+                if current in other_distances and current_distance + other_distances[current] < best:
+                    best = current_distance + other_distances[current]
+                    meeting_node = current
+
+                for edge in range(offsets[current], offsets[current + 1]):
+                    neighbor = neighbors[edge]
+                    new_distance = current_distance + weights[edge]
+                    if new_distance < distances.get(neighbor, float('inf')):
+                        distances[neighbor] = new_distance
+                        parents[neighbor] = current
+                        heapq.heappush(heap, (new_distance, neighbor))
+
+        if stats is not None:
+            stats.searches += 1
+            stats.settled += len(searches[0][4]) + len(searches[1][4])
+            for (offsets, *_), *_, visited in searches:
+                stats.relaxed += sum(offsets[node + 1] - offsets[node] for node in visited)
+
+        if meeting_node is None:
+            return float('inf'), []
+
+        up_path = []
+        node = meeting_node
+        while node is not None:
+            up_path.append(node)
+            node = forward_parents[node]
+        up_path.reverse()
+
+        node = backward_parents[meeting_node]
+        while node is not None:
+            up_path.append(node)
+            node = backward_parents[node]
+
+        path = [up_path[0]]
+        for u, v in zip(up_path, up_path[1:]):
+            self._unpack(u, v, path)
+
+        return best, path
+
+    def _edge_middle(self, u, v):
+        """
+        Returns the middle node of hierarchy edge u → v (-1 for a road).
+        The edge is stored at its lower-ranked endpoint.
+        """
+        if self.rank[u] < self.rank[v]:
+            offsets, neighbors, _, middles = self.forward
+            node, other = u, v
+        else:
+            offsets, neighbors, _, middles = self.backward
+            node, other = v, u
+
+        for edge in range(offsets[node], offsets[node + 1]):
+            if neighbors[edge] == other:
+                return middles[edge]
+        raise KeyError((u, v))
+
+    def _unpack(self, u, v, path):
+        """
+        Appends the original nodes of hierarchy edge u → v (excluding u).
+        """
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            middle = self._edge_middle(a, b)
+            if middle < 0:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+
+    def save(self, filename):
+        """
+        Writes the hierarchy to a binary file.
+        """
+        arrays = (self.rank,) + self.forward + self.backward
+        with open(filename, "wb") as file:
+            file.write(_MAGIC)
+            file.write(_HEADER.pack(len(self.rank), len(self.forward[1]), len(self.backward[1]),
+                                    _graph_checksum(self.graph)))
+            for values in arrays:
+                file.write(values)
+
+    @classmethod
+    def load(cls, filename, graph):
+        """
+        Maps a hierarchy written by save() for the given graph into memory.
+        Like CompiledGraph.load, the arrays are read-only views over the
+        file, shared by every process that loads it.
+
+        Raises:
+            ValueError: If the file is not a hierarchy or was built from a different graph
+        """
+        with open(filename, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(buffer)
+        if view[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{filename} is not a contraction hierarchy file")
+
+        node_count, forward_count, backward_count, checksum = _HEADER.unpack_from(view, len(_MAGIC))
+        if node_count != len(graph) or checksum != _graph_checksum(graph):
+            raise ValueError(f"{filename} was built from a different graph")
+
+        position = len(_MAGIC) + _HEADER.size
+
+        def read(typecode, count):
+            nonlocal position
+            size = count * struct.calcsize(typecode)
+            values = view[position:position + size].cast(typecode)
+            position += size
+            return values
+
+        rank = read('i', node_count)
+        forward = (read('q', node_count + 1), read('i', forward_count),
+                   read('d', forward_count), read('i', forward_count))
+        backward = (read('q', node_count + 1), read('i', backward_count),
+                    read('d', backward_count), read('i', backward_count))
+
+        return cls(graph, rank, forward, backward)
+
+
+def _witness_search(out_edges, source, excluded, targets, max_distance):
+    """
+    Dijkstra from source in the remaining graph, skipping the node being
+    contracted, until every target is settled, the distance exceeds
+    max_distance or WITNESS_SETTLE_LIMIT nodes are settled.
+
+    Returns:
+        dict: Tentative distances from source
+    """
+    distances = {source: 0}
+    heap = [(0, source)]
+    visited = set()
+    remaining = set(targets)
+
+    while heap and remaining and len(visited) < WITNESS_SETTLE_LIMIT:
+        current_distance, current = heapq.heappop(heap)
+        if current in visited:
+            continue
+        if current_distance > max_distance:
+            break
+        visited.add(current)
+        remaining.discard(current)
+
+        for neighbor, (weight, _) in out_edges[current].items():
+            if neighbor == excluded:
+                continue
+            new_distance = current_distance + weight
+            if new_distance < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_distance
+                heapq.heappush(heap, (new_distance, neighbor))
+
+    return distances
+
+
+def _to_csr(adjacency):
+    """
+    Converts per-node lists of (neighbor, weight, middle) to CSR arrays.
+    """
+    offsets = array('q', [0])
+    neighbors = array('i')
+    weights = array('d')
+    middles = array('i')
+
+    for edges in adjacency:
+        for neighbor, weight, middle in edges or ():
+            neighbors.append(neighbor)
+            weights.append(weight)
+            middles.append(middle)
+        offsets.append(len(neighbors))
+
+    return offsets, neighbors, weights, middles
+
+
+if __name__ == "__main__":
+    # Offline preprocessing: python contraction.py graph.ch
+    # (for the snapshot named by PATHFINDER_GRAPH, or graph.py)
+    from graph_loader import load_default_graph
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "graph.ch"
+    started = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(load_default_graph())
+    hierarchy.save(output)
+    print(f"Contraction hierarchy written to {output} in {time.perf_counter() - started:.2f}s "
+          f"({hierarchy.shortcut_count} shortcuts, {hierarchy.index_size} bytes)")
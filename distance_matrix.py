@@ -0,0 +1,310 @@
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pathfinding import _shortest_path_tree
+
+
+# Graphs up to this many nodes use Floyd–Warshall, larger ones repeated Dijkstra
+FLOYD_WARSHALL_MAX_NODES = 500
+
+_MAGIC = b"PFDM1\n"
+_HEADER = struct.Struct("<qq")
+
+
+class DistanceMatrix:
+    """
+    All-pairs shortest distances of a CompiledGraph.
+
+    Attributes:
+        graph: The CompiledGraph the matrix was computed from
+        distances: n x n float array, distances[i, j] is the shortest distance
+                   from node i to node j (inf when unreachable)
+        predecessors: n x n int array, predecessors[i, j] is the node before j
+                      on the shortest path from i (-1 for j == i or unreachable)
+    """
+
+    def __init__(self, graph, distances, predecessors):
+        self.graph = graph
+        self.distances = distances
+        self.predecessors = predecessors
+
+    @classmethod
+    def compute(cls, graph, method="auto", workers=None):
+        """
+        Computes all-pairs shortest distances.
+
+        Args:
+            graph: CompiledGraph
+            method: "floyd_warshall", "dijkstra" or "auto" (Floyd–Warshall up to
+                    FLOYD_WARSHALL_MAX_NODES nodes, Dijkstra above)
+            workers: Number of processes for the Dijkstra method (default: CPU count)
+
+        Returns:
+            DistanceMatrix: The matrix
+        """
+        if method == "auto":
+            method = "floyd_warshall" if len(graph) <= FLOYD_WARSHALL_MAX_NODES else "dijkstra"
+
+        if method == "floyd_warshall":
+            return cls(graph, *_floyd_warshall(graph))
+        if method == "dijkstra":
+            return cls(graph, *_repeated_dijkstra(graph, workers))
+        raise ValueError(f"Unknown all-pairs method: {method}")
+
+    def repair(self, graph, changes):
+        """
+        Matrix of graph, an edited copy of self.graph (see
+        CompiledGraph.with_edge_weights), repaired from this matrix instead
+        of recomputed:
+
+        - rows whose shortest-path tree uses a removed or longer edge are
+          recomputed with one Dijkstra each; other rows cannot change;
+        - each added or shorter edge u → v is then applied to the whole
+          matrix at once: d[s, t] = min(d[s, t], d[s, u] + w + d[v, t]).
+
+        This matrix is left unchanged.
+
+        Args:
+            changes: Dictionary {(u, v): weight or None} keyed by node ids
+
+        Returns:
+            DistanceMatrix: The matrix of graph
+        """
+        node_count = len(graph)
+        distances = np.array(self.distances)
+        predecessors = np.array(self.predecessors)
+        longer = []
+        shorter = []
+
+        for (u, v), weight in changes.items():
+            old_weight = self.graph.edge_weight(u, v)
+            if old_weight is not None and (weight is None or weight > old_weight):
+                longer.append((u, v))
+            if weight is not None and (old_weight is None or weight < old_weight):
+                shorter.append((u, v, weight))
+
+        if longer:
+            affected = np.zeros(node_count, dtype=bool)
+            for u, v in longer:
+                affected |= predecessors[:, v] == u
+            for source in np.flatnonzero(affected):
+                distances[source], predecessors[source] = _distance_row(graph, int(source))
+
+        for u, v, weight in shorter:
+            through = distances[:, u, np.newaxis] + weight + distances[np.newaxis, v, :]
+            improved = through < distances
+            through_predecessors = np.broadcast_to(predecessors[v], (node_count, node_count)).copy()
+            through_predecessors[:, v] = u
+            distances = np.where(improved, through, distances)
+            predecessors = np.where(improved, through_predecessors, predecessors)
+
+        return DistanceMatrix(graph, distances, predecessors)
+
+    def save(self, filename):
+        """
+        Writes the matrix to a binary file: a header with the node count and
+        graph version, then the distances (float64) and predecessors (int32).
+        """
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(_MAGIC)
+            file.write(_HEADER.pack(len(self.graph), int(self.graph.version, 16)))
+            file.write(b"\0" * (-file.tell() % 8))
+            file.write(np.ascontiguousarray(self.distances, dtype=np.float64).tobytes())
+            file.write(np.ascontiguousarray(self.predecessors, dtype=np.int32).tobytes())
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename, graph, shared=True):
+        """
+        Reads a matrix written by save() for the given graph.
+
+        Args:
+            shared: Map the file read-only (numpy.memmap) instead of reading a
+                    private copy, so every process loading it shares its pages
+
+        Raises:
+            ValueError: If the file is not a distance matrix or was computed on a different graph
+        """
+        if sys.byteorder != "little":
+            raise ValueError("Distance matrices can only be loaded on little-endian machines")
+
+        with open(filename, "rb") as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{filename} is not a distance matrix file")
+            node_count, version = _HEADER.unpack(file.read(_HEADER.size))
+
+        if node_count != len(graph) or version != int(graph.version, 16):
+            raise ValueError(f"{filename} was computed on a different graph")
+
+        offset = len(_MAGIC) + _HEADER.size
+        offset += -offset % 8
+        shape = (node_count, node_count)
+        predecessors_offset = offset + node_count * node_count * 8
+
+        if shared:
+            distances = np.memmap(filename, dtype=np.float64, mode="r", offset=offset, shape=shape)
+            predecessors = np.memmap(filename, dtype=np.int32, mode="r", offset=predecessors_offset, shape=shape)
+        else:
+            distances = np.fromfile(filename, dtype=np.float64, count=node_count * node_count,
+                                    offset=offset).reshape(shape)
+            predecessors = np.fromfile(filename, dtype=np.int32, count=node_count * node_count,
+                                       offset=predecessors_offset).reshape(shape)
+
+        return cls(graph, distances, predecessors)
+
+    def path(self, source, target):
+        """
+        Reconstructs the shortest path between two node ids from the
+        predecessor matrix.
+
+        Returns:
+            list: Node ids from source to target, or [] if unreachable
+        """
+        if source == target:
+            return [source]
+        if self.predecessors[source, target] < 0:
+            return []
+
+        path = [target]
+        node = target
+        while node != source:
+            node = int(self.predecessors[source, node])
+            path.append(node)
+        return path[::-1]
+
+    def submatrix(self, origins, destinations):
+        """
+        Distances between subsets of cities.
+
+        Args:
+            origins: List of city names (rows)
+            destinations: List of city names (columns)
+
+        Returns:
+            numpy.ndarray: len(origins) x len(destinations) distances
+        """
+        rows = [self.graph.index[name] for name in origins]
+        columns = [self.graph.index[name] for name in destinations]
+        return self.distances[np.ix_(rows, columns)]
+
+
+def _floyd_warshall(graph):
+    """
+    Vectorized Floyd–Warshall: for each intermediate node k, the whole
+    matrix is relaxed at once with a broadcast of column k and row k.
+
+    Returns:
+        tuple: (distances, predecessors) arrays
+    """
+    node_count = len(graph)
+    distances = np.full((node_count, node_count), np.inf)
+    predecessors = np.full((node_count, node_count), -1, dtype=np.int32)
+
+    for u in range(node_count):
+        for edge in range(graph.offsets[u], graph.offsets[u + 1]):
+            v = graph.targets[edge]
+            if graph.weights[edge] < distances[u, v]:
+                distances[u, v] = graph.weights[edge]
+                predecessors[u, v] = u
+
+    np.fill_diagonal(distances, 0)
+    np.fill_diagonal(predecessors, -1)
+
+    for k in range(node_count):
+        through_k = distances[:, k, np.newaxis] + distances[np.newaxis, k, :]
+        improved = through_k < distances
+        distances = np.where(improved, through_k, distances)
+        predecessors = np.where(improved, predecessors[np.newaxis, k, :], predecessors)
+
+    return distances, predecessors
+
+
+_worker_graph = None
+
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _distance_row(graph, source):
+    """
+    Runs a full Dijkstra from source.
+
+    Returns:
+        tuple: (distance_row, predecessor_row) arrays
+    """
+    node_count = len(graph)
+    distances, predecessors = _shortest_path_tree(graph, source)
+    distance_row = np.full(node_count, np.inf)
+    predecessor_row = np.full(node_count, -1, dtype=np.int32)
+    for node, distance in distances.items():
+        distance_row[node] = distance
+        if predecessors[node] is not None:
+            predecessor_row[node] = predecessors[node]
+    return distance_row, predecessor_row
+
+
+def _distance_rows(sources):
+    """
+    Runs a full Dijkstra from each source in a worker process.
+
+    Returns:
+        list: (source, distance_row, predecessor_row) tuples
+    """
+    return [(source, *_distance_row(_worker_graph, source)) for source in sources]
+
+
+def _repeated_dijkstra(graph, workers=None):
+    """
+    One heap Dijkstra per source node, spread over a process pool.
+
+    Returns:
+        tuple: (distances, predecessors) arrays
+    """
+    node_count = len(graph)
+    workers = workers or os.cpu_count() or 1
+    distances = np.empty((node_count, node_count))
+    predecessors = np.empty((node_count, node_count), dtype=np.int32)
+
+    chunk_size = max(1, node_count // (workers * 4))
+    chunks = [range(start, min(start + chunk_size, node_count))
+              for start in range(0, node_count, chunk_size)]
+
+    if workers == 1:
+        _init_worker(graph)
+        results = map(_distance_rows, chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graph,))
+        results = executor.map(_distance_rows, chunks)
+
+    try:
+        for rows in results:
+            for source, distance_row, predecessor_row in rows:
+                distances[source] = distance_row
+                predecessors[source] = predecessor_row
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return distances, predecessors
+
+
+if __name__ == "__main__":
+    # Offline preprocessing: python distance_matrix.py graph.pfdm
+    # (for the snapshot named by PATHFINDER_GRAPH, or graph.py)
+    from graph_loader import load_default_graph
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "graph.pfdm"
+    started = time.perf_counter()
+    matrix = DistanceMatrix.compute(load_default_graph())
+    matrix.save(output)
+    print(f"Distance matrix written to {output} in {time.perf_counter() - started:.2f}s "
+          f"({len(matrix.graph)} x {len(matrix.graph)})")
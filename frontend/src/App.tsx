@@ -11,19 +11,24 @@ interface PathInfo {
   est_optimal: boolean
 }
 
-interface RouteResponse {
-  error: string | null
-  image_data: string | null
-  selected_start: string | null
-  selected_end: string | null
+interface RouteResults {
+  image_url: string | null
   all_paths: PathInfo[]
 }
 
+// One line of the /api/routes/stream response
+interface RouteEvent {
+  event: 'path' | 'image' | 'error'
+  path?: PathInfo
+  image_url?: string
+  error?: string
+}
+
 function App() {
   const [cities, setCities] = useState<string[]>([])
   const [startCity, setStartCity] = useState('')
   const [endCity, setEndCity] = useState('')
-  const [results, setResults] = useState<RouteResponse | null>(null)
+  const [results, setResults] = useState<RouteResults | null>(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
 
@@ -50,19 +55,40 @@ function App() {
 
     setLoading(true)
     try {
-      const response = await fetch('/api/routes', {
+      const response = await fetch('/api/routes/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ start_city: startCity, end_city: endCity }),
       })
-      const data: RouteResponse = await response.json()
-
-      if (data.error) {
-        setError(data.error)
-      } else if (data.all_paths.length > 0) {
-        setResults(data)
-      } else {
-        setError('No routes found between these cities.')
+      if (!response.body) throw new Error('No response body')
+
+      // Routes are shown as soon as each one is found
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+      let current: RouteResults = { image_url: null, all_paths: [] }
+      let buffer = ''
+
+      for (;;) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += value
+        const lines = buffer.split('\n')
+        buffer = lines.pop() ?? ''
+
+        for (const line of lines) {
+          if (!line) continue
+          const data: RouteEvent = JSON.parse(line)
+
+          if (data.event === 'error') {
+            setError(data.error ?? 'No routes found between these cities.')
+          } else if (data.event === 'path' && data.path) {
+            current = { ...current, all_paths: [...current.all_paths, data.path] }
+            setResults(current)
+            setLoading(false)
+          } else if (data.event === 'image') {
+            current = { ...current, image_url: data.image_url ?? null }
+            setResults(current)
+          }
+        }
       }
     } catch {
       setError('An error occurred while finding routes.')
@@ -140,12 +166,12 @@ function App() {
             </div>
           ))}
 
-          {results.image_data && (
+          {results.image_url && (
             <>
               <hr />
               <h4>Route Visualization:</h4>
               <img
-                src={`data:image/png;base64,${results.image_data}`}
+                src={results.image_url}
                 alt="Route graph"
                 className="visualization"
               />
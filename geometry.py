@@ -0,0 +1,116 @@
+def _coordinates(graph, path):
+    """
+    GeoJSON [longitude, latitude] positions of a path of city names.
+    """
+    index, longitudes, latitudes = graph.index, graph.longitudes, graph.latitudes
+    return [[longitudes[index[city]], latitudes[index[city]]] for city in path]
+
+
+def routes_feature_collection(graph, paths, start_city, end_city):
+    """
+    Builds a GeoJSON FeatureCollection from the result of k_shortest_paths:
+    one LineString per route, ordered by rank, plus Point features for the
+    start and end cities. Coordinates come from the CompiledGraph (graph.pos).
+
+    Returns:
+        dict: The FeatureCollection
+    """
+    features = []
+    optimal_distance = paths[0][0] if paths else None
+
+    for i, (distance, path) in enumerate(paths):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": _coordinates(graph, path)},
+            "properties": {
+                "rank": i + 1,
+                "distance": distance,
+                "difference": distance - optimal_distance,
+                "percentage": ((distance / optimal_distance) - 1) * 100 if i > 0 else 0,
+                "optimal": i == 0,
+                "cities": path,
+            },
+        })
+
+    for role, city in (("start", start_city), ("end", end_city)):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": _coordinates(graph, [city])[0]},
+            "properties": {"role": role, "city": city},
+        })
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+def convex_hull(points):
+    """
+    Convex hull of (longitude, latitude) points with Andrew's monotone
+    chain, treating coordinates as planar (fine at the scale of a service
+    area).
+
+    Returns:
+        list: Hull vertices counter-clockwise, without repeating the first
+        one; fewer than 3 points when all of them are collinear
+    """
+    points = sorted(set(points))
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower = []
+    for point in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+
+    upper = []
+    for point in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+
+    return lower[:-1] + upper[:-1]
+
+
+def reachability_feature_collection(graph, reachable):
+    """
+    Builds a GeoJSON FeatureCollection of service areas from the result of
+    reachable_within: one Feature per start city, whose geometry is the
+    convex hull of the cities closest to it (a Polygon, or a Point or
+    LineString when there are fewer than 3 cities off a line). Cities
+    without coordinates are left out.
+
+    Returns:
+        dict: The FeatureCollection
+    """
+    areas = {}
+    for city, (distance, origin) in reachable.items():
+        area = areas.setdefault(origin, {"points": [], "cities": 0, "max_distance": 0.0})
+        area["cities"] += 1
+        area["max_distance"] = max(area["max_distance"], distance)
+        longitude, latitude = _coordinates(graph, [city])[0]
+        # NaN compares unequal to itself
+        if longitude == longitude and latitude == latitude:
+            area["points"].append((longitude, latitude))
+
+    features = []
+    for origin, area in areas.items():
+        hull = [list(point) for point in convex_hull(area["points"])]
+        if len(hull) >= 3:
+            geometry = {"type": "Polygon", "coordinates": [hull + hull[:1]]}
+        elif len(hull) == 2:
+            geometry = {"type": "LineString", "coordinates": hull}
+        elif hull:
+            geometry = {"type": "Point", "coordinates": hull[0]}
+        else:
+            geometry = None
+
+        features.append({
+            "type": "Feature",
+            "geometry": geometry,
+            "properties": {"origin": origin, "cities": area["cities"], "max_distance": area["max_distance"]},
+        })
+
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,256 @@
+import argparse
+import csv
+import json
+import math
+import os
+import tempfile
+import time
+
+from compiled_graph import CompiledGraph, haversine_km
+
+
+# At most this many problems are listed in a GraphValidationError
+MAX_REPORTED_PROBLEMS = 20
+
+_TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+class GraphValidationError(ValueError):
+    """
+    Raised when a road network source is invalid.
+
+    Attributes:
+        problems: List of messages, one per problem found
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        listed = problems[:MAX_REPORTED_PROBLEMS]
+        more = len(problems) - len(listed)
+        message = "Invalid road network:\n" + "\n".join(f"  - {problem}" for problem in listed)
+        if more:
+            message += f"\n  ... and {more} more"
+        super().__init__(message)
+
+
+def build_graph(positions, roads):
+    """
+    Validates a road network and compiles it.
+
+    Every road is two-way unless it is marked one-way. The network is
+    rejected if a road has a non-positive or non-finite distance, loops on
+    one city, joins a city without valid coordinates, or if the same road
+    is given twice with different distances (which would make the two
+    directions of a two-way road disagree).
+
+    Args:
+        positions: Dictionary {city: (longitude, latitude)}
+        roads: Iterable of (source, target, distance, one_way) tuples
+
+    Returns:
+        CompiledGraph: The compiled graph
+
+    Raises:
+        GraphValidationError: Listing every problem found
+    """
+    problems = []
+    graph = {city: {} for city in positions}
+
+    for city, (longitude, latitude) in positions.items():
+        if not (math.isfinite(longitude) and -180 <= longitude <= 180
+                and math.isfinite(latitude) and -90 <= latitude <= 90):
+            problems.append(f"{city}: invalid coordinates ({longitude}, {latitude})")
+
+    for number, (source, target, distance, one_way) in enumerate(roads, 1):
+        road = f"road {number} ({source} - {target})"
+
+        if source == target:
+            problems.append(f"{road}: starts and ends at the same city")
+            continue
+        missing = [city for city in (source, target) if city not in positions]
+        if missing:
+            problems.append(f"{road}: no coordinates for {', '.join(missing)}")
+            continue
+        if not (math.isfinite(distance) and distance > 0):
+            problems.append(f"{road}: invalid distance {distance}")
+            continue
+
+        directions = [(source, target)] if one_way else [(source, target), (target, source)]
+        for u, v in directions:
+            existing = graph[u].get(v)
+            if existing is not None and existing != distance:
+                problems.append(f"{road}: {u} → {v} is already {existing} km, not {distance} km")
+                break
+            graph[u][v] = distance
+
+    if problems:
+        raise GraphValidationError(problems)
+
+    return CompiledGraph.from_dict(graph, positions)
+
+
+def load_csv(roads_path, cities_path):
+    """
+    Loads a road network from two CSV files with a header row:
+
+        cities: name,longitude,latitude
+        roads:  source,target,distance[,oneway]
+
+    Distances are in km; oneway is optional (1/true/yes for a one-way road).
+
+    Returns:
+        CompiledGraph: The validated, compiled graph
+    """
+    problems = []
+    positions = {}
+
+    with open(cities_path, newline="", encoding="utf-8") as file:
+        for line, row in enumerate(csv.DictReader(file), 2):
+            try:
+                positions[row["name"].strip()] = (float(row["longitude"]), float(row["latitude"]))
+            except (KeyError, TypeError, ValueError):
+                problems.append(f"{cities_path}:{line}: expected name,longitude,latitude")
+
+    roads = []
+    with open(roads_path, newline="", encoding="utf-8") as file:
+        for line, row in enumerate(csv.DictReader(file), 2):
+            try:
+                one_way = (row.get("oneway") or "").strip().lower() in _TRUE_VALUES
+                roads.append((row["source"].strip(), row["target"].strip(), float(row["distance"]), one_way))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                problems.append(f"{roads_path}:{line}: expected source,target,distance[,oneway]")
+
+    if problems:
+        raise GraphValidationError(problems)
+    return build_graph(positions, roads)
+
+
+def load_geojson(path):
+    """
+    Loads a road network from a GeoJSON FeatureCollection:
+
+    - Point features are cities, named by their "name" property;
+    - LineString features are roads between their "source" and "target"
+      properties, with an optional "distance" in km (the length of the
+      line when missing) and an optional "oneway" flag.
+
+    Returns:
+        CompiledGraph: The validated, compiled graph
+    """
+    with open(path, encoding="utf-8") as file:
+        collection = json.load(file)
+
+    problems = []
+    positions = {}
+    roads = []
+
+    for number, feature in enumerate(collection.get("features", []), 1):
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        coordinates = geometry.get("coordinates")
+
+        try:
+            if geometry.get("type") == "Point":
+                positions[properties["name"]] = (float(coordinates[0]), float(coordinates[1]))
+            elif geometry.get("type") == "LineString":
+                distance = properties.get("distance")
+                if distance is None:
+                    distance = sum(haversine_km(*a[:2], *b[:2]) for a, b in zip(coordinates, coordinates[1:]))
+                one_way = str(properties.get("oneway", "")).lower() in _TRUE_VALUES
+                roads.append((properties["source"], properties["target"], float(distance), one_way))
+        except (KeyError, TypeError, ValueError, IndexError):
+            problems.append(f"feature {number}: expected a named Point or a LineString with source and target")
+
+    if problems:
+        raise GraphValidationError(problems)
+    return build_graph(positions, roads)
+
+
+def load_default_graph():
+    """
+    Loads the road network used by the server: the snapshot named by the
+    PATHFINDER_GRAPH environment variable, mapped into memory, or graph.py.
+
+    Returns:
+        CompiledGraph: The graph
+    """
+    path = os.environ.get("PATHFINDER_GRAPH")
+    if path:
+        return CompiledGraph.load(path)
+
+    from graph import cities_graph, pos
+    return CompiledGraph.from_dict(cities_graph, pos)
+
+
+def shared_snapshot(graph, directory=None):
+    """
+    Returns a snapshot file of graph that other processes can map, writing
+    it to directory (default: the temporary directory) unless graph was
+    itself loaded from a snapshot. The file name contains the graph
+    version, so it is only written once per version.
+    """
+    if graph.filename is not None:
+        return graph.filename
+
+    filename = os.path.join(directory or tempfile.gettempdir(), f"pathfinder-{graph.version}.pfg")
+    if not os.path.exists(filename):
+        graph.save(filename)
+    return filename
+
+
+def export_csv(graph, roads_path, cities_path):
+    """
+    Writes a CompiledGraph as the CSV files read by load_csv. Two-way roads
+    (same distance in both directions) are written once.
+    """
+    names = graph.names
+
+    with open(cities_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["name", "longitude", "latitude"])
+        for node, name in enumerate(names):
+            writer.writerow([name, graph.longitudes[node], graph.latitudes[node]])
+
+    with open(roads_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["source", "target", "distance", "oneway"])
+        for u in range(len(graph)):
+            for v, weight in graph.neighbors(u):
+                two_way = graph.edge_weight(v, u) == weight
+                if two_way and v < u:
+                    continue
+                writer.writerow([names[u], names[v], weight, 0 if two_way else 1])
+
+
+if __name__ == "__main__":
+    # Offline preprocessing, e.g.
+    #   python graph_loader.py graph.pfg --csv roads.csv cities.csv
+    #   python graph_loader.py graph.pfg --geojson network.geojson
+    #   python graph_loader.py graph.pfg                     (from graph.py)
+    parser = argparse.ArgumentParser(description="Validate a road network and write a binary graph snapshot.")
+    parser.add_argument("output", help="snapshot file to write")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--csv", nargs=2, metavar=("ROADS", "CITIES"), help="edge-list and city CSV files")
+    source.add_argument("--geojson", metavar="FILE", help="GeoJSON FeatureCollection")
+    source.add_argument("--export-csv", nargs=2, metavar=("ROADS", "CITIES"),
+                        help="also write graph.py as CSV files")
+    arguments = parser.parse_args()
+
+    started = time.perf_counter()
+    if arguments.csv:
+        compiled = load_csv(*arguments.csv)
+    elif arguments.geojson:
+        compiled = load_geojson(arguments.geojson)
+    else:
+        from graph import cities_graph, pos
+        build_graph(pos, [(source, target, distance, cities_graph.get(target, {}).get(source) != distance)
+                          for source, neighbors in cities_graph.items()
+                          for target, distance in neighbors.items()])
+        # Same node order as main.py, so versions and contraction hierarchies match
+        compiled = CompiledGraph.from_dict(cities_graph, pos)
+        if arguments.export_csv:
+            export_csv(compiled, *arguments.export_csv)
+
+    compiled.save(arguments.output)
+    print(f"Graph snapshot written to {arguments.output} in {time.perf_counter() - started:.2f}s "
+          f"({len(compiled)} cities, {compiled.edge_count} roads, version {compiled.version})")
@@ -0,0 +1,343 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from compiled_graph import CompiledGraph
+from contraction import ContractionHierarchy
+from spatial_index import SpatialIndex
+
+
+class LiveGraph:
+    """
+    Current version of the road network, with the structures derived from
+    it: contraction hierarchy, all-pairs distance matrix and spatial index.
+
+    Versions are immutable CompiledGraph objects. An edit builds a new
+    version (copy-on-write, see CompiledGraph.with_edge_weights) and
+    swaps it in; requests that already hold the previous version keep
+    using it. Derived structures are repaired rather than recomputed:
+    the distance matrix incrementally (DistanceMatrix.repair) when it is
+    small enough to be computed in memory, otherwise it is dropped until
+    edits lead back to the graph of its file (repairing would give each
+    process a private n² copy of a matrix they share), the
+    hierarchy by re-contracting in the previous node order, in one
+    background thread that only ever rebuilds the latest version (a
+    burst of edits costs at most two builds), while queries fall back to
+    A*.
+
+    When the graph was loaded from a snapshot file, that file is never
+    written. Each edited version is saved next to it in a file named by
+    version (g.pfg -> g.1a2b3c4d.pfg), and a pointer file (g.pfg.current)
+    names the current one. Edits are serialized between processes by a
+    file lock. When current() sees that the pointer changed, it maps the
+    version it names in a background thread and keeps returning the
+    previous version until the new one is swapped in, so requests never
+    wait for a reload. A server started on the snapshot also starts
+    from the pointer: edits outlive restarts until the pointer is
+    deleted (see discard_edits).
+
+    Attributes:
+        graph: The current CompiledGraph
+        base: The graph of the snapshot file (or the graph at startup),
+              for reopening closed roads
+        base_hierarchy: The contraction hierarchy of base, reused whenever
+                        edits bring the graph back to it
+    """
+
+    def __init__(self, graph, hierarchy=None, distance_matrix_path=None, on_change=None):
+        self.graph = graph
+        self.base = graph
+        self.hierarchy = hierarchy
+        self.base_hierarchy = hierarchy
+        self.distance_matrix_path = distance_matrix_path
+        self.on_change = None
+        self.snapshot_path = graph.filename
+        self.updates = 0
+        self.reloads = 0
+        self.hierarchy_rebuilds = 0
+        self._distance_matrix = None
+        self._matrix_lock = threading.Lock()
+        self._spatial_index = None
+        self._pointer_state = None
+        self._lock = threading.RLock()
+        self._reloader = _LatestWorker(self._reload_latest, "pathfinder-graph-reload")
+        self._rebuilder = _LatestWorker(self._rebuild_hierarchy, "pathfinder-hierarchy-rebuild")
+        if self.snapshot_path:
+            self._reload()
+        self.on_change = on_change
+
+    def current(self):
+        """
+        Returns the current graph version. When another process published
+        a newer one, it is mapped in the background and returned by later
+        calls.
+        """
+        if self.snapshot_path and _file_state(self._pointer_path()) != self._pointer_state:
+            self._reloader.submit()
+        return self.graph
+
+    def hierarchy_for(self, graph):
+        """
+        Returns the contraction hierarchy of graph, or None if it has none
+        (yet).
+        """
+        hierarchy = self.hierarchy
+        return hierarchy if hierarchy is not None and hierarchy.graph is graph else None
+
+    def distance_matrix(self):
+        """
+        Returns the all-pairs distance matrix of the current graph: loaded
+        from distance_matrix_path if it was computed on this graph,
+        otherwise repaired or computed. Only graphs of up to
+        FLOYD_WARSHALL_MAX_NODES nodes are computed or repaired here, since
+        the matrix takes n² entries: for larger ones without a file (e.g.
+        after an edit) this returns None and callers search from each
+        origin instead (see pathfinding.distance_table).
+
+        Concurrent first calls compute the matrix once.
+        """
+        graph = self.current()
+        matrix = self._distance_matrix
+        if matrix is not None and matrix.graph is graph:
+            return matrix
+
+        # NumPy is only imported by servers that use the distance matrix
+        from distance_matrix import FLOYD_WARSHALL_MAX_NODES, DistanceMatrix
+
+        with self._matrix_lock:
+            # The graph and its repaired matrix are swapped under this lock
+            graph = self.graph
+            matrix = self._distance_matrix
+            if matrix is not None and matrix.graph is graph:
+                return matrix
+
+            matrix = None
+            if self.distance_matrix_path and graph is self.base:
+                try:
+                    matrix = DistanceMatrix.load(self.distance_matrix_path, graph)
+                except ValueError as e:
+                    # Computed on another version of the graph
+                    print(f"Distance matrix not loaded: {e}")
+
+            if matrix is None:
+                if len(graph) > FLOYD_WARSHALL_MAX_NODES:
+                    return None
+                matrix = DistanceMatrix.compute(graph, method="floyd_warshall")
+
+            self._distance_matrix = matrix
+            return matrix
+
+    def spatial_index(self):
+        """
+        Returns the spatial index of the current graph, built on first use.
+        Edits only change edges, so the index is kept as long as the names
+        and coordinates are the same objects (see
+        CompiledGraph.with_edge_weights).
+        """
+        graph = self.current()
+        index = self._spatial_index
+        if index is not None and index.graph.names is graph.names \
+                and index.graph.longitudes is graph.longitudes and index.graph.latitudes is graph.latitudes:
+            return index
+
+        self._spatial_index = SpatialIndex.build(graph)
+        return self._spatial_index
+
+    def update_edges(self, changes):
+        """
+        Applies edge edits and makes the result the current version.
+
+        Args:
+            changes: Function of the current graph returning the edits
+                     {(u, v): weight or None} (see
+                     CompiledGraph.with_edge_weights); it is called under
+                     the update lock, so the edits are always computed
+                     against the latest version
+
+        Returns:
+            tuple: (previous graph, new graph, edits)
+        """
+        with self._lock, self._snapshot_lock():
+            if self.snapshot_path:
+                self._reload()
+            previous = self.graph
+            edits = changes(previous)
+            graph = previous.with_edge_weights(edits, reference=self.base)
+
+            if graph.version == self.base.version:
+                graph = self.base
+
+            if self.snapshot_path:
+                self._publish(graph)
+
+            self._install(graph, edits)
+            self.updates += 1
+            return previous, graph, edits
+
+    def stats(self):
+        """
+        Returns the version counters as a dictionary.
+        """
+        return {
+            "version": self.graph.version,
+            "base_version": self.base.version,
+            "updates": self.updates,
+            "reloads": self.reloads,
+            "hierarchy": self.hierarchy_for(self.graph) is not None,
+            "hierarchy_rebuilds": self.hierarchy_rebuilds,
+        }
+
+    @staticmethod
+    def discard_edits(snapshot_path):
+        """
+        Makes servers started on a snapshot file start from its content
+        again, by deleting its pointer file. Servers already running keep
+        their current version until the next edit.
+        """
+        try:
+            os.remove(f"{snapshot_path}.current")
+        except FileNotFoundError:
+            pass
+
+    def _pointer_path(self):
+        return f"{self.snapshot_path}.current"
+
+    def _version_path(self, version):
+        root, extension = os.path.splitext(self.snapshot_path)
+        return f"{root}.{version}{extension}"
+
+    def _publish(self, graph):
+        # Version files are immutable: a file named by a version always holds it
+        filename = self.snapshot_path
+        if graph is not self.base:
+            filename = self._version_path(graph.version)
+            if not os.path.exists(filename):
+                graph.save(filename)
+
+        pointer = self._pointer_path()
+        with open(f"{pointer}.tmp", "w") as pointer_file:
+            pointer_file.write(os.path.basename(filename))
+        os.replace(f"{pointer}.tmp", pointer)
+        self._pointer_state = _file_state(pointer)
+
+    def _reload_latest(self):
+        with self._lock:
+            self._reload()
+
+    def _reload(self):
+        pointer = self._pointer_path()
+        state = _file_state(pointer)
+        if state == self._pointer_state:
+            return
+
+        name = None
+        if state is not None:
+            with open(pointer) as pointer_file:
+                name = pointer_file.read().strip()
+        self._pointer_state = state
+
+        if not name or name == os.path.basename(self.snapshot_path):
+            graph = self.base
+        else:
+            graph = CompiledGraph.load(os.path.join(os.path.dirname(self.snapshot_path), name))
+            if graph.version == self.base.version:
+                graph = self.base
+
+        if graph.version != self.graph.version:
+            self._install(graph, self.graph.edge_changes(graph))
+            self.reloads += 1
+
+    def _install(self, graph, edits):
+        # Computed before the swap, so requests never pay for it (see
+        # RouteCache.get_paths); incremental after with_edge_weights
+        graph.is_symmetric
+
+        previous = self.graph
+        matrix = self._distance_matrix
+        if matrix is not None and matrix.graph is previous and edits is not None:
+            from distance_matrix import FLOYD_WARSHALL_MAX_NODES
+            matrix = matrix.repair(graph, edits) if len(graph) <= FLOYD_WARSHALL_MAX_NODES else None
+        else:
+            matrix = None
+
+        with self._matrix_lock:
+            self.graph = graph
+            self._distance_matrix = matrix
+
+        if graph is self.base and self.base_hierarchy is not None:
+            self.hierarchy = self.base_hierarchy
+        elif self.hierarchy is not None:
+            order = self.hierarchy.rank if edits is not None else None
+            self._rebuilder.submit(graph, order)
+
+        if self.on_change is not None:
+            self.on_change(graph)
+
+    def _rebuild_hierarchy(self, graph, order):
+        if self.graph is not graph:
+            # Replaced while waiting; its successor is submitted already
+            return
+        hierarchy = ContractionHierarchy.build(graph, order)
+        with self._lock:
+            if self.graph is graph:
+                self.hierarchy = hierarchy
+                self.hierarchy_rebuilds += 1
+
+    @contextmanager
+    def _snapshot_lock(self):
+        # Serializes edits between processes serving the same snapshot
+        if not self.snapshot_path:
+            yield
+            return
+
+        import fcntl
+        with open(f"{self.snapshot_path}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class _LatestWorker:
+    """
+    Background thread calling fn for the latest submission only: calls
+    submitted while it is busy are merged into one, so a burst of
+    submissions costs at most one more run. Started on the first
+    submission.
+    """
+
+    def __init__(self, fn, name):
+        self._fn = fn
+        self._name = name
+        self._pending = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, *args):
+        with self._condition:
+            self._pending = args
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                args, self._pending = self._pending, None
+            try:
+                self._fn(*args)
+            except Exception as e:
+                print(f"{self._name} failed: {e}")
+
+
+def _file_state(filename):
+    # Changes whenever the file is replaced (os.replace gives it a new inode)
+    try:
+        status = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return status.st_ino, status.st_mtime_ns
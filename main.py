@@ -1,14 +1,56 @@
+import base64
+import hashlib
+import math
 import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from pathfinding import k_shortest_paths
-from graph import cities_graph
-from visualizer import visualize_route
-import uvicorn
+from starlette.concurrency import run_in_threadpool
+from pathfinding import (ALTERNATIVES, SearchStats, distance_table, iter_shortest_paths, k_shortest_paths,
+                         reachable_within)
+from graph_loader import load_default_graph, shared_snapshot
+from contraction import ContractionHierarchy
+from live_graph import LiveGraph
+from route_cache import RouteCache
+from geometry import reachability_feature_collection, routes_feature_collection
+from render_pool import RenderPool
+from route_batch import BatchRouter
+from metrics import Metrics, TimingMiddleware
+from single_flight import SingleFlight
 
-app = FastAPI()
+# Route images are rendered in worker processes, off the event loop. The
+# workers and their matplotlib/networkx import start on the first render
+# ("lazy"), before serving ("preload"), or never: with "off" the server
+# answers without images and never loads the visualization stack.
+RENDER_MODE = os.environ.get("PATHFINDER_RENDER_MODE", "lazy")
+if RENDER_MODE not in ("lazy", "preload", "off"):
+    raise ValueError(f"PATHFINDER_RENDER_MODE must be lazy, preload or off, not {RENDER_MODE!r}")
+IMAGES_ENABLED = RENDER_MODE != "off"
+
+render_pool = RenderPool(
+    workers=int(os.environ.get("PATHFINDER_RENDER_WORKERS", 2)),
+    max_pending=int(os.environ.get("PATHFINDER_RENDER_QUEUE", 8)),
+    timeout=float(os.environ.get("PATHFINDER_RENDER_TIMEOUT", 10)),
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if RENDER_MODE == "preload":
+        await run_in_threadpool(render_pool.start)
+    await run_in_threadpool(batch_router.start, live_graph.current())
+    # The route cache reads it on every lookup; computing it scans every edge
+    await run_in_threadpool(lambda: live_graph.current().is_symmetric)
+    yield
+    render_pool.shutdown()
+    batch_router.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,8 +59,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage latency histograms and search counters, exported at /metrics;
+# every response gets a Server-Timing header with its stages
+metrics = Metrics()
+app.add_middleware(TimingMiddleware, metrics=metrics, routes=app.routes)
+
+# Road network at startup: a binary snapshot written by graph_loader.py and
+# mapped into memory when PATHFINDER_GRAPH is set (e.g. PATHFINDER_GRAPH=graph.pfg),
+# otherwise compiled from graph.py
+compiled_graph = load_default_graph()
+
 # List of cities for dropdown menus
-CITY_NAMES = sorted(list(cities_graph.keys()))
+CITY_NAMES = sorted(compiled_graph.names)
+
+# Set of the same cities, for validating requests (edits never add or remove cities)
+KNOWN_CITIES = frozenset(CITY_NAMES)
+
+# Optional contraction hierarchy for the optimal route, built offline with
+# `python contraction.py graph.ch` and enabled with PATHFINDER_CH_INDEX=graph.ch
+CH_INDEX_PATH = os.environ.get("PATHFINDER_CH_INDEX")
+hierarchy = ContractionHierarchy.load(CH_INDEX_PATH, compiled_graph) if CH_INDEX_PATH else None
+
+# Number of alternative routes and maximum stretch over the optimal distance
+MAX_PATHS = 3
+MAX_RATIO = 1.5
+
+# How alternatives are found: "yen" (Yen's k shortest paths, filtered by
+# similarity) or "penalty" (a few searches on a graph where the roads of the
+# routes already found cost more: much faster, but it can find fewer
+# alternatives), see pathfinding.iter_shortest_paths
+ALTERNATIVES_METHOD = os.environ.get("PATHFINDER_ALTERNATIVES", "yen")
+if ALTERNATIVES_METHOD not in ALTERNATIVES:
+    raise ValueError(f"PATHFINDER_ALTERNATIVES must be one of {', '.join(ALTERNATIVES)}, not {ALTERNATIVES_METHOD!r}")
+
+# Maximum k of GET /api/cities/nearest
+MAX_NEAREST_K = 50
+
+# Batch routing: origin groups run in parallel worker processes
+MAX_BATCH_PAIRS = int(os.environ.get("PATHFINDER_BATCH_MAX_PAIRS", 1000))
+MAX_BATCH_K = 10
+batch_router = BatchRouter(
+    workers=int(os.environ.get("PATHFINDER_BATCH_WORKERS", 0)) or None,
+    max_ratio=MAX_RATIO,
+    engine="astar",
+    method=ALTERNATIVES_METHOD,
+)
+
+# Largest origins × destinations table of one /api/distance-matrix request
+MAX_MATRIX_PAIRS = int(os.environ.get("PATHFINDER_MATRIX_MAX_PAIRS", 10000))
+
+# Current graph version, edited by PATCH /api/graph/edges. Each request works
+# on the version returned by live_graph.current() when it started.
+# All-pairs distances are mapped from a file written by `python distance_matrix.py
+# graph.pfdm` when PATHFINDER_DISTANCE_MATRIX is set, otherwise computed on the
+# first distance-matrix request.
+live_graph = LiveGraph(
+    compiled_graph,
+    hierarchy=hierarchy,
+    distance_matrix_path=os.environ.get("PATHFINDER_DISTANCE_MATRIX"),
+    on_change=lambda graph: route_cache.set_version(graph.version),
+)
+
+# Media types of the formats served by /api/routes/image
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+# Computed paths, rendered images and responses, keyed by query and graph version
+route_cache = RouteCache(
+    max_entries=int(os.environ.get("PATHFINDER_CACHE_ENTRIES", 256)),
+    max_bytes=int(os.environ.get("PATHFINDER_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("PATHFINDER_CACHE_TTL", 600)),
+)
+
+# Identical route computations and renders running at the same time are
+# done once and shared (PATHFINDER_COALESCE=0 disables it)
+flights = SingleFlight(enabled=os.environ.get("PATHFINDER_COALESCE", "1") != "0")
 
 # Mount legacy static/template files only if they exist
 if os.path.isdir("static") and os.path.isdir("templates"):
@@ -39,6 +157,26 @@ if os.path.isdir("static") and os.path.isdir("templates"):
 class RouteRequest(BaseModel):
     start_city: str
     end_city: str
+    include_image: bool = False
+
+
+class Position(BaseModel):
+    longitude: float
+    latitude: float
+
+
+class CoordinateRouteRequest(BaseModel):
+    start: Position
+    end: Position
+    include_image: bool = False
+    max_snap_km: float | None = None
+
+
+class NearestCity(BaseModel):
+    city: str
+    longitude: float
+    latitude: float
+    distance_km: float
 
 
 class PathInfo(BaseModel):
@@ -53,6 +191,7 @@ class PathInfo(BaseModel):
 
 class RouteResponse(BaseModel):
     error: str | None = None
+    image_url: str | None = None
     image_data: str | None = None
     selected_start: str | None = None
     selected_end: str | None = None
@@ -60,68 +199,360 @@ class RouteResponse(BaseModel):
     cities: list = []
 
 
+class CoordinateRouteResponse(RouteResponse):
+    start_snap: NearestCity | None = None
+    end_snap: NearestCity | None = None
+
+
+class RouteEvent(BaseModel):
+    event: str
+    path: PathInfo | None = None
+    image_url: str | None = None
+    image_data: str | None = None
+    error: str | None = None
+
+
+class BatchRoutePair(BaseModel):
+    start_city: str
+    end_city: str
+    k: int = MAX_PATHS
+
+
+class BatchRouteRequest(BaseModel):
+    pairs: list[BatchRoutePair]
+
+
+class BatchRouteResult(BaseModel):
+    index: int
+    start_city: str
+    end_city: str
+    error: str | None = None
+    all_paths: list[PathInfo] = []
+
+
+class EdgeChange(BaseModel):
+    source: str
+    target: str
+    action: str  # "close", "open" or "set"
+    distance: float | None = None
+    both_directions: bool = True
+
+
+class EdgeChangesRequest(BaseModel):
+    changes: list[EdgeChange]
+
+
+class EdgeState(BaseModel):
+    source: str
+    target: str
+    distance: float | None = None
+    base_distance: float | None = None
+
+
+class GraphResponse(BaseModel):
+    version: str
+    previous_version: str | None = None
+    cities: int
+    roads: int
+    changes: list[EdgeState] = []
+
+
+class DistanceMatrixRequest(BaseModel):
+    origins: list[str]
+    destinations: list[str] | None = None
+    include_paths: bool = False
+
+
+class DistanceMatrixResponse(BaseModel):
+    error: str | None = None
+    origins: list[str] = []
+    destinations: list[str] = []
+    distances: list[list[float | None]] = []
+    paths: list[list[list[str]]] | None = None
+
+
+class ReachabilityRequest(BaseModel):
+    origins: list[str]
+    max_distance_km: float
+    include_hull: bool = False
+
+
+class ReachableCity(BaseModel):
+    city: str
+    distance: float
+    origin: str
+
+
+class ReachabilityResponse(BaseModel):
+    error: str | None = None
+    origins: list[str] = []
+    max_distance_km: float | None = None
+    cities: list[ReachableCity] = []
+    hull: dict | None = None
+
+
 @app.get("/api/cities")
 async def get_cities():
     """Return the list of available cities"""
     return {"cities": CITY_NAMES}
 
 
+async def get_paths(graph, start_city, end_city):
+    """
+    Return the k shortest paths between two cities, from the cache if
+    possible, or shared with an identical computation in flight
+    """
+    with metrics.stage("cache"):
+        paths = route_cache.get_paths(graph, start_city, end_city, MAX_PATHS, MAX_RATIO)
+    if paths is None:
+        paths = await flights.run(("paths", graph.version, start_city, end_city),
+                                  lambda: compute_paths(graph, start_city, end_city))
+    return paths
+
+
+async def compute_paths(graph, start_city, end_city):
+    """Compute the k shortest paths between two cities and cache them"""
+    # The compiled graph is read-only, so searches can run concurrently in the thread pool
+    stats = SearchStats()
+    with metrics.stage("paths"):
+        paths = await run_in_threadpool(
+            k_shortest_paths, graph, start_city, end_city, k=MAX_PATHS, max_ratio=MAX_RATIO,
+            engine="astar", stats=stats, hierarchy=live_graph.hierarchy_for(graph),
+            method=ALTERNATIVES_METHOD
+        )
+    metrics.record_search(stats)
+    route_cache.put_paths(graph, start_city, end_city, MAX_PATHS, MAX_RATIO, paths)
+    return paths
+
+
+async def get_route_image(graph, start_city, end_city, paths, image_format="png"):
+    """
+    Return the rendered route image bytes, from the cache if possible or
+    shared with an identical render in flight, or None when the render
+    pool is saturated or too slow
+    """
+    image_key = ("image", start_city, end_city, MAX_PATHS, MAX_RATIO, image_format)
+    image = route_cache.get(image_key, graph.version)
+    if image is None:
+        image = await flights.run(("image", graph.version, start_city, end_city, image_format),
+                                  lambda: compute_route_image(graph, image_key, paths))
+    return image
+
+
+async def compute_route_image(graph, image_key, paths):
+    """Render a route image in the render pool and cache it"""
+    _, start_city, end_city, _, _, image_format = image_key
+    with metrics.stage("render"):
+        image = await render_pool.render(graph.as_dict(), paths, start_city, end_city, image_format)
+    if image is not None:
+        route_cache.put(image_key, graph.version, image, size=len(image))
+    return image
+
+
+async def get_inline_image(graph, start_city, end_city, paths):
+    """
+    Return the route image as base64 PNG for legacy clients, or None. A
+    failed render is logged and counted in pathfinder_errors_total, but
+    doesn't fail the request
+    """
+    try:
+        image = await get_route_image(graph, start_city, end_city, paths)
+        with metrics.stage("encode"):
+            return base64.b64encode(image).decode('utf-8') if image is not None else None
+    except Exception as e:
+        print(f"Visualization error: {e}")
+        metrics.increment("pathfinder_errors_total", stage="render")
+        return None
+
+
+def route_image_version(graph):
+    """
+    Version of the route images: the graph version and the alternatives
+    method, since either changes which routes are drawn
+    """
+    return f"{graph.version}-{ALTERNATIVES_METHOD}"
+
+
+def route_image_url(graph, start_city, end_city):
+    """
+    URL of the route image, including its version so it can be cached
+    forever, or None when images are disabled
+    """
+    if not IMAGES_ENABLED:
+        return None
+    return "/api/routes/image?" + urlencode({"start": start_city, "end": end_city, "v": route_image_version(graph)})
+
+
+def route_image_etag(graph, start_city, end_city, image_format):
+    """
+    ETag of a route image: a hash of everything the image depends on, so
+    conditional requests are answered without rendering anything
+    """
+    key = "\0".join([route_image_version(graph), start_city, end_city, str(MAX_PATHS), str(MAX_RATIO),
+                     image_format])
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def path_info(i, distance, path, optimal_distance):
+    """PathInfo of the i-th route (0 is the optimal one) for display"""
+    route_str = ' → '.join(path)
+    difference = distance - optimal_distance
+    percentage = ((distance / optimal_distance) - 1) * 100 if i > 0 else 0
+
+    return PathInfo(
+        numero=i + 1,
+        chemin=path,
+        route_str=route_str,
+        distance=distance,
+        difference=difference,
+        pourcentage=percentage,
+        est_optimal=i == 0
+    )
+
+
+def path_infos(paths):
+    """Convert a list of (distance, path) tuples to PathInfo for display"""
+    optimal_distance = paths[0][0] if paths else None
+    return [path_info(i, distance, path, optimal_distance) for i, (distance, path) in enumerate(paths)]
+
+
+def validate_cities(selected_start, selected_end):
+    """Return an error message for an invalid pair of cities, or None"""
+    if not selected_start or not selected_end:
+        return "Start and end cities must be selected."
+
+    if selected_start == selected_end:
+        return "Start and end cities must be different."
+
+    if selected_start not in KNOWN_CITIES or selected_end not in KNOWN_CITIES:
+        return "Invalid city selection."
+
+    return None
+
+
+def validate_position(position):
+    """Return an error message for an invalid position, or None"""
+    if not (-180 <= position.longitude <= 180 and -90 <= position.latitude <= 90):
+        return "Longitude must be between -180 and 180 and latitude between -90 and 90."
+    return None
+
+
+def nearest_cities(index, longitude, latitude, k=1):
+    """NearestCity of the k cities closest to a position, closest first"""
+    graph = index.graph
+    return [
+        NearestCity(city=graph.names[node], longitude=graph.longitudes[node], latitude=graph.latitudes[node],
+                    distance_km=distance)
+        for distance, node in index.nearest(longitude, latitude, k)
+    ]
+
+
 @app.post("/api/routes")
 async def find_routes(route_request: RouteRequest):
     """Find routes between two cities"""
     selected_start = route_request.start_city
     selected_end = route_request.end_city
-    error = None
-    image_data = None
-    all_paths = []
 
     # Basic validation
-    if not selected_start or not selected_end:
-        error = "Start and end cities must be selected."
-        return RouteResponse(error=error, selected_start=selected_start, selected_end=selected_end, cities=CITY_NAMES)
+    with metrics.stage("validate"):
+        error = validate_cities(selected_start, selected_end)
+    if error:
+        return json_response(RouteResponse(error=error, selected_start=selected_start, selected_end=selected_end,
+                                           cities=CITY_NAMES))
 
-    if selected_start == selected_end:
-        error = "Start and end cities must be different."
-        return RouteResponse(error=error, selected_start=selected_start, selected_end=selected_end, cities=CITY_NAMES)
+    return json_response(await route_response(selected_start, selected_end, route_request.include_image))
+
+
+@app.post("/api/routes/coordinates")
+async def find_routes_from_coordinates(route_request: CoordinateRouteRequest):
+    """
+    Find routes between two positions: each one is snapped to the nearest
+    city with the spatial index, then routed like /api/routes
+    """
+    with metrics.stage("validate"):
+        error = validate_position(route_request.start) or validate_position(route_request.end)
+    if error:
+        return json_response(CoordinateRouteResponse(error=error, cities=CITY_NAMES))
+
+    with metrics.stage("snap"):
+        index = await run_in_threadpool(live_graph.spatial_index)
+        snaps = [nearest_cities(index, position.longitude, position.latitude)
+                 for position in (route_request.start, route_request.end)]
+
+    if not snaps[0] or not snaps[1]:
+        return json_response(CoordinateRouteResponse(error="No city has coordinates.", cities=CITY_NAMES))
+    start_snap, end_snap = snaps[0][0], snaps[1][0]
+
+    max_snap_km = route_request.max_snap_km
+    if max_snap_km is not None and max(start_snap.distance_km, end_snap.distance_km) > max_snap_km:
+        error = f"No city within {max_snap_km:g} km of the start or end position."
+    elif start_snap.city == end_snap.city:
+        error = f"Start and end positions are both closest to {start_snap.city}."
+    if error:
+        return json_response(CoordinateRouteResponse(error=error, selected_start=start_snap.city,
+                                                     selected_end=end_snap.city, cities=CITY_NAMES,
+                                                     start_snap=start_snap, end_snap=end_snap))
+
+    response = await route_response(start_snap.city, end_snap.city, route_request.include_image)
+    return json_response(CoordinateRouteResponse(**dict(response), start_snap=start_snap, end_snap=end_snap))
+
+
+@app.get("/api/cities/nearest")
+async def get_nearest_cities(longitude: float, latitude: float, k: int = 1):
+    """Return the k cities closest to a position, closest first"""
+    error = validate_position(Position(longitude=longitude, latitude=latitude))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    if not 1 <= k <= MAX_NEAREST_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_NEAREST_K}.")
+
+    index = await run_in_threadpool(live_graph.spatial_index)
+    return {"cities": [city.model_dump() for city in nearest_cities(index, longitude, latitude, k)]}
 
-    if selected_start not in CITY_NAMES or selected_end not in CITY_NAMES:
-        error = "Invalid city selection."
-        return RouteResponse(error=error, selected_start=selected_start, selected_end=selected_end, cities=CITY_NAMES)
+
+async def route_response(selected_start, selected_end, include_image):
+    """
+    RouteResponse between two valid cities, from the cache if possible, or
+    shared with an identical request in flight
+    """
+    graph = live_graph.current()
+    response_key = ("response", selected_start, selected_end, MAX_PATHS, MAX_RATIO, include_image)
+    with metrics.stage("cache"):
+        cached_response = route_cache.get(response_key, graph.version)
+    if cached_response is not None:
+        return cached_response
+
+    return await flights.run(("response", graph.version, selected_start, selected_end, include_image),
+                             lambda: compute_route_response(graph, response_key))
+
+
+async def compute_route_response(graph, response_key):
+    """Compute the RouteResponse of a response cache key and cache it"""
+    _, selected_start, selected_end, _, _, include_image = response_key
+    error = None
+    image_data = None
+    image_url = None
+    all_paths = []
 
     # Find the k shortest paths (maximum 3)
-    paths = k_shortest_paths(cities_graph, selected_start, selected_end, k=3, max_ratio=1.5)
+    paths = await get_paths(graph, selected_start, selected_end)
 
     if paths:
         # Prepare data for display
-        optimal_distance = paths[0][0]
-
-        for i, (distance, path) in enumerate(paths):
-            route_str = ' → '.join(path)
-            difference = distance - optimal_distance
-            percentage = ((distance / optimal_distance) - 1) * 100 if i > 0 else 0
-
-            all_paths.append(PathInfo(
-                numero=i + 1,
-                chemin=path,
-                route_str=route_str,
-                distance=distance,
-                difference=difference,
-                pourcentage=percentage,
-                est_optimal=i == 0
-            ))
-
-        # Visualization (returns PNG image in base64)
-        try:
-            image_data = visualize_route(cities_graph, paths, selected_start, selected_end)
-        except Exception as e:
-            # If visualization fails, continue without image but don't crash the application
-            print(f"Visualization error: {e}")
-            image_data = None
+        all_paths = path_infos(paths)
+
+        # The image is rendered when the URL is fetched
+        image_url = route_image_url(graph, selected_start, selected_end)
+
+        # Legacy clients can still ask for the PNG inline, in base64
+        if include_image and IMAGES_ENABLED:
+            image_data = await get_inline_image(graph, selected_start, selected_end, paths)
     else:
         error = f"Cannot find a path from {selected_start} to {selected_end}."
 
-    return RouteResponse(
+    response = RouteResponse(
         error=error,
+        image_url=image_url,
         image_data=image_data,
         selected_start=selected_start,
         selected_end=selected_end,
@@ -129,6 +560,434 @@ async def find_routes(route_request: RouteRequest):
         cities=CITY_NAMES
     )
 
+    # Don't cache a response whose rendering failed, it may succeed next time
+    if image_data is not None or not include_image or not paths or not IMAGES_ENABLED:
+        route_cache.put(response_key, graph.version, response, size=len(image_data or "") + 1024)
+
+    return response
+
+
+def json_response(content):
+    """
+    JSONResponse of a response model, timed as the serialize stage. Same
+    JSON as FastAPI's jsonable_encoder, which walks the dumped model again.
+    """
+    with metrics.stage("serialize"):
+        return JSONResponse(content.model_dump(mode="json"))
+
+
+async def iter_paths(graph, start_city, end_city):
+    """
+    Yield the k shortest paths between two cities one by one, as soon as
+    each is found: from the cache if possible, otherwise by advancing the
+    lazy path generator one path at a time in the thread pool. The optimal
+    path comes first; with the penalty method the alternatives may come
+    in any order, so the cached list is sorted by distance
+    """
+    paths = route_cache.get_paths(graph, start_city, end_city, MAX_PATHS, MAX_RATIO)
+    if paths is not None:
+        for distance, path in paths:
+            yield distance, path
+        return
+
+    stats = SearchStats()
+    iterator = iter_shortest_paths(graph, start_city, end_city, max_ratio=MAX_RATIO, engine="astar",
+                                   stats=stats, hierarchy=live_graph.hierarchy_for(graph),
+                                   method=ALTERNATIVES_METHOD)
+    paths = []
+    try:
+        while len(paths) < MAX_PATHS:
+            with metrics.stage("paths"):
+                found = await run_in_threadpool(next, iterator, None)
+            if found is None:
+                break
+            paths.append(found)
+            yield found
+    finally:
+        # Also counts the searches of a stream the client left early
+        metrics.record_search(stats)
+
+    paths.sort(key=lambda item: item[0])
+    route_cache.put_paths(graph, start_city, end_city, MAX_PATHS, MAX_RATIO, paths)
+
+
+@app.post("/api/routes/stream")
+async def find_routes_stream(route_request: RouteRequest, accept: str | None = Header(None)):
+    """
+    Find routes between two cities, streaming a RouteEvent per line:
+    a "path" event for the optimal route as soon as it is known, then one
+    per accepted alternative, then an "image" event (or a single "error"
+    event). Sent as Server-Sent Events when the client accepts
+    text/event-stream, as NDJSON otherwise.
+    """
+    selected_start = route_request.start_city
+    selected_end = route_request.end_city
+    server_sent_events = accept is not None and "text/event-stream" in accept
+
+    def encode(route_event):
+        data = route_event.model_dump_json(exclude_none=True)
+        if server_sent_events:
+            return f"event: {route_event.event}\ndata: {data}\n\n"
+        return data + "\n"
+
+    async def events():
+        error = validate_cities(selected_start, selected_end)
+        if error:
+            yield encode(RouteEvent(event="error", error=error))
+            return
+
+        graph = live_graph.current()
+        paths = []
+        async for distance, path in iter_paths(graph, selected_start, selected_end):
+            optimal_distance = paths[0][0] if paths else distance
+            yield encode(RouteEvent(event="path", path=path_info(len(paths), distance, path, optimal_distance)))
+            paths.append((distance, path))
+
+        if not paths:
+            yield encode(RouteEvent(event="error", error=f"Cannot find a path from {selected_start} to {selected_end}."))
+            return
+
+        image_data = None
+        if route_request.include_image and IMAGES_ENABLED:
+            image_data = await get_inline_image(graph, selected_start, selected_end, paths)
+
+        yield encode(RouteEvent(event="image", image_url=route_image_url(graph, selected_start, selected_end),
+                                image_data=image_data))
+
+    media_type = "text/event-stream" if server_sent_events else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/routes/image")
+async def route_image(start: str, end: str, format: str = "png", v: str | None = None,
+                      if_none_match: str | None = Header(None)):
+    """Return the route image between two cities, with ETag and conditional GET support"""
+    if not IMAGES_ENABLED:
+        raise HTTPException(status_code=404, detail="Route images are disabled on this server.")
+    error = validate_cities(start, end)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    if format not in IMAGE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {format}.")
+
+    graph = live_graph.current()
+    etag = route_image_etag(graph, start, end, format)
+    headers = {
+        "ETag": etag,
+        # Versioned URLs never change; unversioned ones must be revalidated
+        "Cache-Control": "public, max-age=31536000, immutable" if v == route_image_version(graph)
+        else "public, max-age=60, must-revalidate",
+    }
+
+    if if_none_match and (if_none_match.strip() == "*" or etag in
+                          [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    paths = await get_paths(graph, start, end)
+    if not paths:
+        raise HTTPException(status_code=404, detail=f"Cannot find a path from {start} to {end}.")
+
+    image = await get_route_image(graph, start, end, paths, format)
+    if image is None:
+        raise HTTPException(status_code=503, detail="Rendering is busy, try again later.",
+                            headers={"Retry-After": "1"})
+
+    return Response(content=image, media_type=IMAGE_MEDIA_TYPES[format], headers=headers)
+
+
+@app.get("/api/routes/geojson")
+async def route_geojson(start: str, end: str):
+    """Return the routes between two cities as a GeoJSON FeatureCollection, without rendering"""
+    error = validate_cities(start, end)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    graph = live_graph.current()
+    paths = await get_paths(graph, start, end)
+    if not paths:
+        raise HTTPException(status_code=404, detail=f"Cannot find a path from {start} to {end}.")
+
+    with metrics.stage("geojson"):
+        return JSONResponse(routes_feature_collection(graph, paths, start, end), media_type="application/geo+json")
+
+
+@app.post("/api/routes/batch")
+async def find_routes_batch(batch_request: BatchRouteRequest):
+    """
+    Find routes for many pairs of cities, streamed as NDJSON: one
+    BatchRouteResult per line, in completion order (use index to match
+    the request). Pairs are grouped by start city so each group shares
+    one shortest-path tree.
+    """
+    pairs = batch_request.pairs
+    if not pairs:
+        raise HTTPException(status_code=400, detail="At least one pair of cities must be given.")
+    if len(pairs) > MAX_BATCH_PAIRS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PAIRS} pairs can be routed at once.")
+
+    graph = live_graph.current()
+    ready = []
+    groups = {}
+    waiting = {}
+
+    for index, pair in enumerate(pairs):
+        error = validate_cities(pair.start_city, pair.end_city)
+        if error is None and not 1 <= pair.k <= MAX_BATCH_K:
+            error = f"k must be between 1 and {MAX_BATCH_K}."
+        if error:
+            ready.append(BatchRouteResult(index=index, start_city=pair.start_city, end_city=pair.end_city,
+                                          error=error))
+            continue
+
+        paths = route_cache.get_paths(graph, pair.start_city, pair.end_city, pair.k, MAX_RATIO)
+        if paths is not None:
+            ready.append(batch_route_result(index, pair.start_city, pair.end_city, paths))
+            continue
+
+        destinations = groups.setdefault(pair.start_city, {})
+        destinations[pair.end_city] = max(destinations.get(pair.end_city, 0), pair.k)
+        waiting.setdefault((pair.start_city, pair.end_city), []).append((index, pair.k))
+
+    async def results():
+        for result in ready:
+            yield result.model_dump_json() + "\n"
+
+        async for start_city, group_paths in batch_router.route(graph, groups):
+            lines = []
+            for end_city, paths in group_paths.items():
+                for index, k in waiting[(start_city, end_city)]:
+                    route_cache.put_paths(graph, start_city, end_city, k, MAX_RATIO, paths[:k])
+                    lines.append(batch_route_result(index, start_city, end_city, paths[:k]).model_dump_json() + "\n")
+            yield "".join(lines)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+def batch_route_result(index, start_city, end_city, paths):
+    """BatchRouteResult of one pair of a batch"""
+    if not paths:
+        return BatchRouteResult(index=index, start_city=start_city, end_city=end_city,
+                                error=f"Cannot find a path from {start_city} to {end_city}.")
+    return BatchRouteResult(index=index, start_city=start_city, end_city=end_city, all_paths=path_infos(paths))
+
+
+def edge_updates(graph, changes):
+    """
+    Convert the edge changes of a PATCH request to edits of graph
+    ({(u, v): distance or None}, see CompiledGraph.with_edge_weights)
+
+    Raises:
+        HTTPException: 400 if a change is invalid
+    """
+    edits = {}
+    for change in changes:
+        if change.source not in graph or change.target not in graph or change.source == change.target:
+            raise HTTPException(status_code=400, detail=f"Invalid road: {change.source} → {change.target}.")
+        if change.action not in ("close", "open", "set"):
+            raise HTTPException(status_code=400, detail=f"Unknown action: {change.action}.")
+        if change.distance is not None and not (math.isfinite(change.distance) and change.distance > 0):
+            raise HTTPException(status_code=400, detail=f"Invalid distance: {change.distance}.")
+        if change.action == "set" and change.distance is None:
+            raise HTTPException(status_code=400, detail="A distance is required to set a road.")
+
+        u, v = graph.index[change.source], graph.index[change.target]
+        for source, target in [(u, v), (v, u)] if change.both_directions else [(u, v)]:
+            if change.action == "close":
+                edits[(source, target)] = None
+                continue
+
+            # Reopened roads get their distance at startup unless one is given
+            distance = change.distance
+            if distance is None:
+                distance = live_graph.base.edge_weight(source, target) or graph.edge_weight(source, target)
+            if distance is None:
+                raise HTTPException(status_code=400, detail=f"A distance is required to open "
+                                                            f"{graph.names[source]} → {graph.names[target]}.")
+            edits[(source, target)] = distance
+
+    return edits
+
+
+def graph_response(graph, previous=None):
+    """GraphResponse of a graph version, with its edges that differ from the graph at startup"""
+    base = live_graph.base
+    changes = base.edge_changes(graph) or {}
+    return GraphResponse(
+        version=graph.version,
+        previous_version=previous.version if previous is not None else None,
+        cities=len(graph),
+        roads=graph.edge_count,
+        changes=[
+            EdgeState(source=graph.names[u], target=graph.names[v], distance=distance,
+                      base_distance=base.edge_weight(u, v))
+            for (u, v), distance in sorted(changes.items())
+        ],
+    )
+
+
+@app.get("/api/graph")
+async def get_graph():
+    """Return the current graph version and its roads that were closed or changed since startup"""
+    return await run_in_threadpool(graph_response, live_graph.current())
+
+
+@app.patch("/api/graph/edges")
+async def update_edges(changes_request: EdgeChangesRequest):
+    """
+    Close, reopen or change the distance of roads. The edits produce a new
+    graph version; requests already running keep the previous one.
+    """
+    if not changes_request.changes:
+        raise HTTPException(status_code=400, detail="At least one change must be given.")
+
+    previous, graph, _ = await run_in_threadpool(
+        live_graph.update_edges, lambda graph: edge_updates(graph, changes_request.changes)
+    )
+    return await run_in_threadpool(graph_response, graph, previous)
+
+
+def collect_service_metrics():
+    """Current counters of the cache, render pool and graph, for /metrics"""
+    cache = route_cache.stats()
+    pool = render_pool.stats()
+    graph = live_graph.stats()
+    flight = flights.stats()
+    return [
+        ("pathfinder_cache_entries", {}, cache["entries"]),
+        ("pathfinder_cache_bytes", {}, cache["bytes"]),
+        *[("pathfinder_cache_lookups_total", {"result": result}, cache[key])
+          for result, key in (("hit", "hits"), ("reverse_hit", "reverse_hits"), ("miss", "misses"))],
+        ("pathfinder_render_pending", {}, pool["pending"]),
+        *[("pathfinder_renders_total", {"result": result}, pool[result])
+          for result in ("rendered", "rejected", "timeouts")],
+        ("pathfinder_graph_updates_total", {}, graph["updates"] + graph["reloads"]),
+        *[("pathfinder_single_flight_total", {"operation": operation, "result": result}, count)
+          for result in ("started", "coalesced") for operation, count in flight[result].items()],
+        ("pathfinder_single_flight_in_flight", {}, flight["in_flight"]),
+    ]
+
+
+metrics.define("pathfinder_cache_entries", "gauge", "Entries in the route cache")
+metrics.define("pathfinder_cache_bytes", "gauge", "Approximate size of the route cache")
+metrics.define("pathfinder_cache_lookups_total", "counter", "Route cache lookups by result")
+metrics.define("pathfinder_render_pending", "gauge", "Route images queued or rendering")
+metrics.define("pathfinder_renders_total", "counter", "Route image renders by result")
+metrics.define("pathfinder_graph_updates_total", "counter", "Graph versions installed since startup")
+metrics.define("pathfinder_single_flight_total", "counter",
+               "Route computations and renders started, or coalesced into one already in flight")
+metrics.define("pathfinder_single_flight_in_flight", "gauge", "Route computations and renders in flight")
+metrics.add_collector(collect_service_metrics)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Return the metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Return route cache, render pool, batch router, graph and single-flight counters"""
+    return {**route_cache.stats(), "render_pool": render_pool.stats(), "batch_router": batch_router.stats(),
+            "graph": live_graph.stats(), "single_flight": flights.stats()}
+
+
+@app.post("/api/distance-matrix")
+async def distance_matrix(matrix_request: DistanceMatrixRequest):
+    """
+    Return shortest distances between every origin and every destination,
+    from the all-pairs matrix when there is one for the graph, otherwise
+    with one search per origin
+    """
+    origins = matrix_request.origins
+    destinations = matrix_request.destinations if matrix_request.destinations is not None else origins
+
+    if not origins or not destinations:
+        return DistanceMatrixResponse(error="At least one origin and one destination must be selected.")
+    if len(origins) * len(destinations) > MAX_MATRIX_PAIRS:
+        raise HTTPException(status_code=422,
+                            detail=f"At most {MAX_MATRIX_PAIRS} origin-destination pairs can be computed at once.")
+
+    unknown = [city for city in origins + destinations if city not in KNOWN_CITIES]
+    if unknown:
+        return DistanceMatrixResponse(error=f"Invalid city selection: {', '.join(sorted(set(unknown)))}.")
+
+    graph = live_graph.current()
+    with metrics.stage("matrix"):
+        matrix = await run_in_threadpool(live_graph.distance_matrix)
+        if matrix is None:
+            rows, paths = await run_in_threadpool(distance_table, graph, origins, destinations,
+                                                  matrix_request.include_paths)
+        else:
+            graph = matrix.graph
+            rows, paths = matrix.submatrix(origins, destinations).tolist(), None
+            if matrix_request.include_paths:
+                paths = [
+                    [graph.path_names(matrix.path(graph.index[origin], graph.index[destination]))
+                     for destination in destinations]
+                    for origin in origins
+                ]
+
+    distances = [[distance if distance != float('inf') else None for distance in row] for row in rows]
+
+    return DistanceMatrixResponse(origins=origins, destinations=destinations, distances=distances, paths=paths)
+
+
+@app.post("/api/reachability")
+async def reachability(reachability_request: ReachabilityRequest):
+    """
+    Return every city within max_distance_km of one of the origins (e.g.
+    depots), with its distance and closest origin, from a single bounded
+    multi-source search, and optionally the service area of each origin
+    as GeoJSON
+    """
+    origins = reachability_request.origins
+    max_distance = reachability_request.max_distance_km
+
+    with metrics.stage("validate"):
+        if not origins:
+            error = "At least one origin must be selected."
+        elif any(city not in KNOWN_CITIES for city in origins):
+            unknown = sorted({city for city in origins if city not in KNOWN_CITIES})
+            error = f"Invalid city selection: {', '.join(unknown)}."
+        elif not 0 <= max_distance < float('inf'):
+            error = "The maximum distance must be a positive number of km."
+        else:
+            error = None
+    if error:
+        return json_response(ReachabilityResponse(error=error, origins=origins, max_distance_km=max_distance))
+
+    graph = live_graph.current()
+    with metrics.stage("reachability"):
+        reachable = await run_in_threadpool(reachable_within, graph, origins, max_distance)
+
+    hull = None
+    if reachability_request.include_hull:
+        with metrics.stage("geojson"):
+            hull = reachability_feature_collection(graph, reachable)
+
+    return json_response(ReachabilityResponse(
+        origins=origins,
+        max_distance_km=max_distance,
+        cities=[ReachableCity(city=city, distance=distance, origin=origin)
+                for city, (distance, origin) in reachable.items()],
+        hull=hull,
+    ))
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    import uvicorn
+
+    workers = int(os.environ.get("PATHFINDER_WORKERS", 1))
+    if workers > 1:
+        # Each worker process imports this module again: point them all at one
+        # snapshot written here, which they map instead of compiling graph.py.
+        # Like a single process, they start from graph.py, not from edits made
+        # by a previous run on the same snapshot.
+        snapshot = shared_snapshot(live_graph.base)
+        if live_graph.base.filename is None:
+            LiveGraph.discard_edits(snapshot)
+        os.environ["PATHFINDER_GRAPH"] = snapshot
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,247 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the shortest-path searches run per route query
+SEARCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Stage timings of the request being served, see Metrics.stage
+_request_timing = ContextVar("request_timing", default=None)
+
+
+class _Histogram:
+    """
+    Cumulative histogram with fixed bucket bounds, as exposed by Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTiming:
+    """
+    Durations of the stages of one request, in order of first occurrence,
+    for its Server-Timing header.
+
+    Attributes:
+        endpoint: Route path the request matched, used as metric label
+        stages: Dictionary stage -> total seconds
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def header(self):
+        """
+        Server-Timing header value: every stage and the total time so far,
+        in milliseconds.
+        """
+        total = time.perf_counter() - self.started
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+class Metrics:
+    """
+    In-process registry of counters and histograms, exported in the
+    Prometheus text format by render().
+
+    Requests are timed per stage with stage(): each duration goes to the
+    pathfinder_stage_seconds histogram (labelled by endpoint and stage) and
+    to the Server-Timing header of the request (see TimingMiddleware).
+    Recording is a couple of perf_counter() calls and a bisect under a
+    lock, cheap enough to stay on in production.
+
+    Counters and histograms are per process: with several worker
+    processes, each one exports its own.
+    """
+
+    def __init__(self):
+        self._definitions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+        self.define("pathfinder_requests_total", "counter", "HTTP requests served")
+        self.define("pathfinder_request_seconds", "histogram", "HTTP request latency until the response starts",
+                    LATENCY_BUCKETS)
+        self.define("pathfinder_stage_seconds", "histogram", "Time spent in each stage of a request",
+                    LATENCY_BUCKETS)
+        self.define("pathfinder_route_queries_total", "counter", "Route queries computed (not cached)")
+        self.define("pathfinder_searches_per_query", "histogram", "Shortest-path searches run per route query",
+                    SEARCH_BUCKETS)
+        self.define("pathfinder_searches_total", "counter", "Shortest-path searches run")
+        self.define("pathfinder_settled_nodes_total", "counter", "Nodes settled by shortest-path searches")
+        self.define("pathfinder_relaxed_edges_total", "counter", "Edges relaxed by shortest-path searches")
+        self.define("pathfinder_yen_candidates_total", "counter",
+                    "Candidate alternatives found (Yen spur paths or penalty searches)")
+        self.define("pathfinder_yen_rejected_total", "counter",
+                    "Candidate alternatives rejected as too similar to an accepted path")
+        self.define("pathfinder_errors_total", "counter", "Errors by stage")
+
+    def define(self, name, kind, help_text, buckets=None):
+        """
+        Declares a metric; kind is "counter", "gauge" or "histogram"
+        (which needs buckets).
+        """
+        self._definitions[name] = (kind, help_text, buckets)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self._definitions[name][2])
+            histogram.observe(value)
+
+    def add_collector(self, collector):
+        """
+        Registers a function called by render() that returns the current
+        value of gauges or counters kept elsewhere, as a list of
+        (name, labels dict, value) for metrics declared with define().
+        """
+        self._collectors.append(collector)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block as a stage of the current request.
+        Outside of a request (e.g. in a script), only the histogram is
+        updated, under endpoint "none".
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            timing = _request_timing.get()
+            if timing is not None:
+                timing.add(name, elapsed)
+            self.observe("pathfinder_stage_seconds", elapsed,
+                         endpoint=timing.endpoint if timing is not None else "none", stage=name)
+
+    def record_search(self, stats):
+        """
+        Adds the counters of the SearchStats of one route query.
+        """
+        self.increment("pathfinder_route_queries_total")
+        self.observe("pathfinder_searches_per_query", stats.searches)
+        self.increment("pathfinder_searches_total", stats.searches)
+        self.increment("pathfinder_settled_nodes_total", stats.settled)
+        self.increment("pathfinder_relaxed_edges_total", stats.relaxed)
+        self.increment("pathfinder_yen_candidates_total", stats.candidates)
+        self.increment("pathfinder_yen_rejected_total", stats.rejected)
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        collected = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                collected.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+
+        with self._lock:
+            series = {}
+            for (name, labels), value in self._counters.items():
+                series.setdefault(name, []).append((labels, value))
+            histograms = {}
+            for (name, labels), histogram in self._histograms.items():
+                histograms.setdefault(name, []).append(
+                    (labels, list(histogram.counts), histogram.sum, histogram.count))
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            if kind == "histogram":
+                for labels, counts, total, count in sorted(histograms.get(name, []), key=lambda item: item[0]):
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                for labels, value in sorted(series.get(name, []) + collected.get(name, [])):
+                    lines.append(f"{name}{_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that times every HTTP request: it counts requests by
+    endpoint and status, records their latency until the response starts,
+    and adds a Server-Timing header with the stages timed by
+    Metrics.stage() during the request.
+
+    Endpoints are labelled by route path; paths that match no route are
+    labelled "other" so unknown URLs cannot grow the metrics without bound.
+    """
+
+    def __init__(self, app, metrics, routes):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self._paths is None:
+            self._paths = {getattr(route, "path", None) for route in self.routes}
+        endpoint = scope["path"] if scope["path"] in self._paths else "other"
+        timing = RequestTiming(endpoint)
+        token = _request_timing.set(timing)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+                self.metrics.increment("pathfinder_requests_total", method=scope["method"], endpoint=endpoint,
+                                       status=message["status"])
+                self.metrics.observe("pathfinder_request_seconds", time.perf_counter() - timing.started,
+                                     endpoint=endpoint)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timing.reset(token)
@@ -1,87 +1,478 @@
-def dijkstra(graph, start_city, end_city):
+import heapq
+import math
+from itertools import islice
+
+from compiled_graph import EARTH_RADIUS_KM, CompiledGraph
+
+# Penalty method (see _iter_penalty): weight multiplier applied to the edges
+# of every path found, and searches in a row without a new alternative
+# after which it gives up
+PENALTY_FACTOR = 1.4
+MAX_PENALTY_FAILURES = 5
+
+
+def _compiled(graph):
     """
-    Dijkstra's algorithm to find the shortest path between two cities.
+    Returns graph as a CompiledGraph, compiling a dict-of-dicts on the fly.
+    """
+    if isinstance(graph, CompiledGraph):
+        return graph
+    return CompiledGraph.from_dict(graph)
+
+
+class SearchStats:
+    """
+    Counters filled in by the shortest-path searches when passed as stats.
+
+    Attributes:
+        searches: Number of shortest-path searches run
+        settled: Number of nodes settled (popped for the first time)
+        relaxed: Number of edges relaxed (scanned from a settled node)
+        candidates: Number of Yen spur paths found
+        rejected: Number of those rejected by is_path_different
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.settled = 0
+        self.relaxed = 0
+        self.candidates = 0
+        self.rejected = 0
+
+
+def _scanned_edges(offsets, nodes):
+    # Counted after the search from the settled nodes, so the inner loops
+    # pay nothing for it
+    return sum(offsets[node + 1] - offsets[node] for node in nodes)
+
+
+def _distance_lower_bound(graph, target):
+    """
+    Builds the A* heuristic for a target: the great-circle distance to the
+    target scaled by graph.heuristic_scale, which keeps it admissible
+    against the km edge weights.
 
     Returns:
-        tuple: (total_distance, path) where path is a list of cities
+        function: node id -> lower bound of the remaining distance
     """
-    distances = {city: float('inf') for city in graph}
-    distances[start_city] = 0
-    predecessors = {city: None for city in graph}
+    scale = graph.heuristic_scale
+    if scale == 0.0:
+        return lambda node: 0.0
+
+    longitudes, latitudes = graph.longitudes, graph.latitudes
+    target_longitude = math.radians(longitudes[target])
+    target_latitude = math.radians(latitudes[target])
+    cos_target_latitude = math.cos(target_latitude)
+    factor = 2 * EARTH_RADIUS_KM * scale
+
+    def lower_bound(node):
+        latitude = math.radians(latitudes[node])
+        h = (math.sin((target_latitude - latitude) / 2) ** 2
+             + math.cos(latitude) * cos_target_latitude
+             * math.sin((target_longitude - math.radians(longitudes[node])) / 2) ** 2)
+        return factor * math.asin(math.sqrt(min(h, 1.0)))
+
+    return lower_bound
+
+
+def _shortest_path(graph, source, target, banned_edges=None, banned_nodes=None,
+                   heuristic=None, stats=None, penalties=None):
+    """
+    Heap-based Dijkstra over the node ids of a CompiledGraph.
+
+    A shorter distance pushes a new heap entry instead of a decrease-key
+    operation, and stale entries are skipped when popped (lazy deletion).
+    The search stops as soon as target is settled.
+
+    banned_edges (CSR edge indices) and banned_nodes (node ids) are
+    per-query overlays: the search behaves as if they were removed, without
+    touching the graph, so one graph can serve concurrent searches.
+
+    When a heuristic (node id -> lower bound of the distance to target) is
+    given, nodes are ordered by distance + heuristic, i.e. A* search.
+
+    penalties ({CSR edge index: weight}) is another per-query overlay that
+    replaces the weight of some edges; weights may only be raised, so a
+    heuristic stays admissible.
+
+    Returns:
+        tuple: (total_distance, path) where path is a list of node ids
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = {source: 0}
+    predecessors = {source: None}
     visited = set()
+    heap = [(0, source)]
 
-    while len(visited) < len(graph):
-        current_city = None
-        current_distance = float('inf')
+    while heap:
+        _, current = heapq.heappop(heap)
 
-        for city in graph:
-            if city not in visited and distances[city] < current_distance:
-                current_city = city
-                current_distance = distances[city]
+        if current in visited:
+            continue
 
-        if current_city is None:
+        if current == target:
             break
 
-        visited.add(current_city)
-        for neighbor, weight in graph[current_city].items():
-            new_distance = distances[current_city] + weight
+        visited.add(current)
+        current_distance = distances[current]
+        for edge in range(offsets[current], offsets[current + 1]):
+            if banned_edges and edge in banned_edges:
+                continue
+
+            neighbor = targets[edge]
+            if banned_nodes and neighbor in banned_nodes:
+                continue
+
+            if penalties and edge in penalties:
+                new_distance = current_distance + penalties[edge]
+            else:
+                new_distance = current_distance + weights[edge]
 
-            if new_distance < distances[neighbor]:
+            if new_distance < distances.get(neighbor, float('inf')):
                 distances[neighbor] = new_distance
-                predecessors[neighbor] = current_city
+                predecessors[neighbor] = current
+                priority = new_distance + heuristic(neighbor) if heuristic else new_distance
+                heapq.heappush(heap, (priority, neighbor))
+
+    if stats is not None:
+        stats.searches += 1
+        stats.settled += len(visited) + (target in distances)
+        stats.relaxed += _scanned_edges(offsets, visited)
+
+    if target not in distances:
+        return float('inf'), []
 
     path = []
-    current = end_city
+    node = target
 
-    while current is not None:
-        path.append(current)
-        if current == start_city:
+    while node is not None:
+        path.append(node)
+        node = predecessors[node]
+
+    return distances[target], path[::-1]
+
+
+def _astar_path(graph, source, target, banned_edges=None, banned_nodes=None, stats=None, penalties=None):
+    """
+    A* search over the node ids of a CompiledGraph, guided by the
+    great-circle distance to the target.
+
+    Returns:
+        tuple: (total_distance, path) where path is a list of node ids
+    """
+    return _shortest_path(graph, source, target, banned_edges, banned_nodes,
+                          _distance_lower_bound(graph, target), stats, penalties)
+
+
+def _bidirectional_path(graph, source, target, banned_edges=None, banned_nodes=None, stats=None, penalties=None):
+    """
+    Bidirectional Dijkstra over the node ids of a CompiledGraph.
+
+    A forward search from source over the outgoing edges and a backward
+    search from target over the reverse adjacency are advanced alternately,
+    always expanding the side whose heap top is smaller. mu is the length
+    of the best source → target path seen so far through an edge joining
+    both searches; once the two heap tops add up to mu or more, no shorter
+    path can exist and the search stops.
+
+    Works on asymmetric graphs since the backward search follows incoming
+    edges. banned_edges, banned_nodes and penalties behave as in
+    _shortest_path.
+
+    Returns:
+        tuple: (total_distance, path) where path is a list of node ids
+    """
+    if source == target:
+        if stats is not None:
+            stats.searches += 1
+            stats.settled += 1
+        return 0, [source]
+
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    reverse_offsets, reverse_sources, reverse_edges = graph.reverse
+
+    forward_distances = {source: 0}
+    backward_distances = {target: 0}
+    forward_predecessors = {source: None}
+    backward_successors = {target: None}
+    forward_visited = set()
+    backward_visited = set()
+    forward_heap = [(0, source)]
+    backward_heap = [(0, target)]
+    best = float('inf')
+    meeting_node = None
+
+    while forward_heap and backward_heap:
+        if forward_heap[0][0] + backward_heap[0][0] >= best:
             break
-        current = predecessors[current]
 
-    if path[-1] != start_city:
+        if forward_heap[0][0] <= backward_heap[0][0]:
+            current_distance, current = heapq.heappop(forward_heap)
+            if current in forward_visited:
+                continue
+            forward_visited.add(current)
+
+            for edge in range(offsets[current], offsets[current + 1]):
+                if banned_edges and edge in banned_edges:
+                    continue
+                neighbor = targets[edge]
+                if banned_nodes and neighbor in banned_nodes:
+                    continue
+
+                if penalties and edge in penalties:
+                    new_distance = current_distance + penalties[edge]
+                else:
+                    new_distance = current_distance + weights[edge]
+                if new_distance < forward_distances.get(neighbor, float('inf')):
+                    forward_distances[neighbor] = new_distance
+                    forward_predecessors[neighbor] = current
+                    heapq.heappush(forward_heap, (new_distance, neighbor))
+
+                if neighbor in backward_distances and new_distance + backward_distances[neighbor] < best:
+                    best = new_distance + backward_distances[neighbor]
+                    meeting_node = neighbor
+        else:
+            current_distance, current = heapq.heappop(backward_heap)
+            if current in backward_visited:
+                continue
+            backward_visited.add(current)
+
+            for position in range(reverse_offsets[current], reverse_offsets[current + 1]):
+                edge = reverse_edges[position]
+                if banned_edges and edge in banned_edges:
+                    continue
+                neighbor = reverse_sources[position]
+                if banned_nodes and neighbor in banned_nodes:
+                    continue
+
+                if penalties and edge in penalties:
+                    new_distance = current_distance + penalties[edge]
+                else:
+                    new_distance = current_distance + weights[edge]
+                if new_distance < backward_distances.get(neighbor, float('inf')):
+                    backward_distances[neighbor] = new_distance
+                    backward_successors[neighbor] = current
+                    heapq.heappush(backward_heap, (new_distance, neighbor))
+
+                if neighbor in forward_distances and new_distance + forward_distances[neighbor] < best:
+                    best = new_distance + forward_distances[neighbor]
+                    meeting_node = neighbor
+
+    if stats is not None:
+        stats.searches += 1
+        stats.settled += len(forward_visited) + len(backward_visited)
+        stats.relaxed += _scanned_edges(offsets, forward_visited) + _scanned_edges(reverse_offsets, backward_visited)
+
+    if meeting_node is None:
         return float('inf'), []
 
-    return distances[end_city], path[::-1]
+    path = []
+    node = meeting_node
+    while node is not None:
+        path.append(node)
+        node = forward_predecessors[node]
+    path.reverse()
+
+    node = backward_successors[meeting_node]
+    while node is not None:
+        path.append(node)
+        node = backward_successors[node]
+
+    return best, path
+
+
+def _shortest_path_tree(graph, source, stats=None, until=None):
+    """
+    Single-source Dijkstra over the node ids of a CompiledGraph, settling
+    every reachable node, or stopping once every node of until is settled.
+
+    Returns:
+        tuple: (distances, predecessors) dictionaries keyed by node id
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = {source: 0}
+    predecessors = {source: None}
+    visited = set()
+    heap = [(0, source)]
+    remaining = set(until) if until is not None else None
+
+    while heap:
+        current_distance, current = heapq.heappop(heap)
+
+        if current in visited:
+            continue
+
+        visited.add(current)
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            new_distance = current_distance + weights[edge]
+
+            if new_distance < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = current
+                heapq.heappush(heap, (new_distance, neighbor))
+
+    if stats is not None:
+        stats.searches += 1
+        stats.settled += len(visited)
+        stats.relaxed += _scanned_edges(offsets, visited)
+
+    return distances, predecessors
+
 
+# Point-to-point search used for the optimal route and Yen's spur searches
+ENGINES = {
+    "dijkstra": _shortest_path,
+    "astar": _astar_path,
+    "bidirectional": _bidirectional_path,
+}
 
-def _remove_edge(graph, u, v):
+
+def _search_function(engine):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown search engine: {engine}. Available: {', '.join(ENGINES)}")
+    return ENGINES[engine]
+
+
+def dijkstra(graph, start_city, end_city, stats=None):
+    """
+    Dijkstra's algorithm to find the shortest path between two cities.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is searched directly
+        stats: Optional SearchStats collecting the number of settled nodes
+
+    Returns:
+        tuple: (total_distance, path) where path is a list of cities
+    """
+    return _city_search(_shortest_path, graph, start_city, end_city, stats)
+
+
+def astar(graph, start_city, end_city, stats=None):
+    """
+    A* search between two cities, using the haversine distance computed
+    from the graph coordinates (graph.pos) as heuristic. Returns the same
+    distances as dijkstra while settling fewer nodes.
+
+    Args:
+        graph: CompiledGraph with coordinates (a plain dict has none, so
+               it is searched with Dijkstra)
+        stats: Optional SearchStats collecting the number of settled nodes
+
+    Returns:
+        tuple: (total_distance, path) where path is a list of cities
+    """
+    return _city_search(_astar_path, graph, start_city, end_city, stats)
+
+
+def bidirectional_dijkstra(graph, start_city, end_city, stats=None):
     """
-    Temporarily removes edge u → v and returns its weight.
+    Bidirectional Dijkstra between two cities: searches forward from
+    start_city and backward from end_city until they meet. Returns the same
+    distances as dijkstra while settling fewer nodes on large graphs.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is searched with
+               Dijkstra
+        stats: Optional SearchStats collecting the number of settled nodes
 
     Returns:
-        float: The weight of the removed edge, or None if the edge doesn't exist
+        tuple: (total_distance, path) where path is a list of cities
+    """
+    return _city_search(_bidirectional_path, graph, start_city, end_city, stats)
+
+
+def _city_search(search, graph, start_city, end_city, stats):
+    """
+    Runs a node-id search function with city names. A dict-of-dicts is
+    searched as it is rather than compiled: compiling costs a pass over the
+    whole graph, more than a single search that stops at end_city.
     """
-    if v in graph[u]:
-        weight = graph[u][v]
-        del graph[u][v]
-        return weight
-    return None
+    if not isinstance(graph, CompiledGraph):
+        return _dict_shortest_path(graph, start_city, end_city, stats)
 
+    source = graph.node_id(start_city)
+    target = graph.node_id(end_city)
 
-def _restore_edge(graph, u, v, weight):
+    if source is None or target is None:
+        return float('inf'), []
+
+    distance, path = search(graph, source, target, stats=stats)
+    return distance, graph.path_names(path)
+
+
+def _dict_shortest_path(graph, start_city, end_city, stats=None):
     """
-    Restores a previously removed edge.
+    Dijkstra on a dict-of-dicts keyed by city names, with a binary heap and
+    lazy deletion, stopping as soon as end_city is settled.
 
+    Returns:
+        tuple: (total_distance, path) where path is a list of cities
     """
-    if weight is not None:
-        graph[u][v] = weight
+    if start_city not in graph:
+        return float('inf'), []
+
+    if stats is not None:
+        stats.searches += 1
+
+    distances = {start_city: 0}
+    predecessors = {start_city: None}
+    visited = set()
+    heap = [(0, start_city)]
+
+    while heap:
+        current_distance, current_city = heapq.heappop(heap)
+
+        if current_city in visited:
+            continue
+
+        if current_city == end_city:
+            break
+
+        visited.add(current_city)
+        neighbors = graph.get(current_city, {})
+        if stats is not None:
+            stats.settled += 1
+            stats.relaxed += len(neighbors)
+        for neighbor, weight in neighbors.items():
+            new_distance = current_distance + weight
+
+            if new_distance < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_distance
+                predecessors[neighbor] = current_city
+                heapq.heappush(heap, (new_distance, neighbor))
+
+    if end_city not in distances:
+        return float('inf'), []
+
+    path = []
+    current = end_city
+
+    while current is not None:
+        path.append(current)
+        current = predecessors[current]
+
+    return distances[end_city], path[::-1]
 
 
 def _path_distance(graph, path):
     """
-    Calculate the total distance of a path by summing edge weights.
+    Calculate the total distance of a path of node ids by summing edge weights.
 
     Returns:
         float: The total distance of the path
     """
     distance = 0
     for i in range(len(path) - 1):
-        u, v = path[i], path[i + 1]
-        if v in graph[u]:
-            distance += graph[u][v]
-        else:
+        weight = graph.edge_weight(path[i], path[i + 1])
+        if weight is None:
             return float('inf')
+        distance += weight
     return distance
 
 
@@ -121,86 +512,408 @@ def is_path_different(new_path, existing_paths, similarity_threshold=0.7):
     return True
 
 
-def k_shortest_paths(graph, start_city, end_city, k=5, max_ratio=1.5):
+def k_shortest_paths(graph, start_city, end_city, k=5, max_ratio=1.5, engine="dijkstra", stats=None,
+                     hierarchy=None, method="yen"):
     """
     Computes the k shortest simple paths between two cities using
-    Yen's algorithm (without NetworkX).
+    Yen's algorithm (without NetworkX), or k diverse alternatives with
+    method="penalty" (see iter_shortest_paths).
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is compiled on the fly
+        engine: Search used for the optimal path and the spur paths
+                ("dijkstra", "astar" or "bidirectional")
+        stats: Optional SearchStats collecting the searches and settled nodes
+        hierarchy: Optional ContractionHierarchy of graph used for the optimal path
+        method: "yen" or "penalty"
 
     Returns:
         list: List of tuples (distance, path) sorted by increasing distance
     """
-    optimal_distance, optimal_path = dijkstra(graph, start_city, end_city)
+    paths = list(islice(iter_shortest_paths(graph, start_city, end_city, max_ratio, engine, stats, hierarchy,
+                                            method), k))
+    # Penalty alternatives are found in no particular order after the optimal path
+    return sorted(paths, key=lambda item: item[0]) if method == "penalty" else paths
+
+
+def iter_shortest_paths(graph, start_city, end_city, max_ratio=1.5, engine="dijkstra", stats=None,
+                        hierarchy=None, method="yen"):
+    """
+    Yields the shortest simple paths between two cities in order of
+    increasing distance, computing each one only when it is requested.
+
+    Paths longer than max_ratio times the optimal distance, or not
+    different enough from the paths already yielded (see
+    is_path_different), are skipped.
+
+    With method="penalty", alternatives come from the edge-penalty method
+    instead of Yen's algorithm (see _iter_penalty): the same stretch and
+    similarity bounds, far fewer searches, but alternatives are yielded in
+    the order they are found rather than by distance, and are not
+    guaranteed to be the shortest ones.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is compiled on the fly
+        engine: Search used for the optimal path and the spur paths
+                ("dijkstra", "astar" or "bidirectional")
+        stats: Optional SearchStats collecting the searches and settled nodes
+        hierarchy: Optional ContractionHierarchy of graph used for the optimal
+                   path (spur searches need banned edges, which a hierarchy
+                   cannot honour, so they always use engine)
+        method: "yen" or "penalty"
+
+    Yields:
+        tuple: (distance, path) where path is a list of cities
+    """
+    search = _search_function(engine)
+    alternatives = _alternatives_function(method)
+    graph = _compiled(graph)
+
+    if hierarchy is not None and hierarchy.graph is not graph:
+        raise ValueError("The contraction hierarchy was built from a different graph")
+    source = graph.node_id(start_city)
+    target = graph.node_id(end_city)
+
+    if source is None or target is None:
+        return
+
+    for distance, path in alternatives(graph, source, target, max_ratio, search, stats, hierarchy):
+        yield distance, graph.path_names(path)
+
+
+def shortest_paths_from(graph, start_city, end_cities, k=5, max_ratio=1.5, engine="dijkstra", stats=None,
+                        method="yen"):
+    """
+    Computes the k shortest paths from one city to several destinations.
+
+    A single shortest-path tree from start_city, grown until every
+    destination is settled, gives the optimal path to all of them; only
+    the alternatives (k > 1) need Yen's spur searches per destination.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is compiled on the fly
+        end_cities: Iterable of destination cities
+        engine: Search used for the spur paths ("dijkstra", "astar" or "bidirectional")
+        stats: Optional SearchStats collecting the searches and settled nodes
+        method: "yen" or "penalty" (see iter_shortest_paths)
+
+    Returns:
+        dict: destination -> list of tuples (distance, path), [] when unreachable
+    """
+    search = _search_function(engine)
+    alternatives = _alternatives_function(method)
+    graph = _compiled(graph)
+    results = {end_city: [] for end_city in end_cities}
+    source = graph.node_id(start_city)
+
+    if source is None or k < 1:
+        return results
+
+    targets = {end_city: graph.node_id(end_city) for end_city in results}
+    distances, predecessors = _shortest_path_tree(
+        graph, source, stats, until=[target for target in targets.values() if target is not None]
+    )
+
+    for end_city, target in targets.items():
+        if target is None or target not in distances:
+            continue
+
+        optimal_path = []
+        node = target
+        while node is not None:
+            optimal_path.append(node)
+            node = predecessors[node]
+
+        paths = alternatives(graph, source, target, max_ratio, search, stats,
+                             optimal=(distances[target], optimal_path[::-1]))
+        paths = sorted(islice(paths, k), key=lambda item: item[0])
+        results[end_city] = [(distance, graph.path_names(path)) for distance, path in paths]
+
+    return results
+
+
+def distance_table(graph, origins, destinations, include_paths=False, stats=None):
+    """
+    Shortest distances from every origin to every destination, with one
+    shortest-path tree per distinct origin, grown until every destination
+    is settled. Used instead of the all-pairs matrix when none is available
+    for a large graph: memory stays proportional to the nodes settled.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is compiled on the fly
+        origins, destinations: Lists of cities
+        include_paths: Also return the paths
+        stats: Optional SearchStats collecting the searches and settled nodes
+
+    Returns:
+        tuple: (distances, paths) where distances[i][j] is the distance from
+        origins[i] to destinations[j] (inf when unreachable) and paths[i][j]
+        the path as a list of cities ([] when unreachable), or None when
+        include_paths is False
+    """
+    graph = _compiled(graph)
+    targets = [graph.node_id(city) for city in destinations]
+    until = [target for target in targets if target is not None]
+    rows = {}
+
+    for origin in origins:
+        if origin in rows:
+            continue
+        source = graph.node_id(origin)
+        if source is None:
+            rows[origin] = ([float('inf')] * len(targets), [[] for _ in targets])
+            continue
+
+        distances, predecessors = _shortest_path_tree(graph, source, stats, until=until)
+        row_distances = []
+        row_paths = []
+        for target in targets:
+            # Every target is settled when the tree stops, so its distance is final
+            if target is None or target not in distances:
+                row_distances.append(float('inf'))
+                row_paths.append([])
+                continue
+            row_distances.append(distances[target])
+            path = []
+            if include_paths:
+                node = target
+                while node is not None:
+                    path.append(node)
+                    node = predecessors[node]
+            row_paths.append(graph.path_names(path[::-1]))
+        rows[origin] = (row_distances, row_paths)
+
+    distances = [list(rows[origin][0]) for origin in origins]
+    paths = [list(rows[origin][1]) for origin in origins] if include_paths else None
+    return distances, paths
+
+
+def reachable_within(graph, start_cities, max_distance, stats=None):
+    """
+    Finds every city within max_distance of one of several start cities
+    with a single multi-source Dijkstra: all start cities are pushed at
+    distance 0 and the search stops at the radius, instead of one search
+    per destination.
+
+    Args:
+        graph: CompiledGraph, or a dict-of-dicts which is compiled on the fly
+        start_cities: Iterable of start cities (e.g. depots); unknown ones are ignored
+        max_distance: Radius in km, inclusive
+        stats: Optional SearchStats collecting the searches and settled nodes
+
+    Returns:
+        dict: city -> (distance, closest start city), in order of increasing
+        distance; start cities are included at distance 0
+    """
+    graph = _compiled(graph)
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = {}
+    origins = {}
+    heap = []
+    for start_city in start_cities:
+        source = graph.node_id(start_city)
+        if source is not None and source not in distances and max_distance >= 0:
+            distances[source] = 0
+            origins[source] = source
+            heap.append((0, source))
+
+    settled = []
+    visited = set()
+
+    while heap:
+        current_distance, current = heapq.heappop(heap)
+
+        if current in visited:
+            continue
+
+        visited.add(current)
+        settled.append(current)
+
+        for edge in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[edge]
+            new_distance = current_distance + weights[edge]
+
+            # Nodes beyond the radius are never queued
+            if new_distance <= max_distance and new_distance < distances.get(neighbor, float('inf')):
+                distances[neighbor] = new_distance
+                origins[neighbor] = origins[current]
+                heapq.heappush(heap, (new_distance, neighbor))
+
+    if stats is not None:
+        stats.searches += 1
+        stats.settled += len(settled)
+        stats.relaxed += _scanned_edges(offsets, settled)
+
+    names = graph.names
+    return {names[node]: (distances[node], names[origins[node]]) for node in settled}
+
+
+def _iter_yen(graph, source, target, max_ratio, search=_shortest_path, stats=None, hierarchy=None,
+              optimal=None):
+    """
+    Lazy Yen's algorithm over the node ids of a CompiledGraph.
+
+    Candidates are kept in a heap ordered by (distance, insertion order),
+    with a set of path tuples for duplicate detection. Every accepted or
+    candidate path is also inserted in a prefix trie, so the edges to ban
+    for a root path are the children of the trie node reached by walking
+    that root path.
+
+    The graph is never modified. Each spur search receives its own banned
+    edges and banned nodes (the root path before the spur node), so this
+    generator is safe to run concurrently on a shared graph.
+
+    optimal, when given, is the already known (distance, path) of the
+    shortest path, e.g. from a shortest-path tree.
+
+    Yields:
+        tuple: (distance, path) where path is a list of node ids
+    """
+    if optimal is not None:
+        optimal_distance, optimal_path = optimal
+    elif hierarchy is not None:
+        optimal_distance, optimal_path = hierarchy.shortest_path(source, target, stats)
+    else:
+        optimal_distance, optimal_path = search(graph, source, target, stats=stats)
 
     if not optimal_path or optimal_distance == float('inf'):
-        return []
+        return
 
     valid_paths = [(optimal_distance, optimal_path)]
-    candidate_paths = []
+    known_paths = {tuple(optimal_path)}
+    prefix_trie = {}
+    _trie_insert(prefix_trie, optimal_path)
+    candidate_heap = []
+    counter = 0
+
+    yield optimal_distance, optimal_path
 
-    for iteration in range(1, k):
+    while True:
         _, previous_path = valid_paths[-1]
+        trie_node = prefix_trie
 
         for i in range(len(previous_path) - 1):
             deviation_node = previous_path[i]
             root_path = previous_path[:i + 1]
-            removed_edges = []
-
-            for _, existing_path in valid_paths:
-                if len(existing_path) > i and existing_path[:i + 1] == root_path:
-                    if i + 1 < len(existing_path):
-                        u = existing_path[i]
-                        v = existing_path[i + 1]
-                        weight = _remove_edge(graph, u, v)
-                        if weight is not None:
-                            removed_edges.append((u, v, weight))
-
-            for _, candidate_path in candidate_paths:
-                if len(candidate_path) > i and candidate_path[:i + 1] == root_path:
-                    if i + 1 < len(candidate_path):
-                        u = candidate_path[i]
-                        v = candidate_path[i + 1]
-                        weight = _remove_edge(graph, u, v)
-                        if weight is not None:
-                            removed_edges.append((u, v, weight))
-
-            removed_root_nodes = []
-            for j in range(i):
-                node = root_path[j]
-                for neighbor in list(graph[node].keys()):
-                    weight = _remove_edge(graph, node, neighbor)
-                    if weight is not None:
-                        removed_root_nodes.append((node, neighbor, weight))
-
-            deviation_distance, deviation_path = dijkstra(graph, deviation_node, end_city)
-
-            for u, v, weight in removed_root_nodes:
-                _restore_edge(graph, u, v, weight)
-
-            for u, v, weight in removed_edges:
-                _restore_edge(graph, u, v, weight)
+            trie_node = trie_node[deviation_node]
+
+            banned_edges = set()
+            for next_node in trie_node:
+                edge = graph.edge_index(deviation_node, next_node)
+                if edge is not None:
+                    banned_edges.add(edge)
+
+            banned_nodes = set(root_path[:-1])
+
+            deviation_distance, deviation_path = search(
+                graph, deviation_node, target, banned_edges, banned_nodes, stats=stats
+            )
 
             if deviation_path and deviation_distance < float('inf'):
                 total_path = root_path[:-1] + deviation_path
+                path_key = tuple(total_path)
+                if stats is not None:
+                    stats.candidates += 1
 
-                if len(total_path) == len(set(total_path)):
+                if path_key not in known_paths and len(path_key) == len(set(path_key)):
                     total_distance = _path_distance(graph, total_path)
 
                     if total_distance <= optimal_distance * max_ratio:
                         if is_path_different(total_path, valid_paths):
-                            path_already_present = False
-                            for _, candidate in candidate_paths:
-                                if candidate == total_path:
-                                    path_already_present = True
-                                    break
+                            known_paths.add(path_key)
+                            _trie_insert(prefix_trie, total_path)
+                            heapq.heappush(candidate_heap, (total_distance, counter, total_path))
+                            counter += 1
+                        elif stats is not None:
+                            stats.rejected += 1
 
-                            if not path_already_present:
-                                candidate_paths.append((total_distance, total_path))
+        if not candidate_heap:
+            return
 
-        if not candidate_paths:
-            break
+        best_distance, _, best_path = heapq.heappop(candidate_heap)
+        valid_paths.append((best_distance, best_path))
+        yield best_distance, best_path
+
+
+def _iter_penalty(graph, source, target, max_ratio, search=_shortest_path, stats=None, hierarchy=None,
+                  optimal=None):
+    """
+    Alternative routes by iterative edge penalties over the node ids of a
+    CompiledGraph.
+
+    After each path is found, the weight of its edges (both directions) is
+    multiplied by PENALTY_FACTOR in a per-query overlay, and the next
+    search on the penalized weights is drawn away from the routes already
+    known. A path is yielded when its real distance is within max_ratio of
+    the optimal one and it passes is_path_different, like Yen's; every
+    search thus targets a new route instead of enumerating the near
+    identical detours Yen must reject. The generator stops after
+    MAX_PENALTY_FAILURES searches in a row yield nothing.
+
+    Yields:
+        tuple: (distance, path) where path is a list of node ids, the
+        optimal path first
+    """
+    if optimal is not None:
+        optimal_distance, optimal_path = optimal
+    elif hierarchy is not None:
+        optimal_distance, optimal_path = hierarchy.shortest_path(source, target, stats)
+    else:
+        optimal_distance, optimal_path = search(graph, source, target, stats=stats)
+
+    if not optimal_path or optimal_distance == float('inf'):
+        return
+
+    valid_paths = [(optimal_distance, optimal_path)]
+    yield optimal_distance, optimal_path
+
+    weights = graph.weights
+    penalties = {}
+    path = optimal_path
+    failures = 0
+
+    while failures < MAX_PENALTY_FAILURES:
+        for u, v in zip(path, path[1:]):
+            for edge in (graph.edge_index(u, v), graph.edge_index(v, u)):
+                if edge is not None:
+                    penalties[edge] = penalties.get(edge, weights[edge]) * PENALTY_FACTOR
+
+        _, path = search(graph, source, target, stats=stats, penalties=penalties)
+        if not path:
+            return
+        if stats is not None:
+            stats.candidates += 1
+
+        distance = _path_distance(graph, path)
+        if distance > optimal_distance * max_ratio:
+            failures += 1
+        elif not is_path_different(path, valid_paths):
+            failures += 1
+            if stats is not None:
+                stats.rejected += 1
+        else:
+            failures = 0
+            valid_paths.append((distance, path))
+            yield distance, path
 
-        candidate_paths.sort(key=lambda x: x[0])
-        best_candidate = candidate_paths.pop(0)
-        valid_paths.append(best_candidate)
 
-    return valid_paths
+# Generators of alternative routes
+ALTERNATIVES = {
+    "yen": _iter_yen,
+    "penalty": _iter_penalty,
+}
+
+
+def _alternatives_function(method):
+    if method not in ALTERNATIVES:
+        raise ValueError(f"Unknown alternatives method: {method}. Available: {', '.join(ALTERNATIVES)}")
+    return ALTERNATIVES[method]
+
+
+def _trie_insert(trie, path):
+    """
+    Inserts a path in a prefix trie of nested dictionaries keyed by node.
+    """
+    node = trie
+    for city in path:
+        node = node.setdefault(city, {})
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _warm_up():
+    """
+    Runs in each worker process at startup so matplotlib, pyplot and
+    networkx are imported once per worker instead of on the first render.
+    """
+    import visualizer  # noqa: F401
+
+
+def _render(graph_data, paths_data, start_city, end_city, image_format):
+    from visualizer import render_route_image
+    return render_route_image(graph_data, paths_data, start_city, end_city, image_format)
+
+
+class RenderPool:
+    """
+    Renders route images in a pool of worker processes so the matplotlib
+    work never blocks the event loop.
+
+    At most max_pending renders are queued or running at once; when the
+    pool is saturated, or a render takes longer than timeout seconds,
+    render() returns None and the caller answers without an image.
+    """
+
+    def __init__(self, workers=2, max_pending=8, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rendered = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def start(self):
+        """
+        Starts the worker processes and waits until each has imported the
+        visualization stack.
+        """
+        with self._start_lock:
+            if self._executor is not None:
+                return
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+            for future in [executor.submit(int) for _ in range(self.workers)]:
+                future.result()
+            self._executor = executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, graph_data, paths_data, start_city, end_city, image_format='png'):
+        """
+        Renders a route image (see visualizer.render_route_image) in a worker.
+
+        Returns:
+            bytes: The encoded image, or None if the pool is saturated or
+            the render timed out
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                return None
+            self._pending += 1
+
+        try:
+            if self._executor is None:
+                await asyncio.get_running_loop().run_in_executor(None, self.start)
+            future = self._executor.submit(_render, graph_data, paths_data, start_city, end_city, image_format)
+        except BaseException:
+            self._release(None)
+            raise
+
+        # The slot is released when the worker is done, even after a timeout
+        future.add_done_callback(self._release)
+
+        try:
+            image = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            return None
+
+        with self._lock:
+            self.rendered += 1
+        return image
+
+    def stats(self):
+        """
+        Returns the pool counters as a dictionary.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rendered": self.rendered,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
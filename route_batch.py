@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from pathfinding import shortest_paths_from
+
+
+_worker_graph = None
+
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _route_group(graph, start_city, destinations, max_ratio, engine, method):
+    """
+    Routes one origin to all its destinations with a shared shortest-path
+    tree (see pathfinding.shortest_paths_from).
+
+    Args:
+        destinations: Dictionary destination -> k
+
+    Returns:
+        tuple: (start_city, dictionary destination -> list of (distance, path))
+    """
+    k = max(destinations.values())
+    paths = shortest_paths_from(graph, start_city, destinations, k, max_ratio, engine, method=method)
+    return start_city, {end_city: paths[end_city][:count] for end_city, count in destinations.items()}
+
+
+def _route_group_in_worker(start_city, destinations, max_ratio, engine, method):
+    return _route_group(_worker_graph, start_city, destinations, max_ratio, engine, method)
+
+
+class BatchRouter:
+    """
+    Computes many routes at once, grouped by origin: each group shares one
+    shortest-path tree, and groups run in parallel in a pool of worker
+    processes that each hold a copy of the graph.
+
+    The pool is bound to one graph version and is restarted when the graph
+    changes. With a single worker, groups run in the default thread pool
+    instead, without any process start-up or copy of the graph.
+    """
+
+    def __init__(self, workers=None, max_ratio=1.5, engine="dijkstra", method="yen"):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_ratio = max_ratio
+        self.engine = engine
+        self.method = method
+        self.batches = 0
+        self.groups = 0
+        self._executor = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def start(self, graph):
+        """
+        Starts the worker processes with a copy of graph, replacing a pool
+        started for another graph version.
+
+        Returns:
+            ProcessPoolExecutor: The pool holding graph (None with a single
+            worker); a batch must submit to it, since a batch on another
+            version may replace self's pool at any time
+        """
+        if self.workers == 1:
+            return None
+
+        with self._lock:
+            if self._executor is not None and self._version == graph.version:
+                return self._executor
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(graph,))
+            self._version = graph.version
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._version = None
+
+    async def route(self, graph, groups):
+        """
+        Routes every group and yields the results as each group completes.
+
+        Args:
+            groups: Dictionary start_city -> dictionary destination -> k
+
+        Yields:
+            tuple: (start_city, dictionary destination -> list of (distance, path))
+        """
+        loop = asyncio.get_running_loop()
+        futures = None
+
+        if self.workers > 1:
+            executor = await loop.run_in_executor(None, self.start, graph)
+            futures = []
+            try:
+                for start_city, destinations in groups.items():
+                    futures.append(loop.run_in_executor(executor, _route_group_in_worker, start_city, destinations,
+                                                        self.max_ratio, self.engine, self.method))
+            except RuntimeError:
+                # A batch on a newer version shut this pool down in the meantime:
+                # route this one in threads, on its own graph
+                for future in futures:
+                    future.cancel()
+                futures = None
+
+        if futures is None:
+            futures = [loop.run_in_executor(None, _route_group, graph, start_city, destinations,
+                                            self.max_ratio, self.engine, self.method)
+                       for start_city, destinations in groups.items()]
+
+        self.batches += 1
+        self.groups += len(futures)
+
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            # The client may disconnect before the whole batch is streamed
+            for future in futures:
+                future.cancel()
+
+    def stats(self):
+        """
+        Returns the batch counters as a dictionary.
+        """
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "groups": self.groups,
+        }
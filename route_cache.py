@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Retired graph versions remembered; a request running on an older one than
+# that (MAX_RETIRED_VERSIONS edits ago) is not expected to still be running
+MAX_RETIRED_VERSIONS = 64
+
+
+class RouteCache:
+    """
+    Thread-safe in-process LRU cache with time-to-live, for computed path
+    lists and rendered route responses.
+
+    Every entry belongs to a graph version (CompiledGraph.version). Storing
+    an entry for a new version drops all entries of the previous one, so the
+    cache is invalidated automatically whenever the graph changes, and a
+    lookup never returns an entry computed on another graph. Versions
+    replaced with set_version() are retired: results of requests that
+    were still running on them are not stored. Only the last
+    MAX_RETIRED_VERSIONS retired versions are remembered.
+
+    Memory is bounded both by number of entries and by the approximate size
+    in bytes given when storing each entry; the least recently used entries
+    are evicted first.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, ttl=600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.reverse_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._retired = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        """
+        Returns the cached value for key on the given graph version, or None.
+        """
+        with self._lock:
+            value = self._lookup(key, version)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def get_paths(self, graph, start_city, end_city, k, max_ratio):
+        """
+        Looks up the k shortest paths from start_city to end_city. On a
+        symmetric graph, a cached result for the reverse direction is
+        reversed and reused.
+
+        Returns:
+            list: List of tuples (distance, path), or None on a cache miss
+        """
+        # Outside the lock: the first call on a graph scans every edge (LiveGraph
+        # computes it before a version is installed, off the event loop)
+        symmetric = graph.is_symmetric
+
+        with self._lock:
+            paths = self._lookup(("paths", start_city, end_city, k, max_ratio), graph.version)
+            if paths is not None:
+                self.hits += 1
+                return paths
+
+            reverse = None
+            if symmetric:
+                reverse = self._lookup(("paths", end_city, start_city, k, max_ratio), graph.version)
+            if reverse is None:
+                self.misses += 1
+                return None
+
+            self.reverse_hits += 1
+
+        paths = [(distance, path[::-1]) for distance, path in reverse]
+        self.put_paths(graph, start_city, end_city, k, max_ratio, paths)
+        return paths
+
+    def put(self, key, version, value, size=0):
+        """
+        Stores a value computed on the given graph version.
+
+        Args:
+            size: Approximate size of the value in bytes
+        """
+        with self._lock:
+            if version in self._retired:
+                return
+            if version != self.version:
+                self._entries.clear()
+                self._size = 0
+                self.version = version
+
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._size += size
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def put_paths(self, graph, start_city, end_city, k, max_ratio, paths):
+        """
+        Stores the k shortest paths from start_city to end_city.
+        """
+        size = sum(64 + 8 * len(path) for _, path in paths)
+        self.put(("paths", start_city, end_city, k, max_ratio), graph.version, paths, size)
+
+    def set_version(self, version):
+        """
+        Makes version the current graph version: entries of the previous
+        version are dropped and that version is retired.
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if self.version is not None:
+                self._retired[self.version] = None
+                if len(self._retired) > MAX_RETIRED_VERSIONS:
+                    self._retired.popitem(last=False)
+            self._retired.pop(version, None)
+            self._entries.clear()
+            self._size = 0
+            self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """
+        Returns the cache counters as a dictionary.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "version": self.version,
+                "hits": self.hits,
+                "reverse_hits": self.reverse_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _lookup(self, key, version):
+        entry = self._entries.get(key) if version == self.version else None
+        if entry is None:
+            return None
+
+        if entry[2] < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
@@ -0,0 +1,73 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent work: the first caller for a key starts
+    the computation, and callers arriving while it runs await the same
+    result instead of computing it again.
+
+    Keys are tuples whose first element names the operation ("response",
+    "paths", "image"); the counters are kept per operation. The key is
+    released as soon as the computation finishes, so later callers go
+    through the route cache instead.
+
+    The computation runs in its own task: a caller that is cancelled (its
+    client disconnected) does not cancel it for the others. Its result or
+    exception is shared by every caller. Flights live in the event loop of
+    one process; each worker process coalesces its own requests.
+
+    Attributes:
+        enabled: When False, every call computes (for comparisons)
+        started: Dictionary operation -> computations started
+        coalesced: Dictionary operation -> calls that joined a computation
+                   already in flight
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = {}
+        self.coalesced = {}
+        self._flights = {}
+
+    async def run(self, key, compute):
+        """
+        Returns the result of compute(), shared with identical calls in flight.
+
+        Args:
+            key: Tuple (operation, ...) identifying the work, graph version included
+            compute: Function returning a coroutine; only the first caller calls it
+        """
+        operation = key[0]
+        if not self.enabled:
+            self.started[operation] = self.started.get(operation, 0) + 1
+            return await compute()
+
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+            self.started[operation] = self.started.get(operation, 0) + 1
+        else:
+            self.coalesced[operation] = self.coalesced.get(operation, 0) + 1
+
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """
+        Returns the flight counters as a dictionary.
+        """
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "started": dict(self.started),
+            "coalesced": dict(self.coalesced),
+        }
+
+    def _land(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieved here too, so an error nobody waited for is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,188 @@
+import heapq
+import math
+from array import array
+
+from compiled_graph import EARTH_RADIUS_KM, haversine_km
+
+# Average number of nodes per grid cell
+NODES_PER_CELL = 2
+
+
+class SpatialIndex:
+    """
+    Uniform grid over the longitudes and latitudes of a CompiledGraph, for
+    nearest-node lookups from arbitrary positions without scanning every
+    node.
+
+    Cells are about square on the ground (their width in degrees is
+    stretched by the latitude of the centre of the network) and hold
+    NODES_PER_CELL nodes on average. The nodes of each cell are stored in
+    CSR form, like the adjacency of the graph: cell c holds
+    nodes[offsets[c]:offsets[c + 1]].
+
+    A lookup visits rings of cells around the cell of the query position,
+    closest first, and stops once no unvisited cell can hold a node closer
+    than the k-th best found. That bound is a lower bound of the
+    great-circle distance to the cells left, so results are exact. Longitudes are not
+    wrapped around the antimeridian.
+
+    Nodes without coordinates are not indexed.
+
+    Attributes:
+        graph: The CompiledGraph the index was built from
+        size: Number of nodes indexed
+    """
+
+    def __init__(self, graph, origin, cell_size, shape, offsets, nodes, max_latitude):
+        self.graph = graph
+        self.min_longitude, self.min_latitude = origin
+        self.cell_width, self.cell_height = cell_size
+        self.columns, self.rows = shape
+        self.offsets = offsets
+        self.nodes = nodes
+        self.max_latitude = max_latitude
+        self.size = len(nodes)
+
+    @classmethod
+    def build(cls, graph, nodes_per_cell=NODES_PER_CELL):
+        """
+        Buckets every node with coordinates into a grid cell (counting sort).
+
+        Returns:
+            SpatialIndex: The index
+        """
+        longitudes, latitudes = graph.longitudes, graph.latitudes
+        # NaN compares unequal to itself
+        located = [node for node in range(len(graph))
+                   if longitudes[node] == longitudes[node] and latitudes[node] == latitudes[node]]
+        if not located:
+            return cls(graph, (0.0, 0.0), (1.0, 1.0), (0, 0), array('q', [0]), array('i'), 0.0)
+
+        min_longitude = min(longitudes[node] for node in located)
+        max_longitude = max(longitudes[node] for node in located)
+        min_latitude = min(latitudes[node] for node in located)
+        max_latitude = max(latitudes[node] for node in located)
+
+        # Cell side in km so that the grid has about len(located) / nodes_per_cell cells
+        km_per_degree = math.radians(EARTH_RADIUS_KM)
+        stretch = max(math.cos(math.radians((min_latitude + max_latitude) / 2)), 1e-6)
+        width_km = (max_longitude - min_longitude) * km_per_degree * stretch
+        height_km = (max_latitude - min_latitude) * km_per_degree
+        cells = max(1, len(located) // nodes_per_cell)
+        if width_km > 0 and height_km > 0:
+            side_km = math.sqrt(width_km * height_km / cells)
+        else:
+            side_km = max(width_km, height_km) / cells or 1.0
+
+        columns = max(1, min(cells, math.ceil(width_km / side_km)))
+        rows = max(1, min(cells, math.ceil(height_km / side_km)))
+        # Widened a little so the maximum falls in the last cell
+        cell_width = (max_longitude - min_longitude) / columns * (1 + 1e-9) or 1.0
+        cell_height = (max_latitude - min_latitude) / rows * (1 + 1e-9) or 1.0
+
+        cell_of = [min(int((longitudes[node] - min_longitude) / cell_width), columns - 1)
+                   + min(int((latitudes[node] - min_latitude) / cell_height), rows - 1) * columns
+                   for node in located]
+
+        offsets = array('q', [0]) * (columns * rows + 1)
+        for cell in cell_of:
+            offsets[cell + 1] += 1
+        for cell in range(columns * rows):
+            offsets[cell + 1] += offsets[cell]
+
+        nodes = array('i', [0]) * len(located)
+        position = offsets[:-1]
+        for node, cell in zip(located, cell_of):
+            nodes[position[cell]] = node
+            position[cell] += 1
+
+        return cls(graph, (min_longitude, min_latitude), (cell_width, cell_height), (columns, rows), offsets,
+                   nodes, max(abs(min_latitude), abs(max_latitude)))
+
+    def nearest(self, longitude, latitude, k=1):
+        """
+        Finds the k nodes closest to a position, by great-circle distance.
+
+        Args:
+            longitude, latitude: Position in degrees
+            k: Number of nodes to return
+
+        Returns:
+            list: Tuples (distance in km, node id), closest first; fewer than
+            k when the index holds fewer nodes
+        """
+        if k < 1 or not self.size:
+            return []
+
+        longitudes, latitudes = self.graph.longitudes, self.graph.latitudes
+        offsets, nodes, columns, rows = self.offsets, self.nodes, self.columns, self.rows
+        column = min(max(int((longitude - self.min_longitude) // self.cell_width), 0), columns - 1)
+        row = min(max(int((latitude - self.min_latitude) // self.cell_height), 0), rows - 1)
+
+        # Max-heap of the k best as (-distance, -node), so ties go to the lowest id
+        best = []
+        ring = 0
+        while True:
+            for cell in self._ring_cells(column, row, ring):
+                for index in range(offsets[cell], offsets[cell + 1]):
+                    node = nodes[index]
+                    distance = haversine_km(longitude, latitude, longitudes[node], latitudes[node])
+                    entry = (-distance, -node)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+
+            if column - ring <= 0 and row - ring <= 0 and column + ring >= columns - 1 and row + ring >= rows - 1:
+                break
+            if len(best) == k and self._unvisited_bound(longitude, latitude, column, row, ring) > -best[0][0]:
+                break
+            ring += 1
+
+        return sorted((-distance, -node) for distance, node in best)
+
+    def _ring_cells(self, column, row, ring):
+        # Cells at Chebyshev distance ring from (column, row), inside the grid
+        columns, rows = self.columns, self.rows
+        if ring == 0:
+            yield row * columns + column
+            return
+
+        first_column, last_column = max(column - ring, 0), min(column + ring, columns - 1)
+        for edge_row in (row - ring, row + ring):
+            if 0 <= edge_row < rows:
+                for cell_column in range(first_column, last_column + 1):
+                    yield edge_row * columns + cell_column
+        for edge_column in (column - ring, column + ring):
+            if 0 <= edge_column < columns:
+                for cell_row in range(max(row - ring + 1, 0), min(row + ring - 1, rows - 1) + 1):
+                    yield cell_row * columns + edge_column
+
+    def _unvisited_bound(self, longitude, latitude, column, row, ring):
+        """
+        Lower bound in km of the distance from a position to any node
+        outside rings 0 .. ring around (column, row): the minimum over the
+        strips of cells left on each side of the visited square.
+        """
+        west, south = self.min_longitude, self.min_latitude
+        east, north = west + self.columns * self.cell_width, south + self.rows * self.cell_height
+        strips = []
+        if column - ring > 0:
+            strips.append((west, west + (column - ring) * self.cell_width, south, north))
+        if column + ring < self.columns - 1:
+            strips.append((west + (column + ring + 1) * self.cell_width, east, south, north))
+        if row - ring > 0:
+            strips.append((west, east, south, south + (row - ring) * self.cell_height))
+        if row + ring < self.rows - 1:
+            strips.append((west, east, south + (row + ring + 1) * self.cell_height, north))
+
+        # From the haversine formula, with cos(lat2) >= cos(max_latitude) for every node:
+        # h >= sin²(Δlat / 2) + cos(lat1) cos(max_latitude) sin²(Δlon / 2)
+        scale = max(math.cos(math.radians(min(abs(latitude), 90.0))) * math.cos(math.radians(self.max_latitude)), 0.0)
+        bound = float('inf')
+        for min_longitude, max_longitude, min_latitude, max_latitude in strips:
+            delta_longitude = math.radians(min(max(min_longitude - longitude, longitude - max_longitude, 0.0), 180.0))
+            delta_latitude = math.radians(max(min_latitude - latitude, latitude - max_latitude, 0.0))
+            h = math.sin(delta_latitude / 2) ** 2 + scale * math.sin(delta_longitude / 2) ** 2
+            bound = min(bound, 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h))))
+        return bound
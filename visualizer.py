@@ -1,154 +1,200 @@
 import networkx as nx
 import matplotlib
-matplotlib.use('Agg')  
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 import io
 import base64
+import threading
+from collections import OrderedDict
+from PIL import Image
 from graph import pos
 
-def visualize_route(graph_data, paths_data, start_city, end_city):
+# Colors for each path
+PATH_COLORS = [
+    '#e67e22',  # Orange - Optimal path
+    '#3498db',  # Blue - Alternative 1
+    '#9b59b6',  # Purple - Alternative 2
+]
+
+# Number of base maps (one per graph version) kept in memory
+BASE_MAP_LIMIT = 4
+
+_base_maps = OrderedDict()
+_base_maps_lock = threading.Lock()
+
+
+class _BaseMap:
     """
-    Generates an image of the graph highlighting multiple alternative paths.
-    Returns the image encoded in base64 format for web display.
+    Static background of the map for one graph: every edge in gray, every
+    city with its label and every "km" edge label, rendered once on an Agg
+    canvas. Each request restores this raster and only draws the path
+    overlays, start/end markers, title and legend on top of it.
 
-    Args:
-        graph_data: Dictionary of the graph
-        paths_data: List of tuples (distance, path) or single path for compatibility
-        start_city: Starting city
-        end_city: Ending city
+    Coordinates come from graph_data.pos when it has them (a GraphView of
+    a loaded graph), otherwise from graph.pos.
     """
-    G = nx.Graph()
 
-    # 1. Add nodes and edges
-    for city, neighbors in graph_data.items():
-        for neighbor, weight in neighbors.items():
-            G.add_edge(city, neighbor, weight=weight)
+    def __init__(self, graph_data):
+        self.lock = threading.Lock()
+        self.pos = getattr(graph_data, 'pos', pos)
+        self.G = nx.Graph()
 
-    # 2. Set node positions with real GPS coordinates
-    # Using geographic coordinates (longitude, latitude) of Mauritanian cities
-    # Format: (longitude, latitude) for accurate geographic display
-    
+        for city, neighbors in graph_data.items():
+            for neighbor, weight in neighbors.items():
+                self.G.add_edge(city, neighbor, weight=weight)
 
-    # Handle case where paths_data is a simple list (old format)
-    if isinstance(paths_data, list) and len(paths_data) > 0 and not isinstance(paths_data[0], tuple):
-        paths_data = [(0, paths_data)]  # Convert to new format
+        self.fig, self.ax = plt.subplots(figsize=(16, 10), facecolor='white')
+        self.fig.subplots_adjust(left=0.01, right=0.99, bottom=0.01, top=0.88)
+        self.ax.set_facecolor('#f8f9fa')
 
-    # Extract all paths
-    all_paths = [path for _, path in paths_data]
+        # Draw edges with curved connections to reduce overlaps
+        nx.draw_networkx_edges(
+            self.G, self.pos, ax=self.ax,
+            edge_color='#bdc3c7',  # Light gray for other edges
+            width=1,
+            alpha=0.7,
+            arrows=True,
+            connectionstyle='arc3,rad=0.1'  # Curved edges
+        )
+        self._draw_cities(self.G.nodes(), ['#95a5a6'] * len(self.G))  # Gray for other cities
 
-    # 3. Define colors for each path
-    path_colors = [
-        '#e67e22',  # Orange - Optimal path
-        '#3498db',  # Blue - Alternative 1
-        '#9b59b6',  # Purple - Alternative 2
-    ]
+        # Add edge labels (distances)
+        self.edge_labels = {
+            edge: f'{weight:g} km' for edge, weight in nx.get_edge_attributes(self.G, 'weight').items()
+        }
+        self._draw_edge_labels(self.edge_labels)
 
-    # 4. Define node colors (highlight start/end)
-    node_colors = []
-    all_path_nodes = set()
-    for path in all_paths:
-        all_path_nodes.update(path)
-
-    for node in G.nodes():
-        if node == start_city:
-            node_colors.append('#2ecc71')  # Green for start
-        elif node == end_city:
-            node_colors.append('#e74c3c')  # Red for end
-        elif node in all_path_nodes:
-            node_colors.append('#f39c12')  # Orange for path cities
-        else:
-            node_colors.append('#95a5a6')  # Gray for other cities
-
-    # 5. Prepare edges for each path
-    # Create a dictionary to track which edge belongs to which path(s)
-    edge_to_paths = {}
-    for i, path in enumerate(all_paths):
-        path_edges = list(zip(path, path[1:]))
-        for edge in path_edges:
-            edge_normalized = tuple(sorted(edge))
-            if edge_normalized not in edge_to_paths:
-                edge_to_paths[edge_normalized] = []
-            edge_to_paths[edge_normalized].append(i)
-
-    # Assign colors and widths to edges
-    edge_colors = []
-    edge_widths = []
-
-    for (u, v) in G.edges():
-        edge_normalized = tuple(sorted((u, v)))
-        if edge_normalized in edge_to_paths:
-            # This edge is part of at least one path
-            path_idx = edge_to_paths[edge_normalized][0]  # Use color of first path
-            edge_colors.append(path_colors[path_idx])
-            edge_widths.append(4 if path_idx == 0 else 3)  # Thicker for optimal
-        else:
-            edge_colors.append('#bdc3c7')  # Light gray for other edges
-            edge_widths.append(1)
-
-    # 4. Create figure with larger size and improved style
-    fig, ax = plt.subplots(figsize=(16, 10), facecolor='white')
-    ax.set_facecolor('#f8f9fa')
-
-    # 5. Draw graph with improved style
-
-    # Draw edges with curved connections to reduce overlaps
-    nx.draw_networkx_edges(
-        G, pos,
-        edge_color=edge_colors,
-        width=edge_widths,
-        alpha=0.7,
-        arrows=True,  
-        connectionstyle='arc3,rad=0.1'  # Curved edges
-    )
+        self.ax.axis('off')
 
-    # Draw nodes with borders
-    nx.draw_networkx_nodes(
-        G, pos,
-        node_color=node_colors,
-        node_size=800,  # Reduced from 2000 to 800 to avoid overlaps
-        edgecolors='#2c3e50',
-        linewidths=1.5,  # Reduced from 2.5 to 1.5
-        alpha=0.9
-    )
+        # Freeze the view so overlays are drawn with the same transform
+        self.ax.set_xlim(self.ax.get_xlim())
+        self.ax.set_ylim(self.ax.get_ylim())
+        self.ax.set_autoscale_on(False)
 
-    # Draw labels with improved style
-    nx.draw_networkx_labels(
-        G, pos,
-        font_size=8,  # Reduced from 11 to 8
-        font_weight='bold',
-        font_family='sans-serif',
-        font_color='white'
-    )
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
 
-    # Add edge labels (distances) with improved positioning
-    edge_labels = nx.get_edge_attributes(G, 'weight')
-    formatted_edge_labels = {k: f'{v} km' for k, v in edge_labels.items()}
-    nx.draw_networkx_edge_labels(
-        G, pos,
-        edge_labels=formatted_edge_labels,
-        font_color='#2c3e50',
-        font_size=7,  # Reduced from 9 to 7
-        font_weight='normal',  # Changed from 'bold' to 'normal' for less clutter
-        bbox=dict(boxstyle='round,pad=0.2', facecolor='white', edgecolor='none', alpha=0.8)  # Reduced padding
-    )
+    def _draw_cities(self, nodes, colors):
+        # Draw nodes with borders
+        nodes_artist = nx.draw_networkx_nodes(
+            self.G, self.pos, ax=self.ax,
+            nodelist=list(nodes),
+            node_color=colors,
+            node_size=800,
+            edgecolors='#2c3e50',
+            linewidths=1.5,
+            alpha=0.9
+        )
+        # Draw labels with improved style
+        labels = nx.draw_networkx_labels(
+            self.G, self.pos, ax=self.ax,
+            labels={node: node for node in nodes},
+            font_size=8,
+            font_weight='bold',
+            font_family='sans-serif',
+            font_color='white'
+        )
+        return [nodes_artist] + list(labels.values())
 
-    # 6. Add title and legend
-    if len(all_paths) == 1:
-        route_display = ' → '.join(all_paths[0])
-        total_distance = sum(graph_data[all_paths[0][i]][all_paths[0][i+1]] for i in range(len(all_paths[0])-1))
-        title_text = f"Shortest route: {start_city} to {end_city}\n{route_display}\nTotal distance: {total_distance} km"
-    else:
-        title_text = f"Alternative routes: {start_city} to {end_city}\n{len(all_paths)} paths found"
+    def _draw_edge_labels(self, edge_labels):
+        labels = nx.draw_networkx_edge_labels(
+            self.G, self.pos, ax=self.ax,
+            edge_labels=edge_labels,
+            font_color='#2c3e50',
+            font_size=7,
+            font_weight='normal',
+            bbox=dict(boxstyle='round,pad=0.2', facecolor='white', edgecolor='none', alpha=0.8)
+        )
+        return list(labels.values())
 
-    plt.title(
-        title_text,
-        fontsize=16,
-        fontweight='bold',
-        pad=20,
-        color='#2c3e50'
-    )
+    def render(self, all_paths, start_city, end_city, title_text, image_format='png'):
+        """
+        Composites the path overlays on the cached background. Raster
+        formats (png, webp) reuse the background raster; svg is a vector
+        format, so the whole figure is saved with the overlays added.
+
+        Returns:
+            bytes: The encoded image
+        """
+        ax = self.ax
+        overlays = []
+
+        # 1. Path edges, optimal path drawn last so it stays on top
+        drawn_edges = set()
+        path_edges = []
+        for i, path in enumerate(all_paths):
+            edges = []
+            for edge in zip(path, path[1:]):
+                edge_normalized = tuple(sorted(edge))
+                if edge_normalized not in drawn_edges:
+                    drawn_edges.add(edge_normalized)
+                    edges.append(edge)
+            path_edges.append(edges)
 
+        for i in reversed(range(len(all_paths))):
+            if not path_edges[i]:
+                continue
+            overlays += nx.draw_networkx_edges(
+                self.G, self.pos, ax=ax,
+                edgelist=path_edges[i],
+                edge_color=PATH_COLORS[i],
+                width=4 if i == 0 else 3,  # Thicker for optimal
+                alpha=0.7,
+                arrows=True,
+                connectionstyle='arc3,rad=0.1'
+            )
+
+        # 2. Path cities (highlight start/end) and distances of the path edges
+        path_nodes = []
+        node_colors = []
+        for path in all_paths:
+            for node in path:
+                if node in path_nodes:
+                    continue
+                path_nodes.append(node)
+                if node == start_city:
+                    node_colors.append('#2ecc71')  # Green for start
+                elif node == end_city:
+                    node_colors.append('#e74c3c')  # Red for end
+                else:
+                    node_colors.append('#f39c12')  # Orange for path cities
+
+        overlays += self._draw_cities(path_nodes, node_colors)
+        overlays += self._draw_edge_labels({
+            edge: label for edge, label in self.edge_labels.items()
+            if tuple(sorted(edge)) in drawn_edges
+        })
+
+        # 3. Title and legend
+        ax.set_title(title_text, fontsize=16, fontweight='bold', pad=20, color='#2c3e50')
+        overlays.append(ax.title)
+        overlays.append(_legend(ax, all_paths))
+
+        buf = io.BytesIO()
+        canvas = self.fig.canvas
+
+        try:
+            if image_format == 'svg':
+                self.fig.savefig(buf, format='svg', facecolor='white')
+            else:
+                canvas.restore_region(self.background)
+                for artist in overlays:
+                    ax.draw_artist(artist)
+
+                width, height = canvas.get_width_height()
+                image = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+                image.convert('RGB').save(buf, format=image_format)
+        finally:
+            for artist in overlays:
+                if artist is not ax.title:
+                    artist.remove()
+            ax.set_title('')
+
+        return buf.getvalue()
+
+
+def _legend(ax, all_paths):
     # Create legend
     legend_elements = [
         mpatches.Patch(facecolor='#2ecc71', edgecolor='#2c3e50', label='Starting city', linewidth=2),
@@ -161,7 +207,7 @@ def visualize_route(graph_data, paths_data, start_city, end_city):
     path_labels = ['Optimal', 'Alternative 1', 'Alternative 2']
     for i, path in enumerate(all_paths[:3]):
         legend_elements.append(
-            plt.Line2D([0], [0], color=path_colors[i], linewidth=4 if i == 0 else 3,
+            plt.Line2D([0], [0], color=PATH_COLORS[i], linewidth=4 if i == 0 else 3,
                       label=f'Path {path_labels[i]}')
         )
 
@@ -169,7 +215,7 @@ def visualize_route(graph_data, paths_data, start_city, end_city):
         plt.Line2D([0], [0], color='#bdc3c7', linewidth=1, label='Other routes')
     )
 
-    ax.legend(
+    return ax.legend(
         handles=legend_elements,
         loc='upper left',
         fontsize=10,
@@ -179,16 +225,88 @@ def visualize_route(graph_data, paths_data, start_city, end_city):
         bbox_to_anchor=(0.02, 0.98)
     )
 
-    plt.axis('off')
-    plt.tight_layout()
 
-    # 7. Save image to buffer and encode for web
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    buf.seek(0)
-    plt.close()
+def _base_map(graph_data):
+    """
+    Returns the base map of a graph, rendering it on first use. The graph
+    content (or its version, for a GraphView) is the cache key, so a
+    changed graph gets a new base map.
+    """
+    key = getattr(graph_data, 'version', None) or \
+        tuple((city, tuple(neighbors.items())) for city, neighbors in graph_data.items())
+
+    with _base_maps_lock:
+        base_map = _base_maps.get(key)
+        if base_map is not None:
+            _base_maps.move_to_end(key)
+            return base_map
+
+    base_map = _BaseMap(graph_data)
+
+    with _base_maps_lock:
+        _base_maps[key] = base_map
+        while len(_base_maps) > BASE_MAP_LIMIT:
+            _, evicted = _base_maps.popitem(last=False)
+            plt.close(evicted.fig)
+    return base_map
+
+
+# Supported image formats
+IMAGE_FORMATS = ('png', 'webp', 'svg')
+
+
+def visualize_route(graph_data, paths_data, start_city, end_city):
+    """
+    Generates an image of the graph highlighting multiple alternative paths.
+    Returns the image encoded in base64 format for web display.
+
+    Args:
+        graph_data: Dictionary of the graph
+        paths_data: List of tuples (distance, path) or single path for compatibility
+        start_city: Starting city
+        end_city: Ending city
+    """
+    image = render_route_image(graph_data, paths_data, start_city, end_city)
 
     # Encode image data as base64 string
-    image_base64 = base64.b64encode(buf.read()).decode('utf-8')
+    return base64.b64encode(image).decode('utf-8')
+
+
+def render_route_image(graph_data, paths_data, start_city, end_city, image_format='png'):
+    """
+    Generates an image of the graph highlighting multiple alternative paths.
+
+    The static part of the map is rendered once per graph and cached (see
+    _BaseMap); only the paths, start/end markers, title and legend are
+    drawn for each call.
+
+    Args:
+        graph_data: Dictionary of the graph
+        paths_data: List of tuples (distance, path) or single path for compatibility
+        start_city: Starting city
+        end_city: Ending city
+        image_format: One of IMAGE_FORMATS
+
+    Returns:
+        bytes: The encoded image
+    """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+    # Handle case where paths_data is a simple list (old format)
+    if isinstance(paths_data, list) and len(paths_data) > 0 and not isinstance(paths_data[0], tuple):
+        paths_data = [(0, paths_data)]  # Convert to new format
+
+    # Extract all paths
+    all_paths = [path for _, path in paths_data]
+
+    if len(all_paths) == 1:
+        route_display = ' → '.join(all_paths[0])
+        total_distance = sum(graph_data[all_paths[0][i]][all_paths[0][i+1]] for i in range(len(all_paths[0])-1))
+        title_text = f"Shortest route: {start_city} to {end_city}\n{route_display}\nTotal distance: {total_distance:g} km"
+    else:
+        title_text = f"Alternative routes: {start_city} to {end_city}\n{len(all_paths)} paths found"
 
-    return image_base64
\ No newline at end of file
+    base_map = _base_map(graph_data)
+    with base_map.lock:
+        return base_map.render(all_paths, start_city, end_city, title_text, image_format)